@@ -36,6 +36,7 @@ import uuid
 
 from solar.access import User
 from solar.media import MediaFile
+from solar.config import config
 
 from api.utils import get_swagger_ui_html
 from api.models import TokenExchangeRequest, TokenResponse, TokenValidationRequest, LogoutResponse
@@ -50,7 +51,7 @@ REFRESH_TOKEN_COOKIE_NAME = "refresh_token"
 
 
 
-from .models import GetAllProjectsOutputSchema, BodyProjectServiceGetProjectById, GetProjectByIdOutputSchema, BodyProjectServiceGetFeaturedProjects, GetFeaturedProjectsOutputSchema, BodyProjectServiceSearchProjects, SearchProjectsOutputSchema, BodyProjectServiceGetProjectsByCategory, GetProjectsByCategoryOutputSchema, BodyProjectServiceCreateProject, CreateProjectOutputSchema, BodyProjectServiceUpdateProject, UpdateProjectOutputSchema, BodyProjectServiceDeleteProject, DeleteProjectOutputSchema, BodyProjectServiceGetProjectStatistics, GetProjectStatisticsOutputSchema, BodyVotingServiceVoteForProject, VoteForProjectOutputSchema, BodyVotingServiceRemoveVoteForProject, RemoveVoteForProjectOutputSchema, BodyVotingServiceHasUserVoted, HasUserVotedOutputSchema, BodyVotingServiceGetProjectVoteCount, GetProjectVoteCountOutputSchema, GetUserVotesOutputSchema, BodyVotingServiceGetProjectVoters, GetProjectVotersOutputSchema, BodyDonationServiceCreateDonation, CreateDonationOutputSchema, BodyDonationServiceGetProjectDonations, GetProjectDonationsOutputSchema, BodyDonationServiceGetDonationStatistics, GetDonationStatisticsOutputSchema, GetUserDonationsOutputSchema, BodyDonationServiceGetRecentDonations, GetRecentDonationsOutputSchema, BodyDonationServiceGetTopDonorsForProject, GetTopDonorsForProjectOutputSchema, GetUserDonationTotalOutputSchema, BodyTimelineServiceGetProjectTimeline, GetProjectTimelineOutputSchema, BodyTimelineServiceCreateTimelineItem, CreateTimelineItemOutputSchema, BodyTimelineServiceUpdateTimelineItem, UpdateTimelineItemOutputSchema, BodyTimelineServiceDeleteTimelineItem, DeleteTimelineItemOutputSchema, BodyTimelineServiceReorderTimelineItems, ReorderTimelineItemsOutputSchema, BodyTimelineServiceGetTimelineItemById, GetTimelineItemByIdOutputSchema, BodyTimelineServiceGetRecentTimelineActivity, GetRecentTimelineActivityOutputSchema, BodyCommentServiceGetProjectComments, GetProjectCommentsOutputSchema, BodyCommentServiceGetTimelineItemComments, GetTimelineItemCommentsOutputSchema, BodyCommentServiceGetThreadedComments, GetThreadedCommentsOutputSchema, BodyCommentServiceCreateComment, CreateCommentOutputSchema, BodyCommentServiceUpdateComment, UpdateCommentOutputSchema, BodyCommentServiceDeleteComment, DeleteCommentOutputSchema, BodyCommentServiceGetRecentComments, GetRecentCommentsOutputSchema, BodyCommentServiceGetCommentCountForProject, GetCommentCountForProjectOutputSchema, GetUserCommentsOutputSchema, BodyCommentServiceSearchComments, SearchCommentsOutputSchema, GetAllBadgesOutputSchema, BodyBadgeServiceGetProjectBadges, GetProjectBadgesOutputSchema, BodyBadgeServiceGetUserBadges, GetUserBadgesOutputSchema, BodyBadgeServiceSetFeaturedBadge, SetFeaturedBadgeOutputSchema, RecalculateBadgesOutputSchema, BodyRegistrationServiceCheckUsernameAvailability, CheckUsernameAvailabilityOutputSchema, BodyRegistrationServiceCheckEmailAvailability, CheckEmailAvailabilityOutputSchema, BodyRegistrationServiceValidatePassword, ValidatePasswordOutputSchema, BodyRegistrationServiceRegisterUser, RegisterUserOutputSchema, BodyRegistrationServiceSendVerificationEmail, SendVerificationEmailOutputSchema, BodyRegistrationServiceVerifyEmail, VerifyEmailOutputSchema, GetRegistrationStatsOutputSchema, BodyRegistrationServiceUpdateUserProfile, UpdateUserProfileOutputSchema
+from .models import GetAllProjectsOutputSchema, BodyProjectServiceGetProjectById, GetProjectByIdOutputSchema, BodyProjectServiceGetFeaturedProjects, GetFeaturedProjectsOutputSchema, BodyProjectServiceSearchProjects, SearchProjectsOutputSchema, BodyProjectServiceGetProjectsByCategory, GetProjectsByCategoryOutputSchema, BodyProjectServiceCreateProject, CreateProjectOutputSchema, BodyProjectServiceUpdateProject, UpdateProjectOutputSchema, BodyProjectServiceDeleteProject, DeleteProjectOutputSchema, BodyProjectServiceGetProjectStatistics, GetProjectStatisticsOutputSchema, BodyProjectServiceGetTrendingProjects, GetTrendingProjectsOutputSchema, BodyVotingServiceVoteForProject, VoteForProjectOutputSchema, BodyVotingServiceRemoveVoteForProject, RemoveVoteForProjectOutputSchema, BodyVotingServiceHasUserVoted, HasUserVotedOutputSchema, BodyVotingServiceGetProjectVoteCount, GetProjectVoteCountOutputSchema, GetUserVotesOutputSchema, BodyVotingServiceGetProjectVoters, GetProjectVotersOutputSchema, BodyDonationServiceCreateDonation, CreateDonationOutputSchema, BodyDonationServiceGetProjectDonations, GetProjectDonationsOutputSchema, BodyDonationServiceGetDonationStatistics, GetDonationStatisticsOutputSchema, GetUserDonationsOutputSchema, BodyDonationServiceGetRecentDonations, GetRecentDonationsOutputSchema, BodyDonationServiceGetTopDonorsForProject, GetTopDonorsForProjectOutputSchema, GetUserDonationTotalOutputSchema, BodyTimelineServiceGetProjectTimeline, GetProjectTimelineOutputSchema, BodyTimelineServiceCreateTimelineItem, CreateTimelineItemOutputSchema, BodyTimelineServiceUpdateTimelineItem, UpdateTimelineItemOutputSchema, BodyTimelineServiceDeleteTimelineItem, DeleteTimelineItemOutputSchema, BodyTimelineServiceReorderTimelineItems, ReorderTimelineItemsOutputSchema, BodyTimelineServiceGetTimelineItemById, GetTimelineItemByIdOutputSchema, BodyTimelineServiceGetRecentTimelineActivity, GetRecentTimelineActivityOutputSchema, BodyCommentServiceGetProjectComments, GetProjectCommentsOutputSchema, BodyCommentServiceGetTimelineItemComments, GetTimelineItemCommentsOutputSchema, BodyCommentServiceGetThreadedComments, GetThreadedCommentsOutputSchema, BodyCommentServiceCreateComment, CreateCommentOutputSchema, BodyCommentServiceUpdateComment, UpdateCommentOutputSchema, BodyCommentServiceDeleteComment, DeleteCommentOutputSchema, BodyCommentServiceGetRecentComments, GetRecentCommentsOutputSchema, BodyCommentServiceGetCommentCountForProject, GetCommentCountForProjectOutputSchema, GetUserCommentsOutputSchema, BodyCommentServiceSearchComments, SearchCommentsOutputSchema, GetAllBadgesOutputSchema, BodyBadgeServiceGetProjectBadges, GetProjectBadgesOutputSchema, BodyBadgeServiceGetUserBadges, GetUserBadgesOutputSchema, BodyBadgeServiceGetBadgesForProjects, GetBadgesForProjectsOutputSchema, BodyBadgeServiceGetBadgesForUsers, GetBadgesForUsersOutputSchema, BodyBadgeServiceSetFeaturedBadge, SetFeaturedBadgeOutputSchema, RecalculateBadgesOutputSchema, BodyBadgeServiceStartBadgeRecalculation, StartBadgeRecalculationOutputSchema, GetBadgeRecalculationStatusOutputSchema, BodyRegistrationServiceCheckUsernameAvailability, CheckUsernameAvailabilityOutputSchema, BodyRegistrationServiceCheckEmailAvailability, CheckEmailAvailabilityOutputSchema, BodyRegistrationServiceValidatePassword, ValidatePasswordOutputSchema, BodyRegistrationServiceRegisterUser, RegisterUserOutputSchema, BodyRegistrationServiceSendVerificationEmail, SendVerificationEmailOutputSchema, BodyRegistrationServiceVerifyEmail, VerifyEmailOutputSchema, GetRegistrationStatsOutputSchema, BodyRegistrationServiceUpdateUserProfile, UpdateUserProfileOutputSchema
 
 
 ###############################################################################
@@ -311,6 +312,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         print(f"get_current_user failed with error: {type(e).__name__}")
         raise HTTPException(status_code=401, detail="Unauthorized")
 
+@app.on_event("startup")
+async def warn_without_admins():
+    if not config.admin_emails():
+        logger.warning("ADMIN_EMAILS is not set: badge recalculation and the job endpoints will answer 403 to everyone")
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    """The signed-in user if their email is listed in ADMIN_EMAILS (comma separated); 403 otherwise"""
+    if current_user.email.lower() not in config.admin_emails():
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return current_user
+
 def extract_domain(url):
     if not url:
         return None
@@ -546,6 +558,16 @@ async def project_service_get_project_statistics(body: BodyProjectServiceGetProj
 
 
 
+@app.post('/api/project_service/get_trending_projects', response_model=GetTrendingProjectsOutputSchema, operation_id='project_service_get_trending_projects')
+async def project_service_get_trending_projects(body: BodyProjectServiceGetTrendingProjects = Body(...)) -> GetTrendingProjectsOutputSchema:
+    """
+    Get the projects with the most votes over the last 7 days, with their rank and recent vote count (at most 10).
+    """
+    pass
+
+
+
+
 @app.post('/api/voting_service/vote_for_project', response_model=VoteForProjectOutputSchema, operation_id='voting_service_vote_for_project')
 async def voting_service_vote_for_project(body: BodyVotingServiceVoteForProject = Body(...), current_user: User = Depends(get_current_user)) -> VoteForProjectOutputSchema:
     """
@@ -876,6 +898,26 @@ async def badge_service_get_user_badges(body: BodyBadgeServiceGetUserBadges = Bo
 
 
 
+@app.post('/api/badge_service/get_badges_for_projects', response_model=GetBadgesForProjectsOutputSchema, operation_id='badge_service_get_badges_for_projects')
+async def badge_service_get_badges_for_projects(body: BodyBadgeServiceGetBadgesForProjects = Body(...)) -> GetBadgesForProjectsOutputSchema:
+    """
+    Get the badges of many projects at once, as project id -> badges (empty for projects without any).
+    """
+    pass
+
+
+
+
+@app.post('/api/badge_service/get_badges_for_users', response_model=GetBadgesForUsersOutputSchema, operation_id='badge_service_get_badges_for_users')
+async def badge_service_get_badges_for_users(body: BodyBadgeServiceGetBadgesForUsers = Body(...)) -> GetBadgesForUsersOutputSchema:
+    """
+    Get the badges of many users at once, as user id -> badges (empty for users without any).
+    """
+    pass
+
+
+
+
 @app.post('/api/badge_service/set_featured_badge', response_model=SetFeaturedBadgeOutputSchema, operation_id='badge_service_set_featured_badge')
 async def badge_service_set_featured_badge(body: BodyBadgeServiceSetFeaturedBadge = Body(...)) -> SetFeaturedBadgeOutputSchema:
     """
@@ -887,7 +929,7 @@ async def badge_service_set_featured_badge(body: BodyBadgeServiceSetFeaturedBadg
 
 
 @app.post('/api/badge_service/recalculate_badges', response_model=RecalculateBadgesOutputSchema, operation_id='badge_service_recalculate_badges')
-async def badge_service_recalculate_badges() -> RecalculateBadgesOutputSchema:
+async def badge_service_recalculate_badges(current_user: User = Depends(get_admin_user)) -> RecalculateBadgesOutputSchema:
     """
     Recalculate all badges for all users and projects (admin function).
     """
@@ -896,6 +938,26 @@ async def badge_service_recalculate_badges() -> RecalculateBadgesOutputSchema:
 
 
 
+@app.post('/api/badge_service/start_badge_recalculation', response_model=StartBadgeRecalculationOutputSchema, operation_id='badge_service_start_badge_recalculation')
+async def badge_service_start_badge_recalculation(body: BodyBadgeServiceStartBadgeRecalculation = Body(...), current_user: User = Depends(get_admin_user)) -> StartBadgeRecalculationOutputSchema:
+    """
+    Start recalculating all badges in the background, or resume a failed run (admin function).
+    """
+    pass
+
+
+
+
+@app.post('/api/badge_service/get_badge_recalculation_status', response_model=GetBadgeRecalculationStatusOutputSchema, operation_id='badge_service_get_badge_recalculation_status')
+async def badge_service_get_badge_recalculation_status(current_user: User = Depends(get_admin_user)) -> GetBadgeRecalculationStatusOutputSchema:
+    """
+    Get the progress of the background badge recalculation.
+    """
+    pass
+
+
+
+
 @app.post('/api/registration_service/check_username_availability', response_model=CheckUsernameAvailabilityOutputSchema, operation_id='registration_service_check_username_availability')
 async def registration_service_check_username_availability(body: BodyRegistrationServiceCheckUsernameAvailability = Body(...)) -> CheckUsernameAvailabilityOutputSchema:
     """
@@ -25,6 +25,8 @@ class LogoutResponse(BaseModel):
 
 # Import user-defined models that we need for input/response models
 from core.project import Project
+from core.trending import TRENDING_SIZE
+from core.badge_service import BADGE_LOOKUP_MAX_IDS
 from core.timeline_item import TimelineItem
 from core.vote import Vote
 from core.donation import Donation
@@ -77,6 +79,10 @@ class BodyProjectServiceGetProjectStatistics(BaseModel):
   project_id: UUID
 
 GetProjectStatisticsOutputSchema = Dict[str, Any]
+class BodyProjectServiceGetTrendingProjects(BaseModel):
+  limit: int = Field(ge=1, le=TRENDING_SIZE, description="At most TRENDING_SIZE (10): only that many are ranked")
+
+GetTrendingProjectsOutputSchema = List[Dict[str, Any]]
 class BodyVotingServiceVoteForProject(BaseModel):
   project_id: UUID
 
@@ -217,12 +223,25 @@ class BodyBadgeServiceGetUserBadges(BaseModel):
   user_id: str
 
 GetUserBadgesOutputSchema = List[Dict]
+class BodyBadgeServiceGetBadgesForProjects(BaseModel):
+  project_ids: List[uuid.UUID] = Field(max_length=BADGE_LOOKUP_MAX_IDS)
+
+GetBadgesForProjectsOutputSchema = Dict[uuid.UUID, List[Dict]]
+class BodyBadgeServiceGetBadgesForUsers(BaseModel):
+  user_ids: List[str] = Field(max_length=BADGE_LOOKUP_MAX_IDS)
+
+GetBadgesForUsersOutputSchema = Dict[str, List[Dict]]
 class BodyBadgeServiceSetFeaturedBadge(BaseModel):
   user_id: str
   badge_id: uuid.UUID
 
 SetFeaturedBadgeOutputSchema = UserBadge
 RecalculateBadgesOutputSchema = Dict
+class BodyBadgeServiceStartBadgeRecalculation(BaseModel):
+  resume: bool
+
+StartBadgeRecalculationOutputSchema = Dict
+GetBadgeRecalculationStatusOutputSchema = Dict
 class BodyRegistrationServiceCheckUsernameAvailability(BaseModel):
   username: str
 
@@ -36,6 +36,12 @@ import uuid
 
 from solar.access import User
 from solar.media import MediaFile
+from solar import Table
+from solar.config import config
+from solar.pool import DEFAULT_MAX_SIZE, close_async_pool, get_pool_stats, pool_monitor, warm_up_pools
+from solar.instrumentation import instrumentation, render_prometheus
+from solar.retry import retry_stats
+from psycopg_pool import PoolTimeout, TooManyRequests
 
 from api.utils import get_swagger_ui_html
 from api.models import TokenExchangeRequest, TokenResponse, TokenValidationRequest, LogoutResponse
@@ -50,8 +56,11 @@ REFRESH_TOKEN_COOKIE_NAME = "refresh_token"
 
 
 
-from .models import GetAllProjectsOutputSchema, BodyProjectServiceGetProjectById, GetProjectByIdOutputSchema, BodyProjectServiceGetFeaturedProjects, GetFeaturedProjectsOutputSchema, BodyProjectServiceSearchProjects, SearchProjectsOutputSchema, BodyProjectServiceGetProjectsByCategory, GetProjectsByCategoryOutputSchema, BodyProjectServiceCreateProject, CreateProjectOutputSchema, BodyProjectServiceUpdateProject, UpdateProjectOutputSchema, BodyProjectServiceDeleteProject, DeleteProjectOutputSchema, BodyProjectServiceGetProjectStatistics, GetProjectStatisticsOutputSchema, BodyVotingServiceVoteForProject, VoteForProjectOutputSchema, BodyVotingServiceRemoveVoteForProject, RemoveVoteForProjectOutputSchema, BodyVotingServiceHasUserVoted, HasUserVotedOutputSchema, BodyVotingServiceGetProjectVoteCount, GetProjectVoteCountOutputSchema, GetUserVotesOutputSchema, BodyVotingServiceGetProjectVoters, GetProjectVotersOutputSchema, BodyDonationServiceCreateDonation, CreateDonationOutputSchema, BodyDonationServiceGetProjectDonations, GetProjectDonationsOutputSchema, BodyDonationServiceGetDonationStatistics, GetDonationStatisticsOutputSchema, GetUserDonationsOutputSchema, BodyDonationServiceGetRecentDonations, GetRecentDonationsOutputSchema, BodyDonationServiceGetTopDonorsForProject, GetTopDonorsForProjectOutputSchema, GetUserDonationTotalOutputSchema, BodyTimelineServiceGetProjectTimeline, GetProjectTimelineOutputSchema, BodyTimelineServiceCreateTimelineItem, CreateTimelineItemOutputSchema, BodyTimelineServiceUpdateTimelineItem, UpdateTimelineItemOutputSchema, BodyTimelineServiceDeleteTimelineItem, DeleteTimelineItemOutputSchema, BodyTimelineServiceReorderTimelineItems, ReorderTimelineItemsOutputSchema, BodyTimelineServiceGetTimelineItemById, GetTimelineItemByIdOutputSchema, BodyTimelineServiceGetRecentTimelineActivity, GetRecentTimelineActivityOutputSchema, BodyCommentServiceGetProjectComments, GetProjectCommentsOutputSchema, BodyCommentServiceGetTimelineItemComments, GetTimelineItemCommentsOutputSchema, BodyCommentServiceGetThreadedComments, GetThreadedCommentsOutputSchema, BodyCommentServiceCreateComment, CreateCommentOutputSchema, BodyCommentServiceUpdateComment, UpdateCommentOutputSchema, BodyCommentServiceDeleteComment, DeleteCommentOutputSchema, BodyCommentServiceGetRecentComments, GetRecentCommentsOutputSchema, BodyCommentServiceGetCommentCountForProject, GetCommentCountForProjectOutputSchema, GetUserCommentsOutputSchema, BodyCommentServiceSearchComments, SearchCommentsOutputSchema, GetAllBadgesOutputSchema, BodyBadgeServiceGetProjectBadges, GetProjectBadgesOutputSchema, BodyBadgeServiceGetUserBadges, GetUserBadgesOutputSchema, BodyBadgeServiceSetFeaturedBadge, SetFeaturedBadgeOutputSchema, RecalculateBadgesOutputSchema, BodyRegistrationServiceCheckUsernameAvailability, CheckUsernameAvailabilityOutputSchema, BodyRegistrationServiceCheckEmailAvailability, CheckEmailAvailabilityOutputSchema, BodyRegistrationServiceValidatePassword, ValidatePasswordOutputSchema, BodyRegistrationServiceRegisterUser, RegisterUserOutputSchema, BodyRegistrationServiceSendVerificationEmail, SendVerificationEmailOutputSchema, BodyRegistrationServiceVerifyEmail, VerifyEmailOutputSchema, GetRegistrationStatsOutputSchema, BodyRegistrationServiceUpdateUserProfile, UpdateUserProfileOutputSchema
+from .models import GetAllProjectsOutputSchema, BodyProjectServiceGetProjectById, GetProjectByIdOutputSchema, BodyProjectServiceGetFeaturedProjects, GetFeaturedProjectsOutputSchema, BodyProjectServiceSearchProjects, SearchProjectsOutputSchema, BodyProjectServiceGetProjectsByCategory, GetProjectsByCategoryOutputSchema, BodyProjectServiceCreateProject, CreateProjectOutputSchema, BodyProjectServiceUpdateProject, UpdateProjectOutputSchema, BodyProjectServiceDeleteProject, DeleteProjectOutputSchema, BodyProjectServiceGetProjectStatistics, GetProjectStatisticsOutputSchema, BodyProjectServiceGetTrendingProjects, GetTrendingProjectsOutputSchema, BodyVotingServiceVoteForProject, VoteForProjectOutputSchema, BodyVotingServiceRemoveVoteForProject, RemoveVoteForProjectOutputSchema, BodyVotingServiceHasUserVoted, HasUserVotedOutputSchema, BodyVotingServiceGetProjectVoteCount, GetProjectVoteCountOutputSchema, GetUserVotesOutputSchema, BodyVotingServiceGetProjectVoters, GetProjectVotersOutputSchema, BodyDonationServiceCreateDonation, CreateDonationOutputSchema, BodyDonationServiceGetProjectDonations, GetProjectDonationsOutputSchema, BodyDonationServiceGetDonationStatistics, GetDonationStatisticsOutputSchema, GetUserDonationsOutputSchema, BodyDonationServiceGetRecentDonations, GetRecentDonationsOutputSchema, BodyDonationServiceGetTopDonorsForProject, GetTopDonorsForProjectOutputSchema, GetUserDonationTotalOutputSchema, BodyTimelineServiceGetProjectTimeline, GetProjectTimelineOutputSchema, BodyTimelineServiceCreateTimelineItem, CreateTimelineItemOutputSchema, BodyTimelineServiceUpdateTimelineItem, UpdateTimelineItemOutputSchema, BodyTimelineServiceDeleteTimelineItem, DeleteTimelineItemOutputSchema, BodyTimelineServiceReorderTimelineItems, ReorderTimelineItemsOutputSchema, BodyTimelineServiceGetTimelineItemById, GetTimelineItemByIdOutputSchema, BodyTimelineServiceGetRecentTimelineActivity, GetRecentTimelineActivityOutputSchema, BodyCommentServiceGetProjectComments, GetProjectCommentsOutputSchema, BodyCommentServiceGetTimelineItemComments, GetTimelineItemCommentsOutputSchema, BodyCommentServiceGetThreadedComments, GetThreadedCommentsOutputSchema, BodyCommentServiceCreateComment, CreateCommentOutputSchema, BodyCommentServiceUpdateComment, UpdateCommentOutputSchema, BodyCommentServiceDeleteComment, DeleteCommentOutputSchema, BodyCommentServiceGetRecentComments, GetRecentCommentsOutputSchema, BodyCommentServiceGetCommentCountForProject, GetCommentCountForProjectOutputSchema, GetUserCommentsOutputSchema, BodyCommentServiceSearchComments, SearchCommentsOutputSchema, GetAllBadgesOutputSchema, BodyBadgeServiceGetProjectBadges, GetProjectBadgesOutputSchema, BodyBadgeServiceGetUserBadges, GetUserBadgesOutputSchema, BodyBadgeServiceGetBadgesForProjects, GetBadgesForProjectsOutputSchema, BodyBadgeServiceGetBadgesForUsers, GetBadgesForUsersOutputSchema, BodyBadgeServiceSetFeaturedBadge, SetFeaturedBadgeOutputSchema, RecalculateBadgesOutputSchema, BodyBadgeServiceStartBadgeRecalculation, StartBadgeRecalculationOutputSchema, GetBadgeRecalculationStatusOutputSchema, BodyRegistrationServiceCheckUsernameAvailability, CheckUsernameAvailabilityOutputSchema, BodyRegistrationServiceCheckEmailAvailability, CheckEmailAvailabilityOutputSchema, BodyRegistrationServiceValidatePassword, ValidatePasswordOutputSchema, BodyRegistrationServiceRegisterUser, RegisterUserOutputSchema, BodyRegistrationServiceSendVerificationEmail, SendVerificationEmailOutputSchema, BodyRegistrationServiceVerifyEmail, VerifyEmailOutputSchema, GetRegistrationStatsOutputSchema, BodyRegistrationServiceUpdateUserProfile, UpdateUserProfileOutputSchema
 from core import project_service, voting_service, donation_service, timeline_service, comment_service, badge_service, registration_service
+from core.badge_queue import BADGE_QUEUE_DRAIN_TIMEOUT, badge_queue
+from core.trending import trending_ranking
+from core.vote_buffer import VOTE_BUFFER_DRAIN_TIMEOUT, vote_buffer
 
 
 ###############################################################################
@@ -144,6 +153,18 @@ async def log_requests(request: Request, call_next):
             logger.exception(f"{request.method} {request.url.path} - Failed after {process_time:.3f}s")
             raise
             
+identity_map_enabled = config.identity_map_enabled()
+
+@app.middleware("http")
+async def database_request_scope(request: Request, call_next):
+    """Keep reads after a write in the same request on the primary instead of a lagging replica, and (when
+    SOLAR_IDENTITY_MAP is on) serve repeated identical SELECTs within the request from memory"""
+    with Table.request_scope():
+        if not identity_map_enabled:
+            return await call_next(request)
+        with Table.identity_map():
+            return await call_next(request)
+
 ###############################################################################
 # Error Handler
 ###############################################################################
@@ -190,6 +211,17 @@ async def handle_validation_errors(request: Request, exc: RequestValidationError
         content={"error": "Validation failed", "details": exc.errors()}
     )
 
+@app.exception_handler(PoolTimeout)
+@app.exception_handler(TooManyRequests)
+async def handle_database_overload(request: Request, exc: Exception):
+    """The connection pool is saturated: tell the client to back off instead of failing with a 500"""
+    logger.warning(f"Database overloaded on {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+        content={"error": "Service Unavailable", "message": "The database is overloaded, try again shortly"}
+    )
+
 # We need to put a token endpoint here, but we're injecting the token,
 # so we'll just put a mock endpoint here.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/mockedTokenEndpoint/")
@@ -264,16 +296,57 @@ async def health_check():
 # Synchronous Function Helpers
 ##############################################################################
 
-thread_pool = ThreadPoolExecutor(max_workers=4)
+# Read-only services are async and awaited directly; the rest (writes, badge evaluation) run here, one thread per
+# connection the default pool can hand out, so the threads rather than the pool aren't the limit
+thread_pool = ThreadPoolExecutor(max_workers=DEFAULT_MAX_SIZE)
 
 async def run_sync_in_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
     """Runs a synchronous function in a thread pool"""
     loop = asyncio.get_running_loop()
+    # Run in a copy of the request's context so the database request scope follows the call into the thread
+    context = contextvars.copy_context()
     return await loop.run_in_executor(
         thread_pool,
-        partial(func, *args, **kwargs)
+        partial(context.run, func, *args, **kwargs)
     )
 
+@app.on_event("startup")
+async def start_pool_monitor():
+    """Open min_size connections per pool up front, then check pool health in the background"""
+    await run_sync_in_thread(warm_up_pools)
+    pool_monitor.start()
+    trending_ranking.start()
+
+@app.on_event("shutdown")
+async def close_database_pools():
+    """Write the buffered votes and run the badge evaluations still queued, then close the asyncio database pools"""
+    await run_sync_in_thread(vote_buffer.stop, VOTE_BUFFER_DRAIN_TIMEOUT)
+    await run_sync_in_thread(badge_queue.stop, BADGE_QUEUE_DRAIN_TIMEOUT)
+    pool_monitor.stop()
+    trending_ranking.stop()
+    await close_async_pool()
+
+def require_metrics_endpoints():
+    """Hide the diagnostics endpoints unless SOLAR_METRICS_ENDPOINTS is on; they expose SQL and pool internals"""
+    if not config.metrics_endpoints_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_endpoints)])
+async def metrics():
+    """Query, pool and retry metrics in the Prometheus text format"""
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/query_stats", include_in_schema=False, dependencies=[Depends(require_metrics_endpoints)])
+async def query_stats():
+    return instrumentation.stats()
+
+@app.get("/api/pool_stats", include_in_schema=False, dependencies=[Depends(require_metrics_endpoints)])
+async def pool_stats():
+    stats = get_pool_stats()
+    for pg_key, counters in retry_stats.stats().items():
+        stats.setdefault(pg_key, {})["retries"] = counters
+    return stats
+
 
 ##############################################################################
 # Custom Docs
@@ -312,6 +385,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         print(f"get_current_user failed with error: {type(e).__name__}")
         raise HTTPException(status_code=401, detail="Unauthorized")
 
+@app.on_event("startup")
+async def warn_without_admins():
+    if not config.admin_emails():
+        logger.warning("ADMIN_EMAILS is not set: badge recalculation and the job endpoints will answer 403 to everyone")
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    """The signed-in user if their email is listed in ADMIN_EMAILS (comma separated); 403 otherwise"""
+    if current_user.email.lower() not in config.admin_emails():
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return current_user
+
 def extract_domain(url):
     if not url:
         return None
@@ -462,7 +546,7 @@ async def project_service_get_all_projects() -> GetAllProjectsOutputSchema:
     """
     Get all projects for public viewing.
     """
-    response = await run_sync_in_thread(project_service.get_all_projects)
+    response = await project_service.get_all_projects()
     return response
     
     
@@ -475,7 +559,7 @@ async def project_service_get_project_by_id(body: BodyProjectServiceGetProjectBy
     """
     Get a specific project by ID.
     """
-    response = await run_sync_in_thread(project_service.get_project_by_id, project_id=body.project_id)
+    response = await project_service.get_project_by_id(project_id=body.project_id)
     return response
     
     
@@ -488,7 +572,7 @@ async def project_service_get_featured_projects(body: BodyProjectServiceGetFeatu
     """
     Get featured projects based on vote count and recent activity.
     """
-    response = await run_sync_in_thread(project_service.get_featured_projects, limit=body.limit)
+    response = await project_service.get_featured_projects(limit=body.limit)
     return response
     
     
@@ -501,7 +585,7 @@ async def project_service_search_projects(body: BodyProjectServiceSearchProjects
     """
     Search projects by title, description, or tags.
     """
-    response = await run_sync_in_thread(project_service.search_projects, query=body.query)
+    response = await project_service.search_projects(query=body.query)
     return response
     
     
@@ -514,7 +598,7 @@ async def project_service_get_projects_by_category(body: BodyProjectServiceGetPr
     """
     Get projects filtered by category.
     """
-    response = await run_sync_in_thread(project_service.get_projects_by_category, category=body.category)
+    response = await project_service.get_projects_by_category(category=body.category)
     return response
     
     
@@ -574,6 +658,19 @@ async def project_service_get_project_statistics(body: BodyProjectServiceGetProj
 
 
 
+@app.post('/api/project_service/get_trending_projects', response_model=GetTrendingProjectsOutputSchema, operation_id='project_service_get_trending_projects')
+async def project_service_get_trending_projects(body: BodyProjectServiceGetTrendingProjects = Body(...)) -> GetTrendingProjectsOutputSchema:
+    """
+    Get the projects with the most votes over the last 7 days, with their rank and recent vote count (at most 10).
+    """
+    response = await run_sync_in_thread(project_service.get_trending_projects, limit=body.limit)
+    return response
+    
+    
+
+
+
+
 @app.post('/api/voting_service/vote_for_project', response_model=VoteForProjectOutputSchema, operation_id='voting_service_vote_for_project')
 async def voting_service_vote_for_project(body: BodyVotingServiceVoteForProject = Body(...), current_user: User = Depends(get_current_user)) -> VoteForProjectOutputSchema:
     """
@@ -605,7 +702,7 @@ async def voting_service_has_user_voted(body: BodyVotingServiceHasUserVoted = Bo
     """
     Check if user has voted for a specific project.
     """
-    response = await run_sync_in_thread(voting_service.has_user_voted, user=current_user, project_id=body.project_id)
+    response = await voting_service.has_user_voted(user=current_user, project_id=body.project_id)
     return response
     
     
@@ -618,7 +715,7 @@ async def voting_service_get_project_vote_count(body: BodyVotingServiceGetProjec
     """
     Get the total vote count for a project.
     """
-    response = await run_sync_in_thread(voting_service.get_project_vote_count, project_id=body.project_id)
+    response = await voting_service.get_project_vote_count(project_id=body.project_id)
     return response
     
     
@@ -631,7 +728,7 @@ async def voting_service_get_user_votes(current_user: User = Depends(get_current
     """
     Get all votes by a user.
     """
-    response = await run_sync_in_thread(voting_service.get_user_votes, user=current_user)
+    response = await voting_service.get_user_votes(user=current_user)
     return response
     
     
@@ -644,7 +741,7 @@ async def voting_service_get_project_voters(body: BodyVotingServiceGetProjectVot
     """
     Get recent voters for a project (for displaying).
     """
-    response = await run_sync_in_thread(voting_service.get_project_voters, project_id=body.project_id, limit=body.limit)
+    response = await voting_service.get_project_voters(project_id=body.project_id, limit=body.limit)
     return response
     
     
@@ -670,7 +767,7 @@ async def donation_service_get_project_donations(body: BodyDonationServiceGetPro
     """
     Get donations for a project.
     """
-    response = await run_sync_in_thread(donation_service.get_project_donations, project_id=body.project_id, include_anonymous=body.include_anonymous)
+    response = await donation_service.get_project_donations(project_id=body.project_id, include_anonymous=body.include_anonymous)
     return response
     
     
@@ -683,7 +780,7 @@ async def donation_service_get_donation_statistics(body: BodyDonationServiceGetD
     """
     Get donation statistics for a project.
     """
-    response = await run_sync_in_thread(donation_service.get_donation_statistics, project_id=body.project_id)
+    response = await donation_service.get_donation_statistics(project_id=body.project_id)
     return response
     
     
@@ -696,7 +793,7 @@ async def donation_service_get_user_donations(current_user: User = Depends(get_c
     """
     Get all donations made by a user.
     """
-    response = await run_sync_in_thread(donation_service.get_user_donations, user=current_user)
+    response = await donation_service.get_user_donations(user=current_user)
     return response
     
     
@@ -709,7 +806,7 @@ async def donation_service_get_recent_donations(body: BodyDonationServiceGetRece
     """
     Get recent donations across all projects (excluding anonymous ones).
     """
-    response = await run_sync_in_thread(donation_service.get_recent_donations, limit=body.limit)
+    response = await donation_service.get_recent_donations(limit=body.limit)
     return response
     
     
@@ -722,7 +819,7 @@ async def donation_service_get_top_donors_for_project(body: BodyDonationServiceG
     """
     Get top donors for a project (excluding anonymous).
     """
-    response = await run_sync_in_thread(donation_service.get_top_donors_for_project, project_id=body.project_id, limit=body.limit)
+    response = await donation_service.get_top_donors_for_project(project_id=body.project_id, limit=body.limit)
     return response
     
     
@@ -735,7 +832,7 @@ async def donation_service_get_user_donation_total(current_user: User = Depends(
     """
     Get total amount donated by a user.
     """
-    response = await run_sync_in_thread(donation_service.get_user_donation_total, user=current_user)
+    response = await donation_service.get_user_donation_total(user=current_user)
     return response
     
     
@@ -748,7 +845,7 @@ async def timeline_service_get_project_timeline(body: BodyTimelineServiceGetProj
     """
     Get timeline items for a project, ordered by order_index.
     """
-    response = await run_sync_in_thread(timeline_service.get_project_timeline, project_id=body.project_id)
+    response = await timeline_service.get_project_timeline(project_id=body.project_id)
     return response
     
     
@@ -813,7 +910,7 @@ async def timeline_service_get_timeline_item_by_id(body: BodyTimelineServiceGetT
     """
     Get a specific timeline item by ID.
     """
-    response = await run_sync_in_thread(timeline_service.get_timeline_item_by_id, timeline_item_id=body.timeline_item_id)
+    response = await timeline_service.get_timeline_item_by_id(timeline_item_id=body.timeline_item_id)
     return response
     
     
@@ -826,7 +923,7 @@ async def timeline_service_get_recent_timeline_activity(body: BodyTimelineServic
     """
     Get recent timeline activity across all projects.
     """
-    response = await run_sync_in_thread(timeline_service.get_recent_timeline_activity, limit=body.limit)
+    response = await timeline_service.get_recent_timeline_activity(limit=body.limit)
     return response
     
     
@@ -839,7 +936,7 @@ async def comment_service_get_project_comments(body: BodyCommentServiceGetProjec
     """
     Get all comments for a project, ordered by creation date.
     """
-    response = await run_sync_in_thread(comment_service.get_project_comments, project_id=body.project_id)
+    response = await comment_service.get_project_comments(project_id=body.project_id)
     return response
     
     
@@ -852,7 +949,7 @@ async def comment_service_get_timeline_item_comments(body: BodyCommentServiceGet
     """
     Get comments for a specific timeline item.
     """
-    response = await run_sync_in_thread(comment_service.get_timeline_item_comments, timeline_item_id=body.timeline_item_id)
+    response = await comment_service.get_timeline_item_comments(timeline_item_id=body.timeline_item_id)
     return response
     
     
@@ -865,7 +962,7 @@ async def comment_service_get_threaded_comments(body: BodyCommentServiceGetThrea
     """
     Get threaded comments for a project or timeline item.
     """
-    response = await run_sync_in_thread(comment_service.get_threaded_comments, project_id=body.project_id, timeline_item_id=body.timeline_item_id)
+    response = await comment_service.get_threaded_comments(project_id=body.project_id, timeline_item_id=body.timeline_item_id)
     return response
     
     
@@ -917,7 +1014,7 @@ async def comment_service_get_recent_comments(body: BodyCommentServiceGetRecentC
     """
     Get recent comments across all projects.
     """
-    response = await run_sync_in_thread(comment_service.get_recent_comments, limit=body.limit)
+    response = await comment_service.get_recent_comments(limit=body.limit)
     return response
     
     
@@ -930,7 +1027,7 @@ async def comment_service_get_comment_count_for_project(body: BodyCommentService
     """
     Get total comment count for a project.
     """
-    response = await run_sync_in_thread(comment_service.get_comment_count_for_project, project_id=body.project_id)
+    response = await comment_service.get_comment_count_for_project(project_id=body.project_id)
     return response
     
     
@@ -943,7 +1040,7 @@ async def comment_service_get_user_comments(current_user: User = Depends(get_cur
     """
     Get all comments made by a user.
     """
-    response = await run_sync_in_thread(comment_service.get_user_comments, user=current_user)
+    response = await comment_service.get_user_comments(user=current_user)
     return response
     
     
@@ -956,7 +1053,7 @@ async def comment_service_search_comments(body: BodyCommentServiceSearchComments
     """
     Search comments by content.
     """
-    response = await run_sync_in_thread(comment_service.search_comments, query=body.query, project_id=body.project_id)
+    response = await comment_service.search_comments(query=body.query, project_id=body.project_id)
     return response
     
     
@@ -1003,6 +1100,32 @@ async def badge_service_get_user_badges(body: BodyBadgeServiceGetUserBadges = Bo
 
 
 
+@app.post('/api/badge_service/get_badges_for_projects', response_model=GetBadgesForProjectsOutputSchema, operation_id='badge_service_get_badges_for_projects')
+async def badge_service_get_badges_for_projects(body: BodyBadgeServiceGetBadgesForProjects = Body(...)) -> GetBadgesForProjectsOutputSchema:
+    """
+    Get the badges of many projects at once, as project id -> badges (empty for projects without any).
+    """
+    response = await run_sync_in_thread(badge_service.get_badges_for_projects, project_ids=body.project_ids)
+    return response
+    
+    
+
+
+
+
+@app.post('/api/badge_service/get_badges_for_users', response_model=GetBadgesForUsersOutputSchema, operation_id='badge_service_get_badges_for_users')
+async def badge_service_get_badges_for_users(body: BodyBadgeServiceGetBadgesForUsers = Body(...)) -> GetBadgesForUsersOutputSchema:
+    """
+    Get the badges of many users at once, as user id -> badges (empty for users without any).
+    """
+    response = await run_sync_in_thread(badge_service.get_badges_for_users, user_ids=body.user_ids)
+    return response
+    
+    
+
+
+
+
 @app.post('/api/badge_service/set_featured_badge', response_model=SetFeaturedBadgeOutputSchema, operation_id='badge_service_set_featured_badge')
 async def badge_service_set_featured_badge(body: BodyBadgeServiceSetFeaturedBadge = Body(...)) -> SetFeaturedBadgeOutputSchema:
     """
@@ -1017,7 +1140,7 @@ async def badge_service_set_featured_badge(body: BodyBadgeServiceSetFeaturedBadg
 
 
 @app.post('/api/badge_service/recalculate_badges', response_model=RecalculateBadgesOutputSchema, operation_id='badge_service_recalculate_badges')
-async def badge_service_recalculate_badges() -> RecalculateBadgesOutputSchema:
+async def badge_service_recalculate_badges(current_user: User = Depends(get_admin_user)) -> RecalculateBadgesOutputSchema:
     """
     Recalculate all badges for all users and projects (admin function).
     """
@@ -1029,6 +1152,32 @@ async def badge_service_recalculate_badges() -> RecalculateBadgesOutputSchema:
 
 
 
+@app.post('/api/badge_service/start_badge_recalculation', response_model=StartBadgeRecalculationOutputSchema, operation_id='badge_service_start_badge_recalculation')
+async def badge_service_start_badge_recalculation(body: BodyBadgeServiceStartBadgeRecalculation = Body(...), current_user: User = Depends(get_admin_user)) -> StartBadgeRecalculationOutputSchema:
+    """
+    Start recalculating all badges in the background, or resume a failed run (admin function).
+    """
+    response = await run_sync_in_thread(badge_service.start_badge_recalculation, resume=body.resume)
+    return response
+    
+    
+
+
+
+
+@app.post('/api/badge_service/get_badge_recalculation_status', response_model=GetBadgeRecalculationStatusOutputSchema, operation_id='badge_service_get_badge_recalculation_status')
+async def badge_service_get_badge_recalculation_status(current_user: User = Depends(get_admin_user)) -> GetBadgeRecalculationStatusOutputSchema:
+    """
+    Get the progress of the background badge recalculation.
+    """
+    response = await run_sync_in_thread(badge_service.get_badge_recalculation_status)
+    return response
+    
+    
+
+
+
+
 @app.post('/api/registration_service/check_username_availability', response_model=CheckUsernameAvailabilityOutputSchema, operation_id='registration_service_check_username_availability')
 async def registration_service_check_username_availability(body: BodyRegistrationServiceCheckUsernameAvailability = Body(...)) -> CheckUsernameAvailabilityOutputSchema:
     """
@@ -0,0 +1,86 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# Counts the database round trips check_badges_after_vote costs, i.e. the badge work behind every vote, by listening
+# to the query instrumentation. Needs a reachable database (NEON_CONN_URL) with a project and a user in it. Awards are
+# made inside a transaction that is rolled back, so the data is left as it was. Statements pipelined by Table.batch
+# are counted one each, so the figure is an upper bound on actual network round trips.
+#
+#   python -m benchmarks.badge_round_trips --iterations 20
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from collections import Counter
+from typing import Dict
+
+import argparse
+import time
+
+from core.badge_service import badge_catalogue, check_badges_after_vote
+from core.project import Project
+from solar import Table
+from solar.instrumentation import instrumentation
+
+######################################################################################################################
+# Benchmark
+######################################################################################################################
+
+
+class _Rollback(Exception):
+    """Raised to roll back the transaction the awards were made in"""
+
+
+def _sample_ids():
+    project_rows = Project.sql("SELECT id, user_id FROM projects LIMIT 1")
+    if not project_rows:
+        raise SystemExit("The projects table is empty; seed some data before benchmarking")
+    return project_rows[0]["id"], project_rows[0]["user_id"]
+
+
+def run(iterations: int) -> Dict:
+    project_id, user_id = _sample_ids()
+    badge_catalogue.all()  # Load the catalogue up front; it is cached between votes
+
+    statements = Counter()
+    hook = lambda event: statements.update([event.fingerprint])
+    instrumentation.add_hook(hook)
+    start = time.perf_counter()
+    try:
+        for _ in range(iterations):
+            try:
+                with Table.transaction():
+                    check_badges_after_vote(project_id, user_id)
+                    raise _Rollback()
+            except _Rollback:
+                pass
+    finally:
+        instrumentation.remove_hook(hook)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "round_trips_per_vote": sum(statements.values()) / iterations,
+        "ms_per_vote": elapsed * 1000 / iterations,
+        "statements": statements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database round trips per vote spent on badge evaluation")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="Print the count per statement fingerprint")
+    args = parser.parse_args()
+
+    result = run(args.iterations)
+    print(f"round trips per vote: {result['round_trips_per_vote']:.1f}")
+    print(f"        ms per vote: {result['ms_per_vote']:.2f}")
+    if args.verbose:
+        for statement, count in result["statements"].most_common():
+            print(f"{count / args.iterations:6.1f}  {statement}")
+
+
+if __name__ == "__main__":
+    main()
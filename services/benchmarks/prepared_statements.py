@@ -0,0 +1,85 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# Compares Table.sql latency with and without server-side prepared statements on the hot primary-key lookups used by
+# project_service, voting_service and badge_service. Needs a reachable database (NEON_CONN_URL) with data in it,
+# connected to directly or through a session pooler (see Config.prepared_statements_enabled).
+#
+#   python -m benchmarks.prepared_statements --iterations 2000
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from statistics import quantiles
+from typing import Dict, List
+
+import argparse
+import time
+
+from core.project import Project
+from core.vote import Vote
+from core.badge import Badge
+from solar.pool import prepared_statements
+
+######################################################################################################################
+# Benchmark
+######################################################################################################################
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    cuts = quantiles(samples, n=100)
+    return {"p50": cuts[49], "p99": cuts[98]}
+
+
+def _sample_params() -> List[tuple]:
+    project_rows = Project.sql("SELECT id, user_id FROM projects LIMIT 1")
+    if not project_rows:
+        raise SystemExit("The projects table is empty; seed some data before benchmarking")
+    project_id = project_rows[0]["id"]
+    user_id = project_rows[0]["user_id"]
+    return [
+        (Project, "SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id}),
+        (
+            Vote,
+            "SELECT * FROM votes WHERE user_id = %(user_id)s AND project_id = %(project_id)s",
+            {"user_id": user_id, "project_id": project_id},
+        ),
+        (Badge, "SELECT * FROM badges WHERE category = 'project' AND is_active = true", None),
+    ]
+
+
+def run(iterations: int, prepare: bool) -> Dict[str, float]:
+    statements = _sample_params()
+
+    # Warm the pool (and the prepared statements) before measuring
+    for table, sql_statement, params in statements:
+        table.sql(sql_statement, params, prepare=prepare)
+
+    samples = []
+    for _ in range(iterations):
+        for table, sql_statement, params in statements:
+            start = time.perf_counter()
+            table.sql(sql_statement, params, prepare=prepare)
+            samples.append((time.perf_counter() - start) * 1000)
+    return _percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Table.sql latency with and without prepared statements")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    for prepare in (False, True):
+        prepared_statements.reset_stats()
+        result = run(args.iterations, prepare)
+        label = "prepared" if prepare else "unprepared"
+        print(f"{label:>10}: p50={result['p50']:.3f}ms p99={result['p99']:.3f}ms")
+        if prepare:
+            print(f"{'registry':>10}: {prepared_statements.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# Compares the cost of turning result rows into Table instances: dict_row followed by Project(**row) (what the
+# services used to do) against Table.select's row factory, with and without validation. Runs without a database by
+# feeding the row factories the same tuples psycopg would hand them.
+#
+#   python -m benchmarks.row_decoding --rows 10000
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Callable, Dict
+
+import argparse
+import time
+import uuid
+
+from core.project import Project
+
+######################################################################################################################
+# Benchmark
+######################################################################################################################
+
+
+# (name, type oid) as psycopg reports them for SELECT * FROM projects
+COLUMNS = [
+    ("id", 2950), ("user_id", 2950), ("title", 25), ("description", 25), ("status", 25), ("budget", 1700),
+    ("current_funding", 1700), ("vote_count", 23), ("category", 25), ("tags", 1009), ("created_at", 1114),
+    ("updated_at", 1114),
+]
+
+
+def _fake_cursor():
+    """Just enough of a cursor for row factories: they only look at description"""
+    return SimpleNamespace(
+        description=[SimpleNamespace(name=name, type_code=type_oid) for name, type_oid in COLUMNS]
+    )
+
+
+def _rows(count: int) -> list:
+    now = datetime.now()
+    return [
+        (
+            uuid.uuid4(), uuid.uuid4(), f"Project {i}", "A community project " * 5, "planning",
+            Decimal("25000.00"), Decimal(i), i % 500, "environment", ["green", "park"],
+            now - timedelta(minutes=i), now,
+        )
+        for i in range(count)
+    ]
+
+
+def _dict_then_validate(rows):
+    # dict_row's make_row is dict(zip(names, values)); it needs a real result to read the names from
+    names = [name for name, _ in COLUMNS]
+    return [Project(**dict(zip(names, row))) for row in rows]
+
+
+def _select(validate: bool):
+    def decode(rows):
+        make_row = Project.__table_metadata__.row_factory(validate)(_fake_cursor())
+        return [make_row(row) for row in rows]
+
+    return decode
+
+
+def _best_of(decode: Callable, rows, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(rows)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Row decoding cost of dict_row + validation vs Table.select")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    decoders: Dict[str, Callable] = {
+        "dict_row + Project(**row)": _dict_then_validate,
+        "select(validate=True)": _select(True),
+        "select()": _select(False),
+    }
+    baseline = None
+    for label, decode in decoders.items():
+        elapsed = _best_of(decode, rows, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{label:>26}: {elapsed:8.2f}ms for {args.rows} rows ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from datetime import datetime, timedelta
+from uuid import UUID
+import argparse
+import time
+
+from core.user_activity_stats import UserActivityStats
+from core.project_activity_stats import ProjectActivityStats
+from core.project_vote_bucket import ProjectVoteBucket
+from solar import Table
+
+# ==================== Activity Counters ====================
+#
+# user_activity_stats and project_activity_stats hold running counts of what each user and project has done, so badge
+# checks and project statistics read one row by primary key instead of counting votes, donations and comments. The
+# record_* functions apply the change of one write and must be called inside the Table.transaction() that makes it,
+# so counters and rows commit together (a single vote is counted by vote_counter_ctes, in the statement that writes
+# it). Deletions that cascade (a project with its votes, a comment with its replies)
+# recount the affected rows with refresh_*; rebuild_activity_stats() recounts everything to repair any drift.
+# Votes are also counted per project and hour in project_vote_buckets, so "votes between a and b" sums at most one row
+# per hour instead of scanning votes.
+#
+# The counters are only trusted once rebuild_activity_stats() has filled them (it marks user_activity_stats when it
+# commits); until then counters_ready() is False and the readers count the raw tables, so a deploy doesn't serve zeros
+# while the rebuild hasn't run yet.
+
+USER_COUNTERS = ("project_count", "vote_count", "donation_count", "donation_total", "comment_count")
+PROJECT_COUNTERS = ("vote_count", "first_day_votes", "donation_count", "donation_total", "comment_count")
+VOTE_BUCKET_RETENTION = timedelta(days=30)  # hourly vote buckets older than this are pruned (see prune_vote_buckets)
+REBUILT_MARKER = "rebuilt by core.activity_stats"  # comment rebuild_activity_stats() sets on user_activity_stats
+COUNTERS_READY_RECHECK = 60  # seconds between checks for the rebuild marker, until it is found
+
+def _increment_sql(table_name: str, key_column: str, counters, deltas: Dict[str, str], key: str, source: str = "") -> str:
+    """INSERT ... ON CONFLICT that adds the deltas (SQL expressions) to one row, creating it if it doesn't exist"""
+    columns = ", ".join((key_column,) + tuple(counters) + ("updated_at",))
+    values = ", ".join(deltas.get(counter, "0") for counter in counters)
+    updates = ", ".join(
+        f"{counter} = {table_name}.{counter} + EXCLUDED.{counter}" for counter in counters if counter in deltas
+    )
+    conflict = f"DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at" if updates else "DO NOTHING"
+    return f"""
+        INSERT INTO {table_name} ({columns})
+        SELECT {key}, {values}, now() {source}
+        ON CONFLICT ({key_column}) {conflict}
+    """
+
+def _user_increment(deltas: Dict[str, str]) -> str:
+    return _increment_sql("user_activity_stats", "user_id", USER_COUNTERS, deltas, "%(user_id)s::uuid")
+
+def _project_increment(deltas: Dict[str, str]) -> str:
+    # Selected from projects so nothing is recorded for a project that doesn't exist (and its created_at is at hand)
+    return _increment_sql(
+        "project_activity_stats", "project_id", PROJECT_COUNTERS, deltas, "p.id",
+        "FROM projects p WHERE p.id = %(project_id)s"
+    )
+
+def vote_bucket_start(voted_at: datetime) -> datetime:
+    """Start of the hourly vote bucket a vote cast at voted_at falls in."""
+    return voted_at.replace(minute=0, second=0, microsecond=0)
+
+def vote_bucket_id(project_id: UUID, bucket_start: datetime) -> str:
+    # Same format as the to_char() in _REBUILD_VOTE_BUCKETS
+    return f"{project_id}:{bucket_start:%Y%m%d%H}"
+
+def vote_counter_ctes(source: str, delta: int = 1) -> str:
+    """CTEs that count the vote in the CTE named source (user_id, project_id, created_at; at most one row) as delta,
+    in the counters and in the hourly bucket it was cast in, so writing a vote and counting it is one statement.
+    """
+    delta = int(delta)
+    user_counted = _increment_sql(
+        "user_activity_stats", "user_id", USER_COUNTERS, {"vote_count": str(delta)}, "s.user_id",
+        f"FROM {source} s WHERE true"
+    )
+    project_counted = _increment_sql(
+        "project_activity_stats", "project_id", PROJECT_COUNTERS, {
+            "vote_count": str(delta),
+            "first_day_votes": f"CASE WHEN s.created_at <= p.created_at + INTERVAL '1 day' THEN {delta} ELSE 0 END",
+        }, "p.id",
+        f"FROM {source} s JOIN projects p ON p.id = s.project_id WHERE true"
+    )
+    # Same bucket id format as vote_bucket_id
+    bucket_counted = f"""
+        INSERT INTO project_vote_buckets (id, project_id, bucket_start, vote_count)
+        SELECT s.project_id::text || ':' || to_char(date_trunc('hour', s.created_at), 'YYYYMMDDHH24'),
+               s.project_id, date_trunc('hour', s.created_at), {delta}
+        FROM {source} s
+        ON CONFLICT (id) DO UPDATE SET vote_count = project_vote_buckets.vote_count + EXCLUDED.vote_count
+    """
+    return (
+        f"user_counted AS ({user_counted}), project_counted AS ({project_counted}), "
+        f"bucket_counted AS ({bucket_counted})"
+    )
+
+def record_votes(votes: List[Tuple[UUID, UUID, datetime]]):
+    """Count many new votes, given as (user_id, project_id, voted_at), with one statement per counter table."""
+    if not votes:
+        return
+    user_votes = Counter(user_id for user_id, _, _ in votes)
+    buckets = Counter((project_id, vote_bucket_start(voted_at)) for _, project_id, voted_at in votes)
+    params = {
+        "user_ids": list(user_votes),
+        "user_votes": list(user_votes.values()),
+        "project_ids": [project_id for _, project_id, _ in votes],
+        "voted_at": [voted_at for _, _, voted_at in votes],
+        "bucket_ids": [vote_bucket_id(project_id, bucket_start) for project_id, bucket_start in buckets],
+        "bucket_project_ids": [project_id for project_id, _ in buckets],
+        "bucket_starts": [bucket_start for _, bucket_start in buckets],
+        "bucket_votes": list(buckets.values()),
+    }
+    Table.batch([
+        (UserActivityStats, _increment_sql(
+            "user_activity_stats", "user_id", USER_COUNTERS, {"vote_count": "d.votes"}, "d.user_id",
+            "FROM unnest(%(user_ids)s::uuid[], %(user_votes)s::int[]) AS d(user_id, votes)"
+        ), params),
+        (ProjectActivityStats, _increment_sql(
+            "project_activity_stats", "project_id", PROJECT_COUNTERS,
+            {"vote_count": "d.votes", "first_day_votes": "d.first_day_votes"}, "d.project_id",
+            """FROM (
+                SELECT p.id AS project_id, COUNT(*) AS votes,
+                       COUNT(*) FILTER (WHERE v.voted_at <= p.created_at + INTERVAL '1 day') AS first_day_votes
+                FROM unnest(%(project_ids)s::uuid[], %(voted_at)s::timestamp[]) AS v(project_id, voted_at)
+                JOIN projects p ON p.id = v.project_id
+                GROUP BY p.id
+            ) d WHERE true"""
+        ), params),
+        (ProjectVoteBucket, """
+            INSERT INTO project_vote_buckets (id, project_id, bucket_start, vote_count)
+            SELECT * FROM unnest(
+                %(bucket_ids)s::text[], %(bucket_project_ids)s::uuid[], %(bucket_starts)s::timestamp[],
+                %(bucket_votes)s::int[]
+            )
+            ON CONFLICT (id) DO UPDATE SET vote_count = project_vote_buckets.vote_count + EXCLUDED.vote_count
+        """, params),
+    ])
+
+def _first_on_project_lock(kind: str) -> str:
+    """Transaction lock on one (kind, user, project), so the "first one on this project" check below it is serialized.
+
+    Without it two concurrent first donations (or comments) of a user to a project each miss the other's uncommitted
+    row and both count it. With it the second one waits for the first to commit, and then sees its row.
+    """
+    key = f"'{kind}:' || %(user_id)s::text || ':' || %(project_id)s::text"
+    return f"SELECT pg_advisory_xact_lock(hashtextextended({key}, 0))"
+
+def record_donation(user_id: UUID, project_id: UUID, donation_id: UUID, amount: float):
+    """Count a donation; call after the donation row is written."""
+    params = {"user_id": user_id, "project_id": project_id, "donation_id": donation_id, "amount": amount}
+    Table.batch([
+        (UserActivityStats, _first_on_project_lock("donation"), params),
+        (UserActivityStats, _user_increment({
+            # Only the first donation to a project adds to the distinct project count
+            "donation_count": """CASE WHEN EXISTS (
+                SELECT 1 FROM donations
+                WHERE user_id = %(user_id)s AND project_id = %(project_id)s AND id <> %(donation_id)s
+            ) THEN 0 ELSE 1 END""",
+            "donation_total": "%(amount)s",
+        }), params),
+        (ProjectActivityStats, _project_increment({"donation_count": "1", "donation_total": "%(amount)s"}), params),
+    ])
+
+def record_comment(user_id: UUID, project_id: UUID, comment_id: UUID):
+    """Count a comment; call after the comment row is written."""
+    params = {"user_id": user_id, "project_id": project_id, "comment_id": comment_id}
+    Table.batch([
+        (UserActivityStats, _first_on_project_lock("comment"), params),
+        (UserActivityStats, _user_increment({
+            # Only the first comment on a project adds to the distinct project count
+            "comment_count": """CASE WHEN EXISTS (
+                SELECT 1 FROM comments
+                WHERE user_id = %(user_id)s AND project_id = %(project_id)s AND id <> %(comment_id)s
+            ) THEN 0 ELSE 1 END""",
+        }), params),
+        (ProjectActivityStats, _project_increment({"comment_count": "1"}), params),
+    ])
+
+def record_project(user_id: UUID, project_id: UUID):
+    """Count a new project for its creator and start its own counters; call after the project row is written."""
+    params = {"user_id": user_id, "project_id": project_id}
+    Table.batch([
+        (UserActivityStats, _user_increment({"project_count": "1"}), params),
+        (ProjectActivityStats, _project_increment({}), params),
+    ])
+
+def forget_project(project_id: UUID):
+    """Drop the counters and vote buckets of a deleted project."""
+    params = {"project_id": project_id}
+    Table.batch([
+        (ProjectActivityStats, "DELETE FROM project_activity_stats WHERE project_id = %(project_id)s", params),
+        (ProjectVoteBucket, "DELETE FROM project_vote_buckets WHERE project_id = %(project_id)s", params),
+    ])
+
+# ==================== Recounting ====================
+
+_RECOUNT_USERS = """
+    INSERT INTO user_activity_stats (user_id, {counters}, updated_at)
+    SELECT u.id,
+           COALESCE(p.project_count, 0), COALESCE(v.vote_count, 0),
+           COALESCE(d.donation_count, 0), COALESCE(d.donation_total, 0),
+           COALESCE(c.comment_count, 0), now()
+    FROM users u
+    LEFT JOIN (SELECT user_id, COUNT(*) AS project_count FROM projects GROUP BY user_id) p ON p.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, COUNT(DISTINCT project_id) AS vote_count FROM votes GROUP BY user_id
+    ) v ON v.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, COUNT(DISTINCT project_id) AS donation_count, SUM(amount) AS donation_total
+        FROM donations GROUP BY user_id
+    ) d ON d.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, COUNT(DISTINCT project_id) AS comment_count FROM comments GROUP BY user_id
+    ) c ON c.user_id = u.id
+    {where}
+    ON CONFLICT (user_id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at
+"""
+
+_RECOUNT_PROJECTS = """
+    INSERT INTO project_activity_stats (project_id, {counters}, updated_at)
+    SELECT pr.id,
+           COALESCE(v.vote_count, 0), COALESCE(v.first_day_votes, 0),
+           COALESCE(d.donation_count, 0), COALESCE(d.donation_total, 0),
+           COALESCE(c.comment_count, 0), now()
+    FROM projects pr
+    LEFT JOIN (
+        SELECT votes.project_id, COUNT(*) AS vote_count,
+               COUNT(*) FILTER (WHERE votes.created_at <= projects.created_at + INTERVAL '1 day') AS first_day_votes
+        FROM votes JOIN projects ON votes.project_id = projects.id
+        GROUP BY votes.project_id
+    ) v ON v.project_id = pr.id
+    LEFT JOIN (
+        SELECT project_id, COUNT(*) AS donation_count, SUM(amount) AS donation_total
+        FROM donations GROUP BY project_id
+    ) d ON d.project_id = pr.id
+    LEFT JOIN (SELECT project_id, COUNT(*) AS comment_count FROM comments GROUP BY project_id) c ON c.project_id = pr.id
+    {where}
+    ON CONFLICT (project_id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at
+"""
+
+_REBUILD_VOTE_BUCKETS = """
+    INSERT INTO project_vote_buckets (id, project_id, bucket_start, vote_count)
+    SELECT project_id::text || ':' || to_char(date_trunc('hour', created_at), 'YYYYMMDDHH24'),
+           project_id, date_trunc('hour', created_at), COUNT(*)
+    FROM votes
+    WHERE created_at >= %(since)s
+    GROUP BY project_id, date_trunc('hour', created_at)
+"""
+
+def _recount_sql(template: str, counters, where: str) -> str:
+    # The WHERE clause also keeps ON CONFLICT from being parsed as part of the last JOIN
+    return template.format(
+        counters=", ".join(counters),
+        updates=", ".join(f"{counter} = EXCLUDED.{counter}" for counter in counters),
+        where=where,
+    )
+
+def refresh_user_stats(user_ids: Optional[List[UUID]] = None):
+    """Recount the counters of the given users (all users if None) from the votes, donations, comments and projects."""
+    where = "WHERE u.id = ANY(%(user_ids)s)" if user_ids is not None else "WHERE true"
+    UserActivityStats.sql(_recount_sql(_RECOUNT_USERS, USER_COUNTERS, where), {"user_ids": list(user_ids or [])})
+
+def refresh_project_stats(project_ids: Optional[List[UUID]] = None):
+    """Recount the counters of the given projects (all projects if None)."""
+    where = "WHERE pr.id = ANY(%(project_ids)s)" if project_ids is not None else "WHERE true"
+    ProjectActivityStats.sql(
+        _recount_sql(_RECOUNT_PROJECTS, PROJECT_COUNTERS, where), {"project_ids": list(project_ids or [])}
+    )
+
+def prune_vote_buckets():
+    """Drop the hourly vote buckets older than VOTE_BUCKET_RETENTION."""
+    ProjectVoteBucket.sql(
+        "DELETE FROM project_vote_buckets WHERE bucket_start < %(before)s",
+        {"before": vote_bucket_start(datetime.now() - VOTE_BUCKET_RETENTION)}
+    )
+
+def rebuild_activity_stats():
+    """Recount every counter and vote bucket in one transaction (repairs drift, fills the tables initially)."""
+    global _counters_ready
+    with Table.transaction():
+        refresh_user_stats()
+        refresh_project_stats()
+        # Counters of projects that no longer exist
+        ProjectActivityStats.sql(
+            "DELETE FROM project_activity_stats s WHERE NOT EXISTS (SELECT 1 FROM projects p WHERE p.id = s.project_id)"
+        )
+        # Vote buckets are recounted from scratch, which also drops the ones past retention
+        ProjectVoteBucket.sql("DELETE FROM project_vote_buckets")
+        ProjectVoteBucket.sql(
+            _REBUILD_VOTE_BUCKETS, {"since": vote_bucket_start(datetime.now() - VOTE_BUCKET_RETENTION)}
+        )
+        UserActivityStats.sql(f"COMMENT ON TABLE user_activity_stats IS '{REBUILT_MARKER}'")
+    _counters_ready = True
+
+_counters_ready = False
+_counters_checked_at: Optional[float] = None
+
+def counters_ready() -> bool:
+    """Whether rebuild_activity_stats() has filled the counters; once it has, this process stops checking."""
+    global _counters_ready, _counters_checked_at
+    if _counters_ready:
+        return True
+    if _counters_checked_at is not None and time.monotonic() - _counters_checked_at < COUNTERS_READY_RECHECK:
+        return False
+    rows = UserActivityStats.sql(
+        "SELECT obj_description('user_activity_stats'::regclass, 'pg_class') = %(marker)s AS ready",
+        {"marker": REBUILT_MARKER},
+        read_only=False,
+    )
+    _counters_ready = bool(rows and rows[0]["ready"])
+    _counters_checked_at = time.monotonic()
+    return _counters_ready
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance for the user and project activity counters")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: recount every counter from the raw tables")
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        rebuild_activity_stats()
+        print("Rebuilt user_activity_stats, project_activity_stats and project_vote_buckets")
@@ -14,6 +14,7 @@ class Badge(Table):
     icon: str  # emoji or icon name for display
     color: str  # hex color for badge styling
     criteria_value: Optional[int] = None  # numeric threshold (e.g., 10 for votes)
+    criteria_metric: Optional[str] = None  # metric criteria_value thresholds (e.g., "first_day_votes"); see badge_rules.METRICS
     is_active: bool = True  # whether badge is currently being awarded
     created_at: datetime = ColumnDetails(default_factory=datetime.now)
     
@@ -0,0 +1,154 @@
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from core.badge_service import calculate_project_badges, calculate_user_badges
+
+logger = logging.getLogger(__name__)
+
+# ==================== Badge Evaluation Queue ====================
+
+BADGE_QUEUE_WORKERS = 2  # background threads evaluating badges
+BADGE_QUEUE_COALESCE_WINDOW = 0.5  # seconds an evaluation waits for repeat events on the same user/project
+BADGE_QUEUE_DRAIN_TIMEOUT = 30  # seconds shutdown waits for the evaluations still queued
+
+class BadgeQueue:
+    """In-process queue that evaluates badges on background threads, off the request path.
+
+    An evaluation is scheduled coalesce_window seconds after the first event for its user or project; further events
+    for the same one before then are folded into it. A user or project is never evaluated by two workers at once, so
+    awards can't be duplicated, and an event arriving while it is being evaluated schedules one more pass. Queued
+    evaluations live in memory only: anything still queued when the process dies is picked up by the next badge
+    recalculation.
+    """
+
+    EVALUATORS = {"project": calculate_project_badges, "user": calculate_user_badges}
+
+    def __init__(self, workers: int = BADGE_QUEUE_WORKERS, coalesce_window: float = BADGE_QUEUE_COALESCE_WINDOW):
+        self.workers = workers
+        self.coalesce_window = coalesce_window
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[float, int, Tuple[str, Any]]] = []  # (due, sequence, key)
+        self._queued = set()  # keys in the heap
+        self._running = set()  # keys a worker is evaluating
+        self._sequence = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._counters = dict.fromkeys(("enqueued", "coalesced", "evaluated", "failed"), 0)
+
+    def enqueue(self, project_id=None, user_id=None):
+        """Schedule badge evaluation for a project and/or a user; returns immediately."""
+        keys = [("project", project_id)] if project_id is not None else []
+        # Users as str, like user_badges.user_id, so a UUID and its string coalesce into one evaluation
+        keys += [("user", str(user_id))] if user_id is not None else []
+        with self._condition:
+            self._start_workers()
+            due = time.monotonic() + self.coalesce_window
+            for key in keys:
+                if key in self._queued:
+                    self._counters["coalesced"] += 1
+                    continue
+                self._queued.add(key)
+                heapq.heappush(self._heap, (due, next(self._sequence), key))
+                self._counters["enqueued"] += 1
+            self._condition.notify_all()
+
+    def _start_workers(self):
+        if self._threads:
+            return
+        self._threads = [
+            threading.Thread(target=self._work, name=f"badge-queue-{i}", daemon=True) for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _next_key(self) -> Optional[Tuple[str, Any]]:
+        """Wait for the next evaluation that is due; None once stop() has drained the queue. Holds the condition."""
+        while True:
+            if not self._heap:
+                if self._stopping:
+                    return None
+                self._condition.wait()
+                continue
+
+            due, _, key = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0 and not self._stopping:
+                self._condition.wait(delay)
+                continue
+
+            heapq.heappop(self._heap)
+            if key in self._running:
+                # Another worker is still evaluating it; try again once that pass is done
+                heapq.heappush(self._heap, (time.monotonic() + self.coalesce_window, next(self._sequence), key))
+                self._condition.wait(self.coalesce_window)
+                continue
+
+            self._queued.discard(key)
+            self._running.add(key)
+            return key
+
+    def _work(self):
+        while True:
+            with self._condition:
+                key = self._next_key()
+            if key is None:
+                return
+
+            kind, subject_id = key
+            failed = False
+            try:
+                self.EVALUATORS[kind](subject_id)
+            except Exception as e:
+                failed = True
+                logger.warning(f"Badge evaluation failed for {kind} {subject_id}: {str(e)}")
+            finally:
+                with self._condition:
+                    self._running.discard(key)
+                    self._counters["failed" if failed else "evaluated"] += 1
+                    self._condition.notify_all()
+
+    def pending(self) -> int:
+        """Evaluations queued or in progress."""
+        with self._condition:
+            return len(self._queued) + len(self._running)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued evaluation has run, without waiting out the coalesce window; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._flush()
+            while self._queued or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def _flush(self):
+        """Make every queued evaluation due now. Holds the condition."""
+        now = time.monotonic()
+        self._heap = [(min(due, now), sequence, key) for due, sequence, key in self._heap]
+        heapq.heapify(self._heap)
+        self._condition.notify_all()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Run what is still queued, then stop the workers (they start again on the next enqueue)."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads = self._threads
+        for thread in threads:
+            thread.join(timeout)
+        with self._condition:
+            self._threads = [thread for thread in threads if thread.is_alive()]
+            self._stopping = False
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {**self._counters, "queued": len(self._queued), "running": len(self._running)}
+
+badge_queue = BadgeQueue()
@@ -0,0 +1,23 @@
+from solar import Table, ColumnDetails
+from datetime import datetime, timezone
+from typing import Optional
+import uuid
+
+class BadgeRecalculationRun(Table):
+    __tablename__ = "badge_recalculation_runs"
+    id: str = ColumnDetails(primary_key=True)  # Name of the job; one row per job, overwritten by every run
+    state: str  # running, completed or failed
+    phase: str  # users or projects
+    cursor: Optional[uuid.UUID] = None  # Last id committed in the current phase; resume continues after it
+    chunk_size: int
+    users_total: int = 0
+    projects_total: int = 0
+    users_processed: int = 0
+    projects_processed: int = 0
+    users_awarded: int = 0
+    projects_awarded: int = 0
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    # Heartbeat, written with every chunk; aware UTC so it's stored exactly whatever the process time zone is
+    updated_at: datetime = ColumnDetails(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
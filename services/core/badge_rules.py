@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional, Tuple
+import logging
+import uuid
+
+from core.badge import Badge
+
+logger = logging.getLogger(__name__)
+
+# ==================== Badge Rules ====================
+
+class BadgeRuleError(ValueError):
+    """A badge definition that can't be turned into a rule"""
+
+# Every metric the badge service computes, per badge category; criteria can threshold any of them
+METRICS = {
+    "user": frozenset(("project_count", "vote_count", "donation_count", "donation_total", "comment_count")),
+    "project": frozenset((
+        "vote_count", "first_day_votes", "recent_votes", "is_trending", "donation_total", "funded_percent",
+        "comment_count",
+    )),
+}
+
+# Which metric each criteria_* column of a badge thresholds, per badge category
+CRITERIA_METRICS = {
+    "user": {
+        "criteria_projects": "project_count",  # projects created
+        "criteria_votes": "vote_count",  # projects voted on
+        "criteria_donations": "donation_count",  # projects donated to
+        "criteria_comments": "comment_count",  # projects commented on
+    },
+    "project": {
+        "criteria_votes": "vote_count",
+        "criteria_donations": "donation_total",
+        "criteria_comments": "comment_count",
+    },
+}
+
+# The metric criteria_value thresholds for the built-in badges, used while their rows leave criteria_metric empty
+CRITERIA_VALUE_METRICS = {
+    "rising_star": "first_day_votes",
+    "community_favorite": "vote_count",
+    "peoples_choice": "vote_count",
+    "fully_funded": "funded_percent",
+    "overfunded": "funded_percent",
+    "active_discussion": "comment_count",
+    "trending": "recent_votes",
+    "project_creator": "project_count",
+    "prolific_creator": "project_count",
+    "master_builder": "project_count",
+    "supporter": "vote_count",
+    "champion": "vote_count",
+    "contributor": "donation_count",
+    "patron": "donation_count",
+    "benefactor": "donation_total",
+    "engaged_citizen": "comment_count",
+}
+
+# Criteria of the built-in badges, used while their rows in the badges table leave the criteria columns empty
+DEFAULT_CRITERIA = {
+    "rising_star": {"first_day_votes": 10},
+    "community_favorite": {"vote_count": 50},
+    "peoples_choice": {"vote_count": 100},
+    "fully_funded": {"funded_percent": 100},
+    "overfunded": {"funded_percent": 150},
+    "active_discussion": {"comment_count": 25},
+    "trending": {"recent_votes": 20, "is_trending": 1},
+    "newcomer": {},  # no thresholds: every user earns it
+    "project_creator": {"project_count": 1},
+    "prolific_creator": {"project_count": 5},
+    "master_builder": {"project_count": 10},
+    "supporter": {"vote_count": 10},
+    "champion": {"vote_count": 50},
+    "contributor": {"donation_count": 1},
+    "patron": {"donation_count": 10},
+    "benefactor": {"donation_total": 1000},
+    "engaged_citizen": {"comment_count": 20},
+    "community_leader": {"project_count": 5, "vote_count": 50, "donation_count": 1},
+}
+
+# Criteria a badge always has on top of the configured ones (trending means being in the cross-project ranking)
+REQUIRED_CRITERIA = {"trending": {"is_trending": 1}}
+
+# Metrics that are recorded as the earned value through a more telling one (a funding badge records the amount)
+EARNED_VALUE_METRICS = {"funded_percent": "donation_total"}
+
+class BadgeRule:
+    """A badge and the metric >= threshold predicates that earn it"""
+
+    __slots__ = ("badge_id", "badge_type", "predicates", "value_metric")
+
+    def __init__(self, badge_id: uuid.UUID, badge_type: str, predicates: List[Tuple[str, float]]):
+        self.badge_id = badge_id
+        self.badge_type = badge_type
+        self.predicates = predicates
+        # The first criterion is the one the award records as its earned/context value
+        value_metric = predicates[0][0] if predicates else None
+        self.value_metric = EARNED_VALUE_METRICS.get(value_metric, value_metric)
+
+    def earned_value(self, metrics: Dict) -> Optional[int]:
+        return int(metrics[self.value_metric]) if self.value_metric else None
+
+def _criteria(badge: Badge) -> Optional[Dict[str, float]]:
+    """metric -> threshold for a badge, from its criteria columns or else the built-in defaults; None if it has none"""
+    metrics = METRICS.get(badge.category)
+    if metrics is None:
+        raise BadgeRuleError(f"Badge {badge.badge_type} has unknown category {badge.category!r}")
+
+    criteria = {}
+    if badge.criteria_value is not None:
+        metric = badge.criteria_metric or CRITERIA_VALUE_METRICS.get(badge.badge_type)
+        if metric is None:
+            raise BadgeRuleError(f"Badge {badge.badge_type} has a criteria_value but no criteria_metric")
+        if metric not in metrics:
+            raise BadgeRuleError(
+                f"Badge {badge.badge_type} thresholds unknown {badge.category} metric {metric!r}; "
+                f"known: {', '.join(sorted(metrics))}"
+            )
+        criteria[metric] = badge.criteria_value
+    for column, metric in CRITERIA_METRICS.get(badge.category, {}).items():
+        threshold = getattr(badge, column)
+        if threshold is not None:
+            criteria[metric] = threshold
+
+    if criteria:
+        return {**criteria, **REQUIRED_CRITERIA.get(badge.badge_type, {})}
+    return DEFAULT_CRITERIA.get(badge.badge_type)
+
+def compile_rules(badges: List[Badge]) -> Dict[str, List[BadgeRule]]:
+    """Rules per category for the given badge definitions; badges without any criteria are left out.
+
+    A badge whose definition is invalid (unknown category, criteria naming a metric that isn't computed) is logged and
+    left out too, so one bad row doesn't stop the other badges from being awarded.
+    """
+    rules: Dict[str, List[BadgeRule]] = {}
+    for badge in badges:
+        try:
+            criteria = _criteria(badge)
+        except BadgeRuleError as e:
+            logger.error(f"Skipping badge {badge.badge_type}: {str(e)}")
+            continue
+        if criteria is None:
+            logger.warning(f"Badge {badge.badge_type} has no criteria and won't be awarded")
+            continue
+        rules.setdefault(badge.category, []).append(BadgeRule(badge.id, badge.badge_type, list(criteria.items())))
+    return rules
+
+def earned_badges(rules: List[BadgeRule], metrics: Dict, awarded) -> List[Tuple[uuid.UUID, Optional[int]]]:
+    """(badge id, earned value) for every rule the metrics satisfy whose badge isn't already awarded"""
+    earned = []
+    for rule in rules:
+        if rule.badge_id in awarded:
+            continue
+        if all(metrics[metric] >= threshold for metric, threshold in rule.predicates):
+            earned.append((rule.badge_id, rule.earned_value(metrics)))
+    return earned
@@ -1,202 +1,214 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
+import argparse
+import logging
+import threading
+import time
 import uuid
 
 from core.badge import Badge
+from core.badge_recalculation_run import BadgeRecalculationRun
+from core.badge_rules import BadgeRule, compile_rules, earned_badges
+from core.activity_stats import counters_ready, vote_bucket_start
+from core.trending import TRENDING_WINDOW, trending_ranking
 from core.user_badge import UserBadge
 from core.project_badge import ProjectBadge
 from core.project import Project
-from core.vote import Vote
-from core.donation import Donation
-from core.comment import Comment
 from core.user import User
-from solar.access import public
+from solar import Table
+from solar.access import authenticated, public
+
+logger = logging.getLogger(__name__)
+
+# ==================== Badge Catalogue ====================
+
+BADGE_CATALOGUE_TTL = 300  # seconds between reloads of the badge definitions
+
+class BadgeCatalogue:
+    """Process-wide cache of the active badge definitions, indexed by category and badge_type"""
+
+    def __init__(self, ttl: float = BADGE_CATALOGUE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._badges: List[Badge] = []
+        self._by_category: Dict[str, List[Badge]] = {}
+        self._by_type: Dict[str, Badge] = {}
+        self._rules: Dict[str, List[BadgeRule]] = {}
+
+    def _refresh(self):
+        """Reload the catalogue if it is older than the TTL; only one thread queries, the others wait for it"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            badges = Badge.select("SELECT * FROM badges WHERE is_active = true ORDER BY category, name")
+            by_category: Dict[str, List[Badge]] = {}
+            for badge in badges:
+                by_category.setdefault(badge.category, []).append(badge)
+            self._badges = badges
+            self._by_category = by_category
+            self._by_type = {badge.badge_type: badge for badge in badges}
+            self._rules = compile_rules(badges)
+            self._loaded_at = time.monotonic()
+
+    def all(self) -> List[Badge]:
+        self._refresh()
+        return list(self._badges)
+
+    def for_category(self, category: str) -> List[Badge]:
+        """Active badges of a category ("project" or "user")"""
+        self._refresh()
+        return list(self._by_category.get(category, []))
+
+    def rules(self, category: str) -> List[BadgeRule]:
+        """Compiled award rules of the active badges of a category"""
+        self._refresh()
+        return self._rules.get(category, [])
+
+    def get(self, badge_type: str) -> Optional[Badge]:
+        self._refresh()
+        return self._by_type.get(badge_type)
+
+    def invalidate(self):
+        """Force a reload on next use (call after changing the badges table)"""
+        with self._lock:
+            self._loaded_at = None
+
+badge_catalogue = BadgeCatalogue()
 
 # ==================== Badge Management ====================
 
+BADGE_LOOKUP_MAX_IDS = 200  # ids per get_badges_for_projects / get_badges_for_users call
+
 @public
 def get_all_badges() -> List[Badge]:
     """Get all available badges in the system."""
-    return [Badge(**badge) for badge in Badge.sql("SELECT * FROM badges WHERE is_active = true ORDER BY category, name")]
+    return badge_catalogue.all()
 
 @public
 def get_project_badges(project_id: uuid.UUID) -> List[Dict]:
     """Get all badges for a specific project with badge details."""
+    return get_badges_for_projects([project_id])[project_id]
+
+@public
+def get_user_badges(user_id: str) -> List[Dict]:
+    """Get all badges for a specific user with badge details."""
+    return get_badges_for_users([user_id])[user_id]
+
+@public
+def get_badges_for_projects(project_ids: List[uuid.UUID]) -> Dict[uuid.UUID, List[Dict]]:
+    """Get the badges of many projects at once, as project id -> badges (empty for projects without any)."""
+    _check_badge_lookup_size(project_ids)
+    badges = {project_id: [] for project_id in project_ids}
+    if not badges:
+        return badges
+
     query = """
     SELECT pb.*, b.name, b.description, b.icon, b.color, b.badge_type, b.category
     FROM project_badges pb
     JOIN badges b ON pb.badge_id = b.id
-    WHERE pb.project_id = %(project_id)s AND pb.is_active = true
+    WHERE pb.project_id = ANY(%(project_ids)s) AND pb.is_active = true
     """
-    results = Badge.sql(query, {"project_id": project_id})
-    
-    badges = []
-    for result in results:
-        badge_data = {
+    for result in Badge.sql(query, {"project_ids": list(badges)}):
+        badges[result["project_id"]].append({
             "id": result["id"],
             "badge_id": result["badge_id"],
             "project_id": result["project_id"],
             "earned_at": result["earned_at"],
-            "badge": {
-                "name": result["name"],
-                "description": result["description"],
-                "icon": result["icon"],
-                "color": result["color"],
-                "badge_type": result["badge_type"],
-                "category": result["category"]
-            },
+            "badge": _badge_details(result),
             "is_featured": result["is_featured"]
-        }
-        badges.append(badge_data)
-    
+        })
+
     return badges
 
 @public
-def get_user_badges(user_id: str) -> List[Dict]:
-    """Get all badges for a specific user with badge details."""
+def get_badges_for_users(user_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Get the badges of many users at once, as user id -> badges (empty for users without any)."""
+    _check_badge_lookup_size(user_ids)
+    badges = {user_id: [] for user_id in user_ids}
+    if not badges:
+        return badges
+
     query = """
     SELECT ub.*, b.name, b.description, b.icon, b.color, b.badge_type, b.category
     FROM user_badges ub
     JOIN badges b ON ub.badge_id = b.id
-    WHERE ub.user_id = %(user_id)s
+    WHERE ub.user_id = ANY(%(user_ids)s)
     """
-    results = Badge.sql(query, {"user_id": user_id})
-    
-    badges = []
-    for result in results:
-        badge_data = {
+    for result in Badge.sql(query, {"user_ids": list(badges)}):
+        badges[result["user_id"]].append({
             "id": result["id"],
             "badge_id": result["badge_id"],
             "user_id": result["user_id"],
             "earned_at": result["earned_at"],
-            "badge": {
-                "name": result["name"],
-                "description": result["description"],
-                "icon": result["icon"],
-                "color": result["color"],
-                "badge_type": result["badge_type"],
-                "category": result["category"]
-            },
+            "badge": _badge_details(result),
             "is_featured": result["is_featured"],
             "progress_value": result["progress_value"]
-        }
-        badges.append(badge_data)
-    
+        })
+
     return badges
 
+def _check_badge_lookup_size(ids: List):
+    if len(ids) > BADGE_LOOKUP_MAX_IDS:
+        raise ValueError(f"At most {BADGE_LOOKUP_MAX_IDS} ids can be looked up at once")
+
+def _badge_details(result: Dict) -> Dict:
+    return {
+        "name": result["name"],
+        "description": result["description"],
+        "icon": result["icon"],
+        "color": result["color"],
+        "badge_type": result["badge_type"],
+        "category": result["category"]
+    }
+
 @public
 def set_featured_badge(user_id: str, badge_id: uuid.UUID) -> UserBadge:
     """Set a badge as featured for a user's profile."""
-    # First, unfeature all badges for this user
-    UserBadge.sql(
-        "UPDATE user_badges SET is_featured = false WHERE user_id = %(user_id)s",
-        {"user_id": user_id}
-    )
+    with Table.transaction():
+        # First, unfeature all badges for this user
+        UserBadge.sql(
+            "UPDATE user_badges SET is_featured = false WHERE user_id = %(user_id)s",
+            {"user_id": user_id}
+        )
     
-    # Then, feature the selected badge
-    UserBadge.sql(
-        "UPDATE user_badges SET is_featured = true WHERE user_id = %(user_id)s AND badge_id = %(badge_id)s",
-        {"user_id": user_id, "badge_id": badge_id}
-    )
+        # Then, feature the selected badge
+        UserBadge.sql(
+            "UPDATE user_badges SET is_featured = true WHERE user_id = %(user_id)s AND badge_id = %(badge_id)s",
+            {"user_id": user_id, "badge_id": badge_id}
+        )
     
-    # Also update the user's featured badge
-    User.sql(
-        "UPDATE users SET featured_badge_id = %(badge_id)s WHERE id = %(user_id)s",
-        {"user_id": user_id, "badge_id": badge_id}
-    )
+        # Also update the user's featured badge
+        User.sql(
+            "UPDATE users SET featured_badge_id = %(badge_id)s WHERE id = %(user_id)s",
+            {"user_id": user_id, "badge_id": badge_id}
+        )
     
-    # Return the updated badge
-    results = UserBadge.sql(
-        "SELECT * FROM user_badges WHERE user_id = %(user_id)s AND badge_id = %(badge_id)s",
-        {"user_id": user_id, "badge_id": badge_id}
-    )
+        # Return the updated badge
+        results = UserBadge.select(
+            "SELECT * FROM user_badges WHERE user_id = %(user_id)s AND badge_id = %(badge_id)s",
+            {"user_id": user_id, "badge_id": badge_id}
+        )
     
     if not results:
         return None
     
-    return UserBadge(**results[0])
+    return results[0]
 
 # ==================== Badge Calculation Logic ====================
 
 def calculate_project_badges(project_id: uuid.UUID) -> List[ProjectBadge]:
     """Calculate and award badges for a project based on its activity."""
-    # Get the project data
-    project_results = Project.sql("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
-    if not project_results:
+    # One query fetches the project, every metric the rules need and the badges it already has
+    metrics = _project_metrics(project_id)
+    if metrics is None:
         return []
     
-    project = Project(**project_results[0])
-    
-    # Get badge definitions
-    badge_definitions = Badge.sql("SELECT * FROM badges WHERE category = 'project' AND is_active = true")
-    badges_to_award = []
-    
-    for badge_def in badge_definitions:
-        badge_type = badge_def["badge_type"]
-        badge_id = badge_def["id"]
-        
-        # Check if badge already awarded
-        existing = ProjectBadge.sql(
-            "SELECT * FROM project_badges WHERE project_id = %(project_id)s AND badge_id = %(badge_id)s",
-            {"project_id": project_id, "badge_id": badge_id}
-        )
-        
-        if existing:
-            continue  # Skip already awarded badges
-            
-        # Check each badge type's criteria
-        if badge_type == "rising_star":
-            # Rising Star: 10+ votes in first 24 hours
-            created_date = project.created_at
-            vote_count = _count_votes_in_timeframe(project_id, created_date, created_date + timedelta(days=1))
-            
-            if vote_count >= 10:
-                badges_to_award.append(_create_project_badge(project_id, badge_id, earned_value=vote_count))
-                
-        elif badge_type == "community_favorite":
-            # Community Favorite: 50+ total votes
-            vote_count = _count_votes(project_id)
-            
-            if vote_count >= 50:
-                badges_to_award.append(_create_project_badge(project_id, badge_id, earned_value=vote_count))
-                
-        elif badge_type == "peoples_choice":
-            # People's Choice: 100+ total votes
-            vote_count = _count_votes(project_id)
-            
-            if vote_count >= 100:
-                badges_to_award.append(_create_project_badge(project_id, badge_id, earned_value=vote_count))
-                
-        elif badge_type == "fully_funded":
-            # Fully Funded: Reached 100% of donation goal
-            if project.budget and project.budget > 0:
-                donation_total = _get_donation_total(project_id)
-                if donation_total >= project.budget:
-                    badges_to_award.append(_create_project_badge(project_id, badge_id, earned_value=int(donation_total)))
-                    
-        elif badge_type == "overfunded":
-            # Overfunded: Exceeded donation goal by 50%+
-            if project.budget and project.budget > 0:
-                donation_total = _get_donation_total(project_id)
-                if donation_total >= (project.budget * 1.5):
-                    badges_to_award.append(_create_project_badge(project_id, badge_id, earned_value=int(donation_total)))
-                    
-        elif badge_type == "active_discussion":
-            # Active Discussion: 25+ comments
-            comment_count = _count_comments(project_id)
-            
-            if comment_count >= 25:
-                badges_to_award.append(_create_project_badge(project_id, badge_id, earned_value=comment_count))
-                
-        elif badge_type == "trending":
-            # Trending: Most votes in the last 7 days
-            # This is more complex and would require comparing against other projects
-            # Simplified version for now:
-            recent_votes = _count_votes_in_timeframe(project_id, datetime.now() - timedelta(days=7), datetime.now())
-            if recent_votes >= 20:  # Arbitrary threshold for "trending"
-                badges_to_award.append(_create_project_badge(project_id, badge_id, earned_value=recent_votes))
+    badges_to_award = _evaluate_project_badges(project_id, metrics)
     
-    # Save all new badges
+    # Save all new badges in one INSERT
     if badges_to_award:
         ProjectBadge.sync_many(badges_to_award)
     
@@ -204,135 +216,306 @@ def calculate_project_badges(project_id: uuid.UUID) -> List[ProjectBadge]:
 
 def calculate_user_badges(user_id: str) -> List[UserBadge]:
     """Calculate and award badges for a user based on their activity."""
-    # Get badge definitions
-    badge_definitions = Badge.sql("SELECT * FROM badges WHERE category = 'user' AND is_active = true")
-    badges_to_award = []
-    
-    for badge_def in badge_definitions:
-        badge_type = badge_def["badge_type"]
-        badge_id = badge_def["id"]
-        
-        # Check if badge already awarded
-        existing = UserBadge.sql(
-            "SELECT * FROM user_badges WHERE user_id = %(user_id)s AND badge_id = %(badge_id)s",
-            {"user_id": user_id, "badge_id": badge_id}
-        )
-        
-        if existing:
-            continue  # Skip already awarded badges
-            
-        # Check each badge type's criteria
-        if badge_type == "newcomer":
-            # Newcomer: First registered user - always award for new users
-            badges_to_award.append(_create_user_badge(user_id, badge_id))
-                
-        elif badge_type == "project_creator":
-            # Project Creator: Created first project
-            project_count = _count_user_projects(user_id)
-            
-            if project_count >= 1:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=project_count))
-                
-        elif badge_type == "prolific_creator":
-            # Prolific Creator: Created 5+ projects
-            project_count = _count_user_projects(user_id)
-            
-            if project_count >= 5:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=project_count))
-                
-        elif badge_type == "master_builder":
-            # Master Builder: Created 10+ projects
-            project_count = _count_user_projects(user_id)
-            
-            if project_count >= 10:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=project_count))
-                
-        elif badge_type == "supporter":
-            # Supporter: Voted on 10+ projects
-            vote_count = _count_user_votes(user_id)
-            
-            if vote_count >= 10:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=vote_count))
-                
-        elif badge_type == "champion":
-            # Champion: Voted on 50+ projects
-            vote_count = _count_user_votes(user_id)
-            
-            if vote_count >= 50:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=vote_count))
-                
-        elif badge_type == "contributor":
-            # Contributor: First donation made
-            donation_count = _count_user_donations(user_id)
-            
-            if donation_count >= 1:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=donation_count))
-                
-        elif badge_type == "patron":
-            # Patron: Donated to 10+ projects
-            donation_count = _count_user_donations(user_id)
-            
-            if donation_count >= 10:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=donation_count))
-                
-        elif badge_type == "benefactor":
-            # Benefactor: Total donations exceed 1000 units
-            donation_amount = _get_user_donation_total(user_id)
-            
-            if donation_amount >= 1000:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=int(donation_amount)))
-                
-        elif badge_type == "engaged_citizen":
-            # Engaged Citizen: Commented on 20+ projects
-            comment_count = _count_user_comments(user_id)
-            
-            if comment_count >= 20:
-                badges_to_award.append(_create_user_badge(user_id, badge_id, context_value=comment_count))
-                
-        elif badge_type == "community_leader":
-            # Community Leader: Combination of 5+ projects, 50+ votes, and donations
-            project_count = _count_user_projects(user_id)
-            vote_count = _count_user_votes(user_id)
-            donation_count = _count_user_donations(user_id)
-            
-            if project_count >= 5 and vote_count >= 50 and donation_count >= 1:
-                badge = _create_user_badge(user_id, badge_id)
-                badge.context_value = project_count  # Store projects as context
-                badges_to_award.append(badge)
+    # user_badges.user_id is text, while callers often hold the users.id UUID
+    user_id = str(user_id)
+    # One query fetches every metric the rules need and the badges the user already has
+    badges_to_award = _evaluate_user_badges(user_id, _user_metrics(user_id))
     
-    # Save all new badges
+    # Save all new badges in one INSERT
     if badges_to_award:
         UserBadge.sync_many(badges_to_award)
         
         # Update the user's badge count
-        total_badges = len(UserBadge.sql("SELECT id FROM user_badges WHERE user_id = %(user_id)s", {"user_id": user_id}))
-        User.sql("UPDATE users SET badge_count = %(count)s WHERE id = %(user_id)s", 
-                {"user_id": user_id, "count": total_badges})
+        User.sql(
+            """
+            UPDATE users SET badge_count = (SELECT COUNT(*) FROM user_badges WHERE user_id = %(user_id)s)
+            WHERE id = %(user_id)s
+            """,
+            {"user_id": user_id}
+        )
     
     return badges_to_award
 
-@public
-def recalculate_badges() -> Dict:
-    """Recalculate all badges for all users and projects (admin function)."""
-    # Get all users
-    users = User.sql("SELECT id FROM users")
+def _evaluate_project_badges(project_id: uuid.UUID, metrics: Dict) -> List[ProjectBadge]:
+    """The project badges earned according to metrics that the project doesn't have yet."""
+    earned = earned_badges(badge_catalogue.rules("project"), metrics, set(metrics["awarded_badge_ids"]))
+    return [_create_project_badge(project_id, badge_id, earned_value=value) for badge_id, value in earned]
+
+def _evaluate_user_badges(user_id: str, metrics: Dict) -> List[UserBadge]:
+    """The user badges earned according to metrics that the user doesn't have yet."""
+    earned = earned_badges(badge_catalogue.rules("user"), metrics, set(metrics["awarded_badge_ids"]))
+    return [_create_user_badge(user_id, badge_id, context_value=value) for badge_id, value in earned]
+
+# ==================== Bulk Recalculation ====================
+
+BADGE_RECALCULATION_CHUNK_SIZE = 500  # users or projects evaluated per metrics query
+BADGE_RECALCULATION_STALE_AFTER = timedelta(minutes=15)  # a saved "running" run not updated for this long has died
+
+def _recalculate_project_chunk(after_id: Optional[uuid.UUID], chunk_size: int) -> Tuple[Optional[uuid.UUID], int, int]:
+    """Evaluate the next chunk of projects (by id) and award what they've earned in one transaction.
+
+    Returns the last project id of the chunk (None when there are no more), the projects evaluated and the badges
+    awarded.
+    """
+    rows = _project_metrics_chunk(after_id, chunk_size)
+    if not rows:
+        return None, 0, 0
+    
+    badges_to_award = []
+    for metrics in rows:
+        badges_to_award.extend(_evaluate_project_badges(metrics["project_id"], metrics))
+    
+    if badges_to_award:
+        ProjectBadge.sync_many(badges_to_award)
     
-    # Get all projects
-    projects = Project.sql("SELECT id FROM projects")
+    return rows[-1]["project_id"], len(rows), len(badges_to_award)
+
+def _recalculate_user_chunk(after_id: Optional[uuid.UUID], chunk_size: int) -> Tuple[Optional[uuid.UUID], int, int]:
+    """Evaluate the next chunk of users (by id) and award what they've earned in one transaction.
+
+    Returns the last user id of the chunk (None when there are no more), the users evaluated and the badges awarded.
+    """
+    rows = _user_metrics_chunk(after_id, chunk_size)
+    if not rows:
+        return None, 0, 0
     
-    user_badges = []
-    for user in users:
-        user_badges.extend(calculate_user_badges(user["id"]))
+    badges_to_award = []
+    for metrics in rows:
+        badges_to_award.extend(_evaluate_user_badges(str(metrics["user_id"]), metrics))
     
-    project_badges = []
-    for project in projects:
-        project_badges.extend(calculate_project_badges(project["id"]))
+    if badges_to_award:
+        with Table.transaction():
+            UserBadge.sync_many(badges_to_award)
+            
+            # Update the badge count of every user that got something, in one statement
+            User.sql(
+                """
+                UPDATE users u SET badge_count = c.count
+                FROM (
+                    SELECT user_id, COUNT(*) AS count FROM user_badges
+                    WHERE user_id = ANY(%(user_ids)s)
+                    GROUP BY user_id
+                ) c
+                WHERE u.id = c.user_id::uuid
+                """,
+                {"user_ids": list({badge.user_id for badge in badges_to_award})}
+            )
     
+    return rows[-1]["user_id"], len(rows), len(badges_to_award)
+
+class BadgeRecalculationJob:
+    """Set-based recalculation of every badge, chunk by chunk, that can run on a background thread.
+
+    Users are processed first, then projects, in id order. The last id of each chunk is committed together with the
+    chunk in badge_recalculation_runs, so a job that failed part way, or whose process died, can be resumed from
+    where it stopped instead of starting over, from any process. A job without a name (a one-off run) isn't saved.
+    """
+
+    PHASES = ("users", "projects")
+
+    def __init__(self, chunk_size: int = BADGE_RECALCULATION_CHUNK_SIZE, name: Optional[str] = None):
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._reset(chunk_size)
+
+    def _reset(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.state = "idle"  # idle, running, completed or failed
+        self.phase = self.PHASES[0]
+        self.cursor = None  # Last id committed in the current phase
+        self.totals = dict.fromkeys(self.PHASES, 0)
+        self.processed = dict.fromkeys(self.PHASES, 0)
+        self.awarded = dict.fromkeys(self.PHASES, 0)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+
+    # ---- Persistence ----
+
+    def _saved(self) -> Tuple[Optional[BadgeRecalculationRun], bool]:
+        """The saved run, and whether it is still being worked on (by this or another process).
+
+        The heartbeat age is computed by the database, against its own clock, so it doesn't depend on the time zone
+        of the process that wrote it or of this one.
+        """
+        if self.name is None:
+            return None, False
+        rows = BadgeRecalculationRun.sql(
+            """
+            SELECT *, state = 'running' AND updated_at > now() - %(stale_after)s AS live
+            FROM badge_recalculation_runs WHERE id = %(name)s
+            """,
+            {"name": self.name, "stale_after": BADGE_RECALCULATION_STALE_AFTER},
+            read_only=False,
+        )
+        if not rows:
+            return None, False
+        return BadgeRecalculationRun(**rows[0]), bool(rows[0]["live"])
+
+    def _apply(self, run: BadgeRecalculationRun, live: bool):
+        """Take over the progress of a saved run. Holds the lock."""
+        self.chunk_size = run.chunk_size
+        self.state = run.state
+        self.phase = run.phase
+        self.cursor = run.cursor
+        self.totals = {"users": run.users_total, "projects": run.projects_total}
+        self.processed = {"users": run.users_processed, "projects": run.projects_processed}
+        self.awarded = {"users": run.users_awarded, "projects": run.projects_awarded}
+        self.started_at = run.started_at
+        self.finished_at = run.finished_at
+        self.error = run.error
+        if run.state == "running" and not live:
+            # Nothing has been committed for a while: the process running it is gone
+            self.state = "failed"
+            self.error = self.error or "Interrupted (the process running it stopped)"
+
+    def _save(self):
+        if self.name is None:
+            return
+        BadgeRecalculationRun(
+            id=self.name,
+            state=self.state,
+            phase=self.phase,
+            cursor=self.cursor,
+            chunk_size=self.chunk_size,
+            users_total=self.totals["users"],
+            projects_total=self.totals["projects"],
+            users_processed=self.processed["users"],
+            projects_processed=self.processed["projects"],
+            users_awarded=self.awarded["users"],
+            projects_awarded=self.awarded["projects"],
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            error=self.error,
+        ).sync()
+
+    # ---- Running ----
+
+    def _begin(self, resume: bool, chunk_size: Optional[int]) -> bool:
+        """Move to running; returns False if the job is already running, here or in another process"""
+        saved, live = self._saved()
+        with self._lock:
+            if self.state == "running" or live:
+                return False
+            if resume and self.state != "failed" and saved is not None:
+                # Pick up a run of an earlier process
+                self._apply(saved, live)
+            if not (resume and self.state == "failed"):
+                self._reset(chunk_size or self.chunk_size)
+            elif chunk_size:
+                self.chunk_size = chunk_size
+            self.state = "running"
+            self.started_at = self.started_at or datetime.now()
+            self.finished_at = None
+            self.error = None
+        self._save()
+        return True
+
+    def start(self, resume: bool = False, chunk_size: Optional[int] = None) -> Dict:
+        """Run the job on a background thread; resume=True continues a failed or interrupted run from its last chunk"""
+        if self._begin(resume, chunk_size):
+            self._thread = threading.Thread(target=self._run, name="badge-recalculation", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def run(self, resume: bool = False, chunk_size: Optional[int] = None) -> Dict:
+        """Run the job on the calling thread and return the final status"""
+        if not self._begin(resume, chunk_size):
+            raise RuntimeError("A badge recalculation is already running")
+        self._run()
+        if self.state == "failed":
+            raise RuntimeError(f"Badge recalculation failed: {self.error}")
+        return self.status()
+
+    def _run(self):
+        try:
+            user_rows, project_rows = Table.batch([
+                (User, "SELECT COUNT(*) AS count FROM users", None),
+                (Project, "SELECT COUNT(*) AS count FROM projects", None),
+            ])
+            self.totals = {"users": user_rows[0]["count"], "projects": project_rows[0]["count"]}
+            
+            recalculate_chunk = {"users": _recalculate_user_chunk, "projects": _recalculate_project_chunk}
+            for phase in self.PHASES[self.PHASES.index(self.phase):]:
+                self.phase = phase
+                while True:
+                    with self._lock:
+                        committed = (self.cursor, dict(self.processed), dict(self.awarded))
+                    try:
+                        # The chunk and the cursor past it commit together
+                        with Table.transaction():
+                            last_id, processed, awarded = recalculate_chunk[phase](self.cursor, self.chunk_size)
+                            if not processed:
+                                break
+                            with self._lock:
+                                self.cursor = last_id
+                                self.processed[phase] += processed
+                                self.awarded[phase] += awarded
+                            self._save()
+                    except Exception:
+                        with self._lock:
+                            self.cursor, self.processed, self.awarded = committed
+                        raise
+                self.cursor = None
+            
+            self.state = "completed"
+        except Exception as e:
+            logger.warning(f"Badge recalculation failed in the {self.phase} phase after {self.cursor}: {str(e)}")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.finished_at = datetime.now()
+            try:
+                self._save()
+            except Exception as e:
+                logger.warning(f"Failed to save the badge recalculation state: {str(e)}")
+
+    def status(self) -> Dict:
+        with self._lock:
+            idle = self.state == "idle"
+        if idle:
+            # Nothing ran in this process; report the last saved run, wherever it ran
+            saved, live = self._saved()
+            if saved is not None:
+                view = BadgeRecalculationJob()
+                view._apply(saved, live)
+                return view.status()
+        with self._lock:
+            return {
+                "state": self.state,
+                "phase": self.phase,
+                "cursor": str(self.cursor) if self.cursor is not None else None,
+                "chunk_size": self.chunk_size,
+                "totals": dict(self.totals),
+                "processed": dict(self.processed),
+                "awarded": dict(self.awarded),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "error": self.error,
+            }
+
+badge_recalculation = BadgeRecalculationJob(name="badges")
+
+@authenticated
+def recalculate_badges() -> Dict:
+    """Recalculate all badges for all users and projects (admin function)."""
+    status = BadgeRecalculationJob().run()
     return {
-        "user_badges_awarded": len(user_badges),
-        "project_badges_awarded": len(project_badges)
+        "user_badges_awarded": status["awarded"]["users"],
+        "project_badges_awarded": status["awarded"]["projects"]
     }
 
+@authenticated
+def start_badge_recalculation(resume: bool = False) -> Dict:
+    """Start recalculating all badges in the background, or resume a failed run (admin function)."""
+    return badge_recalculation.start(resume=resume)
+
+@authenticated
+def get_badge_recalculation_status() -> Dict:
+    """Get the progress of the background badge recalculation."""
+    return badge_recalculation.status()
+
 # ==================== Badge Event Triggers ====================
 
 def check_badges_after_vote(project_id: uuid.UUID, user_id: str) -> Dict:
@@ -399,94 +582,201 @@ def _create_user_badge(user_id: str, badge_id: uuid.UUID, context_project_id: Op
         is_featured=False
     )
 
-def _count_votes(project_id: uuid.UUID) -> int:
-    """Count total votes for a project."""
-    results = Vote.sql(
-        "SELECT COUNT(*) as count FROM votes WHERE project_id = %(project_id)s",
-        {"project_id": project_id}
-    )
-    return results[0]["count"] if results else 0
+def _with_derived_metrics(metrics: Dict) -> Dict:
+    """Add the project metrics that are computed from the queried ones."""
+    budget = float(metrics["budget"]) if metrics["budget"] else 0.0
+    metrics["donation_total"] = float(metrics["donation_total"])
+    metrics["funded_percent"] = metrics["donation_total"] * 100 / budget if budget > 0 else 0.0
+    metrics["is_trending"] = 1 if trending_ranking.is_trending(metrics["project_id"]) else 0
+    return metrics
 
-def _count_votes_in_timeframe(project_id: uuid.UUID, start_time: datetime, end_time: datetime) -> int:
-    """Count votes for a project within a specific timeframe."""
-    results = Vote.sql(
+def _project_metrics(project_id: uuid.UUID) -> Optional[Dict]:
+    """Everything the project badge rules look at, in one query; None if the project doesn't exist."""
+    if not counters_ready():
+        # The counters haven't been filled yet: count the raw tables, as the bulk recalculation does
+        results = _project_metrics_from_raw(
+            "SELECT id, budget, created_at FROM projects WHERE id = %(project_id)s", {"project_id": project_id}
+        )
+        return results[0] if results else None
+    # The counters come from project_activity_stats by primary key and the trending window from the hourly vote
+    # buckets, at most one row per hour of the window.
+    # Awards are decided from this, so read from the primary: a lagging replica could miss a badge just awarded
+    results = Project.sql(
         """
-        SELECT COUNT(*) as count FROM votes 
-        WHERE project_id = %(project_id)s 
-        AND created_at >= %(start_time)s 
-        AND created_at <= %(end_time)s
+        SELECT p.id AS project_id, p.budget, p.created_at,
+               COALESCE(s.vote_count, 0) AS vote_count,
+               COALESCE(s.first_day_votes, 0) AS first_day_votes,
+               (
+                   SELECT COALESCE(SUM(vote_count), 0) FROM project_vote_buckets
+                   WHERE project_id = p.id AND bucket_start >= %(recent_since)s
+               ) AS recent_votes,
+               COALESCE(s.donation_total, 0) AS donation_total,
+               COALESCE(s.comment_count, 0) AS comment_count,
+               ARRAY(SELECT pb.badge_id FROM project_badges pb WHERE pb.project_id = p.id) AS awarded_badge_ids
+        FROM projects p
+        LEFT JOIN project_activity_stats s ON s.project_id = p.id
+        WHERE p.id = %(project_id)s
         """,
-        {"project_id": project_id, "start_time": start_time, "end_time": end_time}
+        {"project_id": project_id, "recent_since": vote_bucket_start(datetime.now() - TRENDING_WINDOW)},
+        read_only=False
     )
-    return results[0]["count"] if results else 0
+    if not results:
+        return None
+    
+    return _with_derived_metrics(results[0])
 
-def _get_donation_total(project_id: uuid.UUID) -> float:
-    """Get total donation amount for a project."""
-    results = Donation.sql(
-        "SELECT SUM(amount) as total FROM donations WHERE project_id = %(project_id)s",
-        {"project_id": project_id}
+def _project_metrics_chunk(after_id: Optional[uuid.UUID], chunk_size: int) -> List[Dict]:
+    """The _project_metrics of the next chunk_size projects after after_id, aggregated with GROUP BY."""
+    after = "WHERE id > %(after_id)s" if after_id is not None else ""
+    return _project_metrics_from_raw(
+        f"SELECT id, budget, created_at FROM projects {after} ORDER BY id LIMIT %(chunk_size)s",
+        {"after_id": after_id, "chunk_size": chunk_size},
     )
-    return float(results[0]["total"]) if results and results[0]["total"] else 0.0
 
-def _count_comments(project_id: uuid.UUID) -> int:
-    """Count comments related to a project."""
-    results = Comment.sql(
-        """
-        SELECT COUNT(*) as count FROM comments c
-        JOIN timeline_items ti ON c.timeline_item_id = ti.id
-        WHERE ti.project_id = %(project_id)s
-        """,
-        {"project_id": project_id}
-    )
-    return results[0]["count"] if results else 0
-
-def _count_user_projects(user_id: str) -> int:
-    """Count projects created by a user."""
+def _project_metrics_from_raw(chunk: str, params: Dict) -> List[Dict]:
+    """_project_metrics counted from votes, donations and comments, for the projects the chunk query selects"""
+    now = datetime.now()
     results = Project.sql(
-        "SELECT COUNT(*) as count FROM projects WHERE user_id = %(user_id)s",
-        {"user_id": user_id}
-    )
-    return results[0]["count"] if results else 0
-
-def _count_user_votes(user_id: str) -> int:
-    """Count projects voted on by a user."""
-    results = Vote.sql(
-        """
-        SELECT COUNT(DISTINCT project_id) as count FROM votes 
-        WHERE user_id = %(user_id)s
+        f"""
+        WITH chunk AS ({chunk})
+        SELECT chunk.id AS project_id, chunk.budget, chunk.created_at,
+               COALESCE(v.vote_count, 0) AS vote_count,
+               COALESCE(v.first_day_votes, 0) AS first_day_votes,
+               COALESCE(v.recent_votes, 0) AS recent_votes,
+               COALESCE(d.donation_total, 0) AS donation_total,
+               COALESCE(c.comment_count, 0) AS comment_count,
+               COALESCE(pb.awarded_badge_ids, '{{}}') AS awarded_badge_ids
+        FROM chunk
+        LEFT JOIN (
+            SELECT votes.project_id, COUNT(*) AS vote_count,
+                   COUNT(*) FILTER (
+                       WHERE votes.created_at >= chunk.created_at
+                       AND votes.created_at <= chunk.created_at + INTERVAL '1 day'
+                   ) AS first_day_votes,
+                   COUNT(*) FILTER (
+                       WHERE votes.created_at >= %(recent_since)s AND votes.created_at <= %(now)s
+                   ) AS recent_votes
+            FROM votes JOIN chunk ON votes.project_id = chunk.id
+            GROUP BY votes.project_id
+        ) v ON v.project_id = chunk.id
+        LEFT JOIN (
+            SELECT project_id, SUM(amount) AS donation_total FROM donations
+            WHERE project_id IN (SELECT id FROM chunk)
+            GROUP BY project_id
+        ) d ON d.project_id = chunk.id
+        LEFT JOIN (
+            SELECT project_id, COUNT(*) AS comment_count FROM comments
+            WHERE project_id IN (SELECT id FROM chunk)
+            GROUP BY project_id
+        ) c ON c.project_id = chunk.id
+        LEFT JOIN (
+            SELECT project_id, array_agg(badge_id) AS awarded_badge_ids FROM project_badges
+            WHERE project_id IN (SELECT id FROM chunk)
+            GROUP BY project_id
+        ) pb ON pb.project_id = chunk.id
+        ORDER BY chunk.id
         """,
-        {"user_id": user_id}
+        {**params, "now": now, "recent_since": now - TRENDING_WINDOW},
+        read_only=False
     )
-    return results[0]["count"] if results else 0
+    return [_with_derived_metrics(metrics) for metrics in results]
 
-def _count_user_donations(user_id: str) -> int:
-    """Count projects donated to by a user."""
-    results = Donation.sql(
+def _user_metrics(user_id: str) -> Dict:
+    """Everything the user badge rules look at, in one query."""
+    if not counters_ready():
+        # The counters haven't been filled yet: count the raw tables, as the bulk recalculation does
+        return _user_metrics_from_raw("SELECT %(user_id)s::uuid AS id", {"user_id": user_id})[0]
+    # The counters come from user_activity_stats by primary key.
+    # Awards are decided from this, so read from the primary: a lagging replica could miss a badge just awarded
+    results = UserBadge.sql(
         """
-        SELECT COUNT(DISTINCT project_id) as count FROM donations 
-        WHERE user_id = %(user_id)s
+        SELECT COALESCE(s.project_count, 0) AS project_count,
+               COALESCE(s.vote_count, 0) AS vote_count,
+               COALESCE(s.donation_count, 0) AS donation_count,
+               COALESCE(s.donation_total, 0) AS donation_total,
+               COALESCE(s.comment_count, 0) AS comment_count,
+               ARRAY(SELECT ub.badge_id FROM user_badges ub WHERE ub.user_id = %(user_id)s) AS awarded_badge_ids
+        FROM (SELECT %(user_id)s::uuid AS user_id) u
+        LEFT JOIN user_activity_stats s ON s.user_id = u.user_id
         """,
-        {"user_id": user_id}
+        {"user_id": user_id},
+        read_only=False
     )
-    return results[0]["count"] if results else 0
+    
+    metrics = results[0]
+    metrics["donation_total"] = float(metrics["donation_total"])
+    return metrics
 
-def _get_user_donation_total(user_id: str) -> float:
-    """Get total donation amount from a user."""
-    results = Donation.sql(
-        "SELECT SUM(amount) as total FROM donations WHERE user_id = %(user_id)s",
-        {"user_id": user_id}
+def _user_metrics_chunk(after_id: Optional[uuid.UUID], chunk_size: int) -> List[Dict]:
+    """The _user_metrics of the next chunk_size users after after_id, aggregated with GROUP BY."""
+    after = "WHERE id > %(after_id)s" if after_id is not None else ""
+    return _user_metrics_from_raw(
+        f"SELECT id FROM users {after} ORDER BY id LIMIT %(chunk_size)s",
+        {"after_id": after_id, "chunk_size": chunk_size},
     )
-    return float(results[0]["total"]) if results and results[0]["total"] else 0.0
 
-def _count_user_comments(user_id: str) -> int:
-    """Count projects commented on by a user."""
-    results = Comment.sql(
-        """
-        SELECT COUNT(DISTINCT ti.project_id) as count 
-        FROM comments c
-        JOIN timeline_items ti ON c.timeline_item_id = ti.id
-        WHERE c.user_id = %(user_id)s
+def _user_metrics_from_raw(chunk: str, params: Dict) -> List[Dict]:
+    """_user_metrics counted from projects, votes, donations and comments, for the user ids chunk selects"""
+    results = UserBadge.sql(
+        f"""
+        WITH chunk AS ({chunk})
+        SELECT chunk.id AS user_id,
+               COALESCE(p.project_count, 0) AS project_count,
+               COALESCE(v.vote_count, 0) AS vote_count,
+               COALESCE(d.donation_count, 0) AS donation_count,
+               COALESCE(d.donation_total, 0) AS donation_total,
+               COALESCE(c.comment_count, 0) AS comment_count,
+               COALESCE(ub.awarded_badge_ids, '{{}}') AS awarded_badge_ids
+        FROM chunk
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS project_count FROM projects
+            WHERE user_id IN (SELECT id FROM chunk)
+            GROUP BY user_id
+        ) p ON p.user_id = chunk.id
+        LEFT JOIN (
+            SELECT user_id, COUNT(DISTINCT project_id) AS vote_count FROM votes
+            WHERE user_id IN (SELECT id FROM chunk)
+            GROUP BY user_id
+        ) v ON v.user_id = chunk.id
+        LEFT JOIN (
+            SELECT user_id, COUNT(DISTINCT project_id) AS donation_count, SUM(amount) AS donation_total
+            FROM donations
+            WHERE user_id IN (SELECT id FROM chunk)
+            GROUP BY user_id
+        ) d ON d.user_id = chunk.id
+        LEFT JOIN (
+            SELECT user_id, COUNT(DISTINCT project_id) AS comment_count FROM comments
+            WHERE user_id IN (SELECT id FROM chunk)
+            GROUP BY user_id
+        ) c ON c.user_id = chunk.id
+        LEFT JOIN (
+            -- user_badges.user_id is text, so cast the chunk side and keep the index on user_badges usable
+            SELECT user_id, array_agg(badge_id) AS awarded_badge_ids FROM user_badges
+            WHERE user_id IN (SELECT id::text FROM chunk)
+            GROUP BY user_id
+        ) ub ON ub.user_id = chunk.id::text
+        ORDER BY chunk.id
         """,
-        {"user_id": user_id}
+        params,
+        read_only=False
+    )
+    for metrics in results:
+        metrics["donation_total"] = float(metrics["donation_total"])
+    return results
+
+# ==================== Migrations ====================
+
+def add_criteria_metric_column():
+    """Add badges.criteria_metric; until it exists criteria_value falls back to CRITERIA_VALUE_METRICS per badge_type."""
+    Badge.sql("ALTER TABLE badges ADD COLUMN IF NOT EXISTS criteria_metric TEXT", read_only=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance for the badges tables")
+    parser.add_argument(
+        "command", choices=["add-criteria-metric"],
+        help="add-criteria-metric: add the criteria_metric column to badges (safe to run again)"
     )
-    return results[0]["count"] if results else 0
\ No newline at end of file
+    args = parser.parse_args()
+    if args.command == "add-criteria-metric":
+        add_criteria_metric_column()
+        print("badges has a criteria_metric column")
@@ -1,51 +1,53 @@
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
+from solar import Table
 from solar.access import User, authenticated, public
 from core.comment import Comment
 from core.project import Project
 from core.timeline_item import TimelineItem
-from core.badge_service import check_badges_after_comment
+from core.badge_queue import badge_queue
+from core import activity_stats
 
 @public
-def get_project_comments(project_id: UUID) -> List[Comment]:
+async def get_project_comments(project_id: UUID) -> List[Comment]:
     """Get all comments for a project, ordered by creation date."""
-    results = Comment.sql("""
+    results = await Comment.aselect("""
         SELECT * FROM comments 
         WHERE project_id = %(project_id)s 
         ORDER BY created_at ASC
     """, {"project_id": project_id})
     
-    return [Comment(**result) for result in results]
+    return results
 
 @public
-def get_timeline_item_comments(timeline_item_id: UUID) -> List[Comment]:
+async def get_timeline_item_comments(timeline_item_id: UUID) -> List[Comment]:
     """Get comments for a specific timeline item."""
-    results = Comment.sql("""
+    results = await Comment.aselect("""
         SELECT * FROM comments 
         WHERE timeline_item_id = %(timeline_item_id)s 
         ORDER BY created_at ASC
     """, {"timeline_item_id": timeline_item_id})
     
-    return [Comment(**result) for result in results]
+    return results
 
 @public
-def get_threaded_comments(project_id: UUID, timeline_item_id: Optional[UUID] = None) -> List[Comment]:
+async def get_threaded_comments(project_id: UUID, timeline_item_id: Optional[UUID] = None) -> List[Comment]:
     """Get threaded comments for a project or timeline item."""
     if timeline_item_id:
-        results = Comment.sql("""
+        results = await Comment.aselect("""
             SELECT * FROM comments 
             WHERE timeline_item_id = %(timeline_item_id)s 
             ORDER BY created_at ASC
         """, {"timeline_item_id": timeline_item_id})
     else:
-        results = Comment.sql("""
+        results = await Comment.aselect("""
             SELECT * FROM comments 
             WHERE project_id = %(project_id)s AND timeline_item_id IS NULL
             ORDER BY created_at ASC
         """, {"project_id": project_id})
     
-    return [Comment(**result) for result in results]
+    return results
 
 @authenticated
 def create_comment(user: User, project_id: UUID, content: str, 
@@ -82,21 +84,24 @@ def create_comment(user: User, project_id: UUID, content: str,
         parent_comment_id=parent_comment_id,
         content=content
     )
-    comment.sync()
+    # The comment and the activity counters commit together
+    with Table.transaction():
+        comment.sync()
+        activity_stats.record_comment(user.id, project_id, comment.id)
     
-    # Check and award badges after commenting
-    check_badges_after_comment(project_id, user.id)
+    # Check and award badges in the background
+    badge_queue.enqueue(project_id=project_id, user_id=user.id)
     
     return comment
 
 @authenticated
 def update_comment(user: User, comment_id: UUID, content: str) -> Optional[Comment]:
     """Update a comment (only by the comment author)."""
-    comment_results = Comment.sql("SELECT * FROM comments WHERE id = %(comment_id)s", {"comment_id": comment_id})
+    comment_results = Comment.select("SELECT * FROM comments WHERE id = %(comment_id)s", {"comment_id": comment_id})
     if not comment_results:
         return None
     
-    comment = Comment(**comment_results[0])
+    comment = comment_results[0]
     
     # Check if user owns the comment
     if comment.user_id != user.id:
@@ -126,59 +131,66 @@ def delete_comment(user: User, comment_id: UUID) -> bool:
     if comment_data["user_id"] != user.id and comment_data["project_owner_id"] != user.id:
         return False
     
-    # Delete child comments first (if any)
-    Comment.sql("DELETE FROM comments WHERE parent_comment_id = %(comment_id)s", {"comment_id": comment_id})
-    
-    # Delete the comment
-    Comment.sql("DELETE FROM comments WHERE id = %(comment_id)s", {"comment_id": comment_id})
+    with Table.transaction():
+        # Delete child comments first (if any)
+        deleted = Comment.sql(
+            "DELETE FROM comments WHERE parent_comment_id = %(comment_id)s RETURNING user_id", {"comment_id": comment_id}
+        )
+        
+        # Delete the comment
+        deleted += Comment.sql("DELETE FROM comments WHERE id = %(comment_id)s RETURNING user_id", {"comment_id": comment_id})
+        
+        # Recount the activity counters of everyone whose comments went
+        activity_stats.refresh_user_stats(list({row["user_id"] for row in deleted}))
+        activity_stats.refresh_project_stats([comment_data["project_id"]])
     return True
 
 @public
-def get_recent_comments(limit: int = 20) -> List[Comment]:
+async def get_recent_comments(limit: int = 20) -> List[Comment]:
     """Get recent comments across all projects."""
-    results = Comment.sql("""
+    results = await Comment.aselect("""
         SELECT * FROM comments 
         ORDER BY created_at DESC 
         LIMIT %(limit)s
     """, {"limit": limit})
     
-    return [Comment(**result) for result in results]
+    return results
 
 @public
-def get_comment_count_for_project(project_id: UUID) -> int:
+async def get_comment_count_for_project(project_id: UUID) -> int:
     """Get total comment count for a project."""
-    result = Comment.sql("""
+    result = await Comment.asql("""
         SELECT COUNT(*) as count FROM comments WHERE project_id = %(project_id)s
     """, {"project_id": project_id})
     
     return result[0]["count"] if result else 0
 
 @authenticated
-def get_user_comments(user: User) -> List[Comment]:
+async def get_user_comments(user: User) -> List[Comment]:
     """Get all comments made by a user."""
-    results = Comment.sql("""
+    results = await Comment.aselect("""
         SELECT * FROM comments 
         WHERE user_id = %(user_id)s 
         ORDER BY created_at DESC
     """, {"user_id": user.id})
     
-    return [Comment(**result) for result in results]
+    return results
 
 @public
-def search_comments(query: str, project_id: Optional[UUID] = None) -> List[Comment]:
+async def search_comments(query: str, project_id: Optional[UUID] = None) -> List[Comment]:
     """Search comments by content."""
     if project_id:
-        results = Comment.sql("""
+        results = await Comment.aselect("""
             SELECT * FROM comments 
             WHERE project_id = %(project_id)s 
             AND LOWER(content) LIKE LOWER(%(query)s)
             ORDER BY created_at DESC
         """, {"project_id": project_id, "query": f"%{query}%"})
     else:
-        results = Comment.sql("""
+        results = await Comment.aselect("""
             SELECT * FROM comments 
             WHERE LOWER(content) LIKE LOWER(%(query)s)
             ORDER BY created_at DESC
         """, {"query": f"%{query}%"})
     
-    return [Comment(**result) for result in results]
\ No newline at end of file
+    return results
\ No newline at end of file
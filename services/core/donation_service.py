@@ -1,67 +1,71 @@
 from typing import List, Optional, Dict, Any
 from uuid import UUID
+from solar import Table
 from solar.access import User, authenticated, public
 from core.donation import Donation
 from core.project import Project
-from core.badge_service import check_badges_after_donation
+from core.badge_queue import badge_queue
+from core import activity_stats
 
 @authenticated
 def create_donation(user: User, project_id: UUID, amount: float, message: str = "", 
                    is_anonymous: bool = False, currency: str = "EUR") -> Donation:
     """Create a donation for a project."""
-    # Validate project exists
-    project_exists = Project.sql("SELECT id FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
-    if not project_exists:
-        raise ValueError("Project not found")
+    with Table.transaction():
+        # Validate project exists
+        project_exists = Project.sql("SELECT id FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
+        if not project_exists:
+            raise ValueError("Project not found")
+        
+        if amount <= 0:
+            raise ValueError("Donation amount must be positive")
+        
+        # Create donation
+        donation = Donation(
+            user_id=user.id,
+            project_id=project_id,
+            amount=amount,
+            message=message,
+            is_anonymous=is_anonymous,
+            currency=currency
+        )
+        donation.sync()
+        
+        # Update project funding
+        Project.sql("""
+            UPDATE projects 
+            SET current_funding = current_funding + %(amount)s 
+            WHERE id = %(project_id)s
+        """, {"amount": amount, "project_id": project_id})
+        activity_stats.record_donation(user.id, project_id, donation.id, amount)
     
-    if amount <= 0:
-        raise ValueError("Donation amount must be positive")
-    
-    # Create donation
-    donation = Donation(
-        user_id=user.id,
-        project_id=project_id,
-        amount=amount,
-        message=message,
-        is_anonymous=is_anonymous,
-        currency=currency
-    )
-    donation.sync()
-    
-    # Update project funding
-    Project.sql("""
-        UPDATE projects 
-        SET current_funding = current_funding + %(amount)s 
-        WHERE id = %(project_id)s
-    """, {"amount": amount, "project_id": project_id})
-    
-    # Check and award badges after donation
-    check_badges_after_donation(project_id, user.id)
+    # Check and award badges in the background, once the donation is committed
+    badge_queue.enqueue(project_id=project_id, user_id=user.id)
     
     return donation
 
 @public
-def get_project_donations(project_id: UUID, include_anonymous: bool = True) -> List[Donation]:
+async def get_project_donations(project_id: UUID, include_anonymous: bool = True) -> List[Donation]:
     """Get donations for a project."""
     if include_anonymous:
-        results = Donation.sql("""
+        results = await Donation.aselect("""
             SELECT * FROM donations 
             WHERE project_id = %(project_id)s 
             ORDER BY created_at DESC
         """, {"project_id": project_id})
     else:
-        results = Donation.sql("""
+        results = await Donation.aselect("""
             SELECT * FROM donations 
             WHERE project_id = %(project_id)s AND is_anonymous = FALSE
             ORDER BY created_at DESC
         """, {"project_id": project_id})
     
-    return [Donation(**result) for result in results]
+    return results
 
 @public
-def get_donation_statistics(project_id: UUID) -> Dict[str, Any]:
+async def get_donation_statistics(project_id: UUID) -> Dict[str, Any]:
     """Get donation statistics for a project."""
-    stats = Donation.sql("""
+    stats = (await Donation.asql("""
         SELECT 
             COUNT(*) as donor_count,
             COALESCE(SUM(amount), 0) as total_amount,
@@ -69,7 +73,7 @@ def get_donation_statistics(project_id: UUID) -> Dict[str, Any]:
             COALESCE(MAX(amount), 0) as largest_amount
         FROM donations 
         WHERE project_id = %(project_id)s
-    """, {"project_id": project_id})[0]
+    """, {"project_id": project_id}))[0]
     
     return {
         "donor_count": stats["donor_count"],
@@ -79,32 +83,32 @@ def get_donation_statistics(project_id: UUID) -> Dict[str, Any]:
     }
 
 @authenticated
-def get_user_donations(user: User) -> List[Donation]:
+async def get_user_donations(user: User) -> List[Donation]:
     """Get all donations made by a user."""
-    results = Donation.sql("""
+    results = await Donation.aselect("""
         SELECT * FROM donations 
         WHERE user_id = %(user_id)s 
         ORDER BY created_at DESC
     """, {"user_id": user.id})
     
-    return [Donation(**result) for result in results]
+    return results
 
 @public
-def get_recent_donations(limit: int = 10) -> List[Donation]:
+async def get_recent_donations(limit: int = 10) -> List[Donation]:
     """Get recent donations across all projects (excluding anonymous ones)."""
-    results = Donation.sql("""
+    results = await Donation.aselect("""
         SELECT * FROM donations 
         WHERE is_anonymous = FALSE
         ORDER BY created_at DESC 
         LIMIT %(limit)s
     """, {"limit": limit})
     
-    return [Donation(**result) for result in results]
+    return results
 
 @public
-def get_top_donors_for_project(project_id: UUID, limit: int = 5) -> List[Dict[str, Any]]:
+async def get_top_donors_for_project(project_id: UUID, limit: int = 5) -> List[Dict[str, Any]]:
     """Get top donors for a project (excluding anonymous)."""
-    results = Donation.sql("""
+    results = await Donation.asql("""
         SELECT 
             user_id,
             SUM(amount) as total_donated,
@@ -126,12 +130,12 @@ def get_top_donors_for_project(project_id: UUID, limit: int = 5) -> List[Dict[st
     ]
 
 @authenticated
-def get_user_donation_total(user: User) -> float:
+async def get_user_donation_total(user: User) -> float:
     """Get total amount donated by a user."""
-    result = Donation.sql("""
+    result = (await Donation.asql("""
         SELECT COALESCE(SUM(amount), 0) as total 
         FROM donations 
         WHERE user_id = %(user_id)s
-    """, {"user_id": user.id})[0]
+    """, {"user_id": user.id}))[0]
     
     return float(result["total"])
\ No newline at end of file
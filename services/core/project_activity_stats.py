@@ -0,0 +1,13 @@
+from solar import Table, ColumnDetails
+from datetime import datetime
+import uuid
+
+class ProjectActivityStats(Table):
+    __tablename__ = "project_activity_stats"
+    project_id: uuid.UUID = ColumnDetails(primary_key=True)  # One row per project, kept up to date by core.activity_stats
+    vote_count: int = 0  # Votes received
+    first_day_votes: int = 0  # Votes received within 24 hours of creation
+    donation_count: int = 0  # Donations received
+    donation_total: float = 0.0  # Sum of the donations received
+    comment_count: int = 0  # Comments posted on the project
+    updated_at: datetime = ColumnDetails(default_factory=datetime.now)
\ No newline at end of file
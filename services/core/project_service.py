@@ -1,55 +1,58 @@
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from datetime import datetime
+from solar import Table
 from solar.access import User, authenticated, public
 from core.project import Project
 from core.timeline_item import TimelineItem
 from core.vote import Vote
 from core.donation import Donation
 from core.comment import Comment
-from core.badge_service import check_badges_after_project_creation
+from core.badge_queue import badge_queue
+from core import activity_stats
+from core.trending import TRENDING_SIZE, trending_ranking
 
 @public
-def get_all_projects() -> List[Project]:
+async def get_all_projects() -> List[Project]:
     """Get all projects for public viewing."""
-    results = Project.sql("SELECT * FROM projects ORDER BY created_at DESC")
-    return [Project(**result) for result in results]
+    results = await Project.aselect("SELECT * FROM projects ORDER BY created_at DESC")
+    return results
 
 @public
-def get_project_by_id(project_id: UUID) -> Optional[Project]:
+async def get_project_by_id(project_id: UUID) -> Optional[Project]:
     """Get a specific project by ID."""
-    results = Project.sql("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
+    results = await Project.aselect("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
     if results:
-        return Project(**results[0])
+        return results[0]
     return None
 
 @public
-def get_featured_projects(limit: int = 5) -> List[Project]:
+async def get_featured_projects(limit: int = 5) -> List[Project]:
     """Get featured projects based on vote count and recent activity."""
-    results = Project.sql("""
+    results = await Project.aselect("""
         SELECT * FROM projects 
         ORDER BY vote_count DESC, created_at DESC 
         LIMIT %(limit)s
     """, {"limit": limit})
-    return [Project(**result) for result in results]
+    return results
 
 @public
-def search_projects(query: str) -> List[Project]:
+async def search_projects(query: str) -> List[Project]:
     """Search projects by title, description, or tags."""
-    results = Project.sql("""
+    results = await Project.aselect("""
         SELECT * FROM projects 
         WHERE LOWER(title) LIKE LOWER(%(query)s) 
         OR LOWER(description) LIKE LOWER(%(query)s)
         OR %(query_lower)s = ANY(SELECT LOWER(unnest(tags)))
         ORDER BY vote_count DESC, created_at DESC
     """, {"query": f"%{query}%", "query_lower": query.lower()})
-    return [Project(**result) for result in results]
+    return results
 
 @public
-def get_projects_by_category(category: str) -> List[Project]:
+async def get_projects_by_category(category: str) -> List[Project]:
     """Get projects filtered by category."""
-    results = Project.sql("SELECT * FROM projects WHERE category = %(category)s ORDER BY created_at DESC", {"category": category})
-    return [Project(**result) for result in results]
+    results = await Project.aselect("SELECT * FROM projects WHERE category = %(category)s ORDER BY created_at DESC", {"category": category})
+    return results
 
 @authenticated
 def create_project(user: User, title: str, description: str, budget: float, category: str, tags: List[str] = None) -> Project:
@@ -66,10 +69,13 @@ def create_project(user: User, title: str, description: str, budget: float, cate
         category=category,
         tags=tags
     )
-    project.sync()
+    # The project and the activity counters commit together
+    with Table.transaction():
+        project.sync()
+        activity_stats.record_project(user.id, project.id)
     
-    # Check and award badges after project creation
-    check_badges_after_project_creation(project.id, user.id)
+    # Check and award the creator's badges in the background
+    badge_queue.enqueue(user_id=user.id)
     
     return project
 
@@ -78,11 +84,11 @@ def update_project(user: User, project_id: UUID, title: str = None, description:
                   budget: float = None, status: str = None, category: str = None, 
                   tags: List[str] = None) -> Optional[Project]:
     """Update an existing project (only by owner)."""
-    project_results = Project.sql("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
+    project_results = Project.select("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
     if not project_results:
         return None
     
-    project = Project(**project_results[0])
+    project = project_results[0]
     
     # Check if user owns the project
     if project.user_id != user.id:
@@ -109,48 +115,77 @@ def update_project(user: User, project_id: UUID, title: str = None, description:
 @authenticated
 def delete_project(user: User, project_id: UUID) -> bool:
     """Delete a project (only by owner)."""
-    project_results = Project.sql("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
+    project_results = Project.select("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
     if not project_results:
         return False
     
-    project = Project(**project_results[0])
+    project = project_results[0]
     
     # Check if user owns the project
     if project.user_id != user.id:
         return False
     
-    # Delete related data first
-    Vote.sql("DELETE FROM votes WHERE project_id = %(project_id)s", {"project_id": project_id})
-    Donation.sql("DELETE FROM donations WHERE project_id = %(project_id)s", {"project_id": project_id})
-    Comment.sql("DELETE FROM comments WHERE project_id = %(project_id)s", {"project_id": project_id})
-    TimelineItem.sql("DELETE FROM timeline_items WHERE project_id = %(project_id)s", {"project_id": project_id})
-    
-    # Delete the project
-    Project.sql("DELETE FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
+    with Table.transaction():
+        # Delete related data first, noting whose activity it was
+        params = {"project_id": project_id}
+        deleted = Vote.sql("DELETE FROM votes WHERE project_id = %(project_id)s RETURNING user_id", params)
+        deleted += Donation.sql("DELETE FROM donations WHERE project_id = %(project_id)s RETURNING user_id", params)
+        deleted += Comment.sql("DELETE FROM comments WHERE project_id = %(project_id)s RETURNING user_id", params)
+        TimelineItem.sql("DELETE FROM timeline_items WHERE project_id = %(project_id)s", params)
+        
+        # Delete the project
+        Project.sql("DELETE FROM projects WHERE id = %(project_id)s", params)
+        
+        # Recount the activity counters of the owner and everyone who voted, donated or commented
+        activity_stats.refresh_user_stats(list({row["user_id"] for row in deleted} | {project.user_id}))
+        activity_stats.forget_project(project_id)
     return True
 
 @public
 def get_project_statistics(project_id: UUID) -> Dict[str, Any]:
     """Get statistics for a project including votes, donations, comments."""
-    project_results = Project.sql("SELECT * FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
-    if not project_results:
+    if activity_stats.counters_ready():
+        # Primary-key reads of the project and its maintained activity counters, instead of counting the raw tables
+        results = Project.sql("""
+            SELECT p.budget,
+                   COALESCE(s.vote_count, 0) as vote_count,
+                   COALESCE(s.donation_count, 0) as donation_count,
+                   COALESCE(s.donation_total, 0) as donation_total,
+                   COALESCE(s.comment_count, 0) as comment_count
+            FROM projects p
+            LEFT JOIN project_activity_stats s ON s.project_id = p.id
+            WHERE p.id = %(project_id)s
+        """, {"project_id": project_id})
+    else:
+        # The counters haven't been filled yet (see activity_stats.counters_ready): count the raw tables
+        results = Project.sql("""
+            SELECT p.budget,
+                   (SELECT COUNT(*) FROM votes WHERE project_id = p.id) as vote_count,
+                   (SELECT COUNT(*) FROM donations WHERE project_id = p.id) as donation_count,
+                   (SELECT COALESCE(SUM(amount), 0) FROM donations WHERE project_id = p.id) as donation_total,
+                   (SELECT COUNT(*) FROM comments WHERE project_id = p.id) as comment_count
+            FROM projects p
+            WHERE p.id = %(project_id)s
+        """, {"project_id": project_id})
+    if not results:
         return {}
     
-    project = Project(**project_results[0])
-    
-    vote_count = Vote.sql("SELECT COUNT(*) as count FROM votes WHERE project_id = %(project_id)s", {"project_id": project_id})[0]["count"]
-    
-    donation_stats = Donation.sql("""
-        SELECT COUNT(*) as count, COALESCE(SUM(amount), 0) as total 
-        FROM donations WHERE project_id = %(project_id)s
-    """, {"project_id": project_id})[0]
-    
-    comment_count = Comment.sql("SELECT COUNT(*) as count FROM comments WHERE project_id = %(project_id)s", {"project_id": project_id})[0]["count"]
+    stats = results[0]
+    budget = float(stats["budget"])
+    donation_total = float(stats["donation_total"])
     
     return {
-        "vote_count": vote_count,
-        "donation_count": donation_stats["count"],
-        "donation_total": float(donation_stats["total"]),
-        "comment_count": comment_count,
-        "funding_percentage": (float(donation_stats["total"]) / project.budget * 100) if project.budget > 0 else 0
-    }
\ No newline at end of file
+        "vote_count": stats["vote_count"],
+        "donation_count": stats["donation_count"],
+        "donation_total": donation_total,
+        "comment_count": stats["comment_count"],
+        "funding_percentage": (donation_total / budget * 100) if budget > 0 else 0
+    }
+
+@public
+def get_trending_projects(limit: int = TRENDING_SIZE) -> List[Dict[str, Any]]:
+    """Get the projects with the most votes over the last 7 days, with their rank and recent vote count (at most 10)."""
+    if not 1 <= limit <= TRENDING_SIZE:
+        raise ValueError(f"limit must be between 1 and {TRENDING_SIZE}")
+    # Served from the periodically recomputed ranking, not counted per request
+    return trending_ranking.ranking()[:limit]
\ No newline at end of file
@@ -0,0 +1,10 @@
+from solar import Table, ColumnDetails
+from datetime import datetime
+import uuid
+
+class ProjectVoteBucket(Table):
+    __tablename__ = "project_vote_buckets"
+    id: str = ColumnDetails(primary_key=True)  # "<project_id>:<YYYYMMDDHH>", so each hour of a project has one row
+    project_id: uuid.UUID  # Reference to the project voted on
+    bucket_start: datetime  # Start of the hour the votes were cast in
+    vote_count: int = 0  # Votes cast in that hour (net of removed votes)
\ No newline at end of file
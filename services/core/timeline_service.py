@@ -6,15 +6,15 @@ from core.timeline_item import TimelineItem
 from core.project import Project
 
 @public
-def get_project_timeline(project_id: UUID) -> List[TimelineItem]:
+async def get_project_timeline(project_id: UUID) -> List[TimelineItem]:
     """Get timeline items for a project, ordered by order_index."""
-    results = TimelineItem.sql("""
+    results = await TimelineItem.aselect("""
         SELECT * FROM timeline_items 
         WHERE project_id = %(project_id)s 
         ORDER BY order_index ASC, created_at ASC
     """, {"project_id": project_id})
     
-    return [TimelineItem(**result) for result in results]
+    return results
 
 @authenticated
 def create_timeline_item(user: User, project_id: UUID, title: str, description: str, 
@@ -129,20 +129,20 @@ def reorder_timeline_items(user: User, project_id: UUID, item_order: List[UUID])
     return True
 
 @public
-def get_timeline_item_by_id(timeline_item_id: UUID) -> Optional[TimelineItem]:
+async def get_timeline_item_by_id(timeline_item_id: UUID) -> Optional[TimelineItem]:
     """Get a specific timeline item by ID."""
-    results = TimelineItem.sql("SELECT * FROM timeline_items WHERE id = %(timeline_item_id)s", {"timeline_item_id": timeline_item_id})
+    results = await TimelineItem.aselect("SELECT * FROM timeline_items WHERE id = %(timeline_item_id)s", {"timeline_item_id": timeline_item_id})
     if results:
-        return TimelineItem(**results[0])
+        return results[0]
     return None
 
 @public
-def get_recent_timeline_activity(limit: int = 20) -> List[TimelineItem]:
+async def get_recent_timeline_activity(limit: int = 20) -> List[TimelineItem]:
     """Get recent timeline activity across all projects."""
-    results = TimelineItem.sql("""
+    results = await TimelineItem.aselect("""
         SELECT * FROM timeline_items 
         ORDER BY created_at DESC 
         LIMIT %(limit)s
     """, {"limit": limit})
     
-    return [TimelineItem(**result) for result in results]
\ No newline at end of file
+    return results
\ No newline at end of file
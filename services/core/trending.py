@@ -0,0 +1,117 @@
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+import uuid
+
+from core.activity_stats import prune_vote_buckets, vote_bucket_start
+from core.project_vote_bucket import ProjectVoteBucket
+
+logger = logging.getLogger(__name__)
+
+# ==================== Trending Ranking ====================
+
+TRENDING_WINDOW = timedelta(days=7)  # votes counted towards trending
+TRENDING_SIZE = 10  # projects in the ranking, and the most get_trending_projects returns
+TRENDING_TTL = 300  # seconds between recomputations of the ranking
+
+class TrendingRanking:
+    """Projects with the most votes over the trending window, computed from the hourly vote buckets.
+
+    start() recomputes it every ttl seconds on a background thread (which also prunes vote buckets past their
+    retention), so requests only ever read the cached ranking. Without the thread, e.g. in scripts, it is computed
+    on first use and whenever it is older than the TTL.
+    """
+
+    def __init__(self, window: timedelta = TRENDING_WINDOW, size: int = TRENDING_SIZE, ttl: float = TRENDING_TTL):
+        self.window = window
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._computed_at: Optional[float] = None
+        self._ranking: List[Dict] = []
+        self._project_ids = frozenset()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trending-ranking", daemon=True)
+        self._thread.start()
+        logger.info(f"Started trending ranking refresher (every {self.ttl}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+                prune_vote_buckets()
+            except Exception as e:
+                logger.error(f"Trending ranking refresh failed: {str(e)}")
+            if self._stop.wait(self.ttl):
+                return
+
+    def refresh(self):
+        """Recompute the ranking now"""
+        with self._lock:
+            self._compute()
+
+    def _compute(self):
+        """Query the ranking from the buckets. Holds the lock."""
+        # Whole hours: at most window / 1 hour bucket rows per project, however many votes were cast
+        rows = ProjectVoteBucket.sql(
+            """
+            SELECT project_id, SUM(vote_count) AS recent_votes
+            FROM project_vote_buckets
+            WHERE bucket_start >= %(since)s
+            GROUP BY project_id
+            HAVING SUM(vote_count) > 0
+            ORDER BY recent_votes DESC, project_id
+            LIMIT %(size)s
+            """,
+            {"since": vote_bucket_start(datetime.now() - self.window), "size": self.size}
+        )
+        self._ranking = [
+            {"rank": rank, "project_id": row["project_id"], "recent_votes": row["recent_votes"]}
+            for rank, row in enumerate(rows, start=1)
+        ]
+        self._project_ids = frozenset(row["project_id"] for row in rows)
+        self._computed_at = time.monotonic()
+
+    def _is_fresh(self) -> bool:
+        if self._computed_at is None:
+            return False
+        # With the refresher running, the last ranking stays in use until it replaces it
+        refreshing = self._thread is not None and self._thread.is_alive()
+        return refreshing or time.monotonic() - self._computed_at < self.ttl
+
+    def _ensure_computed(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if not self._is_fresh():
+                self._compute()
+
+    def ranking(self) -> List[Dict]:
+        """rank, project_id and recent_votes of the trending projects, most voted first"""
+        self._ensure_computed()
+        return list(self._ranking)
+
+    def is_trending(self, project_id: uuid.UUID) -> bool:
+        self._ensure_computed()
+        return project_id in self._project_ids
+
+    def invalidate(self):
+        """Force a recomputation on next use"""
+        with self._lock:
+            self._computed_at = None
+
+trending_ranking = TrendingRanking()
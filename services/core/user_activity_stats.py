@@ -0,0 +1,13 @@
+from solar import Table, ColumnDetails
+from datetime import datetime
+import uuid
+
+class UserActivityStats(Table):
+    __tablename__ = "user_activity_stats"
+    user_id: uuid.UUID = ColumnDetails(primary_key=True)  # One row per user, kept up to date by core.activity_stats
+    project_count: int = 0  # Projects created
+    vote_count: int = 0  # Projects voted on
+    donation_count: int = 0  # Distinct projects donated to
+    donation_total: float = 0.0  # Sum of all donations made
+    comment_count: int = 0  # Distinct projects commented on
+    updated_at: datetime = ColumnDetails(default_factory=datetime.now)
\ No newline at end of file
@@ -0,0 +1,254 @@
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+import logging
+import threading
+
+from core.vote import Vote
+from core.badge_queue import badge_queue
+from core import activity_stats
+from solar import Table
+from solar.config import config
+from solar.retry import is_overload_error, is_transient_error
+
+logger = logging.getLogger(__name__)
+
+# ==================== Write-Behind Vote Buffer ====================
+
+VOTE_BUFFER_FLUSH_INTERVAL = 1.0  # most seconds an accepted vote waits before it is written
+VOTE_BUFFER_MAX_PENDING = 5000  # votes held in memory; reaching it flushes in the voting request itself
+VOTE_BUFFER_BATCH_SIZE = 1000  # votes per INSERT statement
+VOTE_BUFFER_DRAIN_TIMEOUT = 30  # seconds shutdown waits for the last flush
+VOTE_BUFFER_MAX_ATTEMPTS = 3  # flushes a vote may fail on its own before it is dropped
+
+# Inserts a batch of votes, skipping repeats and unknown projects, and adds each project's new votes to vote_count
+# with one UPDATE per project row instead of one per vote
+_FLUSH_VOTES = """
+    WITH inserted AS (
+        INSERT INTO votes (id, user_id, project_id, created_at)
+        SELECT v.id, v.user_id, v.project_id, v.created_at
+        FROM unnest(%(ids)s::uuid[], %(user_ids)s::uuid[], %(project_ids)s::uuid[], %(created_at)s::timestamp[])
+            AS v(id, user_id, project_id, created_at)
+        WHERE EXISTS (SELECT 1 FROM projects p WHERE p.id = v.project_id)
+        ON CONFLICT (user_id, project_id) DO NOTHING
+        RETURNING user_id, project_id, created_at
+    ), counted AS (
+        UPDATE projects p SET vote_count = p.vote_count + c.votes
+        FROM (SELECT project_id, COUNT(*) AS votes FROM inserted GROUP BY project_id) c
+        WHERE p.id = c.project_id
+    )
+    SELECT user_id, project_id, created_at FROM inserted
+"""
+
+class VoteBuffer:
+    """Optional in-process buffer that accepts votes in memory and writes them in batches (SOLAR_VOTE_BUFFER=true).
+
+    Under a vote storm each vote otherwise takes its own INSERT and its own update of the hot project row. Buffered
+    votes are deduplicated per (user, project) and written every flush_interval seconds, or as soon as max_pending
+    are held, in one transaction: multi-row inserts, one vote_count update per project and the activity counters.
+
+    Durability: a vote is acknowledged once it is in memory, not once it is committed. Votes accepted in the last
+    flush_interval seconds (at most max_pending of them) are lost if the process dies; stop() on shutdown writes
+    them. When the database is unreachable or overloaded a flush is rolled back and retried whole on the next
+    interval. Any other failure is narrowed down by splitting the batch in halves, so one bad vote (e.g. for a
+    project deleted in the meantime) doesn't hold back the rest: the others are written, and a vote that keeps
+    failing on its own is dropped and logged after max_attempts flushes. Retries are safe because repeats are
+    skipped by the unique (user_id, project_id) index. Until a vote is flushed only this process sees it
+    (has_user_voted checks the buffer).
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, flush_interval: float = VOTE_BUFFER_FLUSH_INTERVAL,
+                 max_pending: int = VOTE_BUFFER_MAX_PENDING, batch_size: int = VOTE_BUFFER_BATCH_SIZE,
+                 max_attempts: int = VOTE_BUFFER_MAX_ATTEMPTS):
+        self.enabled = config.vote_buffer_enabled() if enabled is None else enabled
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()  # one flush at a time; discard() waits for it too
+        self._pending: Dict[Tuple[UUID, UUID], Vote] = {}
+        self._flushing: Dict[Tuple[UUID, UUID], Vote] = {}  # votes being written by the current flush
+        self._attempts: Dict[Tuple[UUID, UUID], int] = {}  # failed flushes of the votes that failed on their own
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._counters = dict.fromkeys(
+            ("buffered", "deduplicated", "written", "dropped", "rejected", "flushes", "failed"), 0
+        )
+
+    def add(self, user_id: UUID, project_id: UUID) -> bool:
+        """Accept a vote for writing with the next flush; False if the user already voted or there's no such project."""
+        key = (user_id, project_id)
+        with self._condition:
+            self._start_worker()
+            if key in self._pending or key in self._flushing:
+                self._counters["deduplicated"] += 1
+                return False
+        # Same answer as the direct path gives for a repeat or an unknown project
+        accepted = Vote.sql("""
+            SELECT p.id FROM projects p
+            WHERE p.id = %(project_id)s
+              AND NOT EXISTS (SELECT 1 FROM votes v WHERE v.user_id = %(user_id)s AND v.project_id = p.id)
+        """, {"user_id": user_id, "project_id": project_id})
+        if not accepted:
+            return False
+
+        with self._condition:
+            full = len(self._pending) >= self.max_pending
+        if full:
+            # Back pressure instead of growing without bound while flushes fall behind or fail
+            self.flush()
+
+        with self._condition:
+            if key in self._pending or key in self._flushing:
+                self._counters["deduplicated"] += 1
+                return False
+            self._pending[key] = Vote(user_id=user_id, project_id=project_id)
+            self._counters["buffered"] += 1
+            if len(self._pending) >= self.max_pending:
+                self._condition.notify_all()
+        return True
+
+    def discard(self, user_id: UUID, project_id: UUID) -> bool:
+        """Drop a vote that hasn't been written yet; True if there was one."""
+        # Waiting for a flush in progress means the vote is either still pending or already committed
+        with self._flush_lock:
+            with self._condition:
+                self._attempts.pop((user_id, project_id), None)
+                return self._pending.pop((user_id, project_id), None) is not None
+
+    def is_pending(self, user_id: UUID, project_id: UUID) -> bool:
+        key = (user_id, project_id)
+        with self._condition:
+            return key in self._pending or key in self._flushing
+
+    def _start_worker(self):
+        """Start the flush thread. Holds the condition."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._work, name="vote-buffer", daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopping or len(self._pending) >= self.max_pending, self.flush_interval
+                )
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Vote buffer flush failed, retrying with the next one: {str(e)}")
+            if stopping:
+                return
+
+    def flush(self) -> int:
+        """Write every pending vote now; returns how many were inserted (repeats and unknown projects are not).
+
+        Raises the error that kept the votes from being written when the database is unreachable or overloaded;
+        they stay pending for the next flush.
+        """
+        with self._flush_lock:
+            with self._condition:
+                self._flushing, self._pending = self._pending, {}
+                votes = list(self._flushing.values())
+            if not votes:
+                return 0
+
+            inserted: List[Dict] = []
+            written: Set[Tuple[UUID, UUID]] = set()
+            failed: Dict[Tuple[UUID, UUID], Exception] = {}
+            error = None
+            try:
+                self._write_isolating(votes, inserted, written, failed)
+            except Exception as e:
+                error = e
+
+            with self._condition:
+                retry = {}
+                for key, vote in self._flushing.items():
+                    if key in written:
+                        self._attempts.pop(key, None)
+                        continue
+                    if key in failed:
+                        attempts = self._attempts.get(key, 0) + 1
+                        if attempts >= self.max_attempts:
+                            self._attempts.pop(key, None)
+                            self._counters["rejected"] += 1
+                            logger.error(
+                                f"Dropping the vote of user {key[0]} for project {key[1]} after {attempts} "
+                                f"failed flushes: {str(failed[key])}"
+                            )
+                            continue
+                        self._attempts[key] = attempts
+                    retry[key] = vote
+                # Put back what wasn't written, behind none of the newer votes
+                self._pending = {**retry, **self._pending}
+                self._flushing = {}
+                self._counters["flushes"] += 1
+                if error is not None or failed:
+                    self._counters["failed"] += 1
+                self._counters["written"] += len(inserted)
+                self._counters["dropped"] += len(written) - len(inserted)
+
+        for row in inserted:
+            badge_queue.enqueue(project_id=row["project_id"], user_id=row["user_id"])
+        if error is not None:
+            raise error
+        return len(inserted)
+
+    def _write_isolating(self, votes: List[Vote], inserted: List[Dict], written: Set[Tuple[UUID, UUID]],
+                         failed: Dict[Tuple[UUID, UUID], Exception]):
+        """Commit votes, halving a batch that fails until the failing votes are alone; collects the inserted rows,
+        the keys of the committed votes and the error of each vote that failed on its own."""
+        try:
+            inserted += self._commit(votes)
+            written.update((vote.user_id, vote.project_id) for vote in votes)
+            return
+        except Exception as e:
+            if is_overload_error(e) or is_transient_error(e):
+                raise  # Not the votes' fault; splitting the batch would only fail more often
+            if len(votes) == 1:
+                failed[(votes[0].user_id, votes[0].project_id)] = e
+                return
+        middle = len(votes) // 2
+        self._write_isolating(votes[:middle], inserted, written, failed)
+        self._write_isolating(votes[middle:], inserted, written, failed)
+
+    def _commit(self, votes: List[Vote]) -> List[Dict]:
+        """Write votes and their activity counters in one transaction"""
+        with Table.transaction():
+            inserted: List[Dict] = []
+            for i in range(0, len(votes), self.batch_size):
+                inserted += self._write(votes[i : i + self.batch_size])
+            activity_stats.record_votes(
+                [(row["user_id"], row["project_id"], row["created_at"]) for row in inserted]
+            )
+        return inserted
+
+    @staticmethod
+    def _write(votes: List[Vote]) -> List[Dict]:
+        # Multi-row statements vary with the batch length and are rarely repeated, so don't prepare them
+        return Vote.sql(_FLUSH_VOTES, {
+            "ids": [vote.id for vote in votes],
+            "user_ids": [vote.user_id for vote in votes],
+            "project_ids": [vote.project_id for vote in votes],
+            "created_at": [vote.created_at for vote in votes],
+        }, prepare=False)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Write what is still pending, then stop the flush thread (it starts again on the next add)."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._condition:
+            self._stopping = False
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {**self._counters, "pending": len(self._pending) + len(self._flushing)}
+
+vote_buffer = VoteBuffer()
@@ -1,74 +1,175 @@
 from typing import List, Optional
 from uuid import UUID
+import logging
+import argparse
+import time
+from solar import Table
 from solar.access import User, authenticated, public
 from core.vote import Vote
 from core.project import Project
-from core.badge_service import check_badges_after_vote
+from core.badge_queue import badge_queue
+from core import activity_stats
+from core.vote_buffer import vote_buffer
+
+logger = logging.getLogger(__name__)
+
+# ==================== Vote Uniqueness ====================
+
+# vote_for_project and the vote buffer rely on a unique (user_id, project_id) index on votes for ON CONFLICT, and it
+# is what keeps concurrent votes from double counting. Create it once:
+#     python -m core.voting_service create-unique-index
+# Until it exists, votes are written one by one with a NOT EXISTS check instead (see vote_unique_index_ready).
+VOTE_UNIQUE_INDEX = "votes_user_id_project_id_key"
+VOTE_UNIQUE_INDEX_RECHECK = 60  # seconds between checks for the index, until it is found
+
+def has_vote_unique_index() -> bool:
+    """Whether votes has a valid unique index on exactly (user_id, project_id), whatever it is called."""
+    existing = Vote.sql("""
+        SELECT 1
+        FROM pg_index i
+        WHERE i.indrelid = 'votes'::regclass
+          AND i.indisunique AND i.indisvalid
+          AND i.indpred IS NULL AND i.indexprs IS NULL
+          AND i.indnkeyatts = 2
+          AND (
+              SELECT array_agg(a.attname::text ORDER BY a.attname)
+              FROM pg_attribute a
+              WHERE a.attrelid = i.indrelid AND a.attnum = ANY((i.indkey::int2[])[0:i.indnkeyatts - 1])
+          ) = ARRAY['project_id', 'user_id']
+    """, read_only=False)
+    return len(existing) > 0
+
+_vote_unique_index_found = False
+_vote_unique_index_checked_at: Optional[float] = None
+
+def vote_unique_index_ready() -> bool:
+    """Cached has_vote_unique_index(): checked again at most every VOTE_UNIQUE_INDEX_RECHECK seconds until found."""
+    global _vote_unique_index_found, _vote_unique_index_checked_at
+    if _vote_unique_index_found:
+        return True
+    checked_at = _vote_unique_index_checked_at
+    if checked_at is None or time.monotonic() - checked_at >= VOTE_UNIQUE_INDEX_RECHECK:
+        _vote_unique_index_found = has_vote_unique_index()
+        _vote_unique_index_checked_at = time.monotonic()
+        if not _vote_unique_index_found:
+            logger.warning(
+                "votes has no unique (user_id, project_id) index; votes are written unbuffered with a NOT EXISTS "
+                "check until 'python -m core.voting_service create-unique-index' is run"
+            )
+    return _vote_unique_index_found
+
+def remove_duplicate_votes() -> int:
+    """Delete all but the first vote of each (user, project) and recount what they were counted in."""
+    with Table.transaction():
+        # Left by the old check-then-insert path; they would make the unique index fail
+        removed = Vote.sql("""
+            DELETE FROM votes v
+            USING votes earlier
+            WHERE earlier.user_id = v.user_id AND earlier.project_id = v.project_id
+              AND (earlier.created_at, earlier.id) < (v.created_at, v.id)
+            RETURNING v.user_id, v.project_id
+        """)
+        if removed:
+            project_ids = list({row["project_id"] for row in removed})
+            Project.sql("""
+                UPDATE projects p
+                SET vote_count = (SELECT COUNT(*) FROM votes WHERE project_id = p.id)
+                WHERE p.id = ANY(%(project_ids)s)
+            """, {"project_ids": project_ids})
+            activity_stats.refresh_user_stats(list({row["user_id"] for row in removed}))
+            activity_stats.refresh_project_stats(project_ids)
+    return len(removed)
+
+def create_vote_unique_index() -> bool:
+    """Deduplicate votes and build the unique index without blocking writes; False if one already exists."""
+    if has_vote_unique_index():
+        return False
+    removed = remove_duplicate_votes()
+    if removed:
+        logger.warning(f"Removed {removed} duplicate votes before creating {VOTE_UNIQUE_INDEX}")
+    # An interrupted CONCURRENTLY build leaves an invalid index behind, which IF NOT EXISTS would keep
+    Vote.sql_autocommit(f"DROP INDEX CONCURRENTLY IF EXISTS {VOTE_UNIQUE_INDEX}")
+    Vote.sql_autocommit(f"CREATE UNIQUE INDEX CONCURRENTLY {VOTE_UNIQUE_INDEX} ON votes (user_id, project_id)")
+    return True
+
+# ==================== Voting ====================
+
+def _insert_vote_sql(uniqueness: str) -> str:
+    """Insert the vote, unless repeated or for an unknown project, and count it in vote_count, the activity counters
+    and its hourly bucket, all in one statement. uniqueness is the clause that skips a repeated vote.
+    """
+    return f"""
+        WITH inserted AS (
+            INSERT INTO votes (id, user_id, project_id, created_at)
+            SELECT %(id)s, %(user_id)s, p.id, %(created_at)s FROM projects p WHERE p.id = %(project_id)s
+            {uniqueness}
+            RETURNING user_id, project_id, created_at
+        ), counted AS (
+            UPDATE projects SET vote_count = vote_count + 1
+            WHERE id IN (SELECT project_id FROM inserted)
+        ), {activity_stats.vote_counter_ctes("inserted", 1)}
+        SELECT project_id FROM inserted
+    """
+
+# The unique index serializes concurrent double-clicks, so a vote can't be counted twice
+_INSERT_VOTE = _insert_vote_sql("ON CONFLICT (user_id, project_id) DO NOTHING")
+# Until the index exists (see vote_unique_index_ready): ON CONFLICT without it fails every vote
+_INSERT_VOTE_UNINDEXED = _insert_vote_sql(
+    "AND NOT EXISTS (SELECT 1 FROM votes WHERE user_id = %(user_id)s AND project_id = %(project_id)s)"
+)
+
+# Deletes the vote and uncounts it everywhere it was counted, in one statement; nothing changes if there was none
+_REMOVE_VOTE = f"""
+    WITH removed AS (
+        DELETE FROM votes
+        WHERE user_id = %(user_id)s AND project_id = %(project_id)s
+        RETURNING user_id, project_id, created_at
+    ), counted AS (
+        UPDATE projects SET vote_count = vote_count - 1
+        WHERE id IN (SELECT project_id FROM removed)
+    ), {activity_stats.vote_counter_ctes("removed", -1)}
+    SELECT created_at FROM removed
+"""
 
 @authenticated
 def vote_for_project(user: User, project_id: UUID) -> bool:
     """Vote for a project (one vote per user per project)."""
-    # Check if user already voted for this project
-    existing_vote = Vote.sql("""
-        SELECT * FROM votes 
-        WHERE user_id = %(user_id)s AND project_id = %(project_id)s
-    """, {"user_id": user.id, "project_id": project_id})
-    
-    if existing_vote:
-        return False  # User already voted
-    
-    # Check if project exists
-    project_exists = Project.sql("SELECT id FROM projects WHERE id = %(project_id)s", {"project_id": project_id})
-    if not project_exists:
-        return False
-    
-    # Create vote
+    indexed = vote_unique_index_ready()
+    if vote_buffer.enabled and indexed:
+        # Written with the buffer's next flush; see VoteBuffer for what is guaranteed until then
+        return vote_buffer.add(user.id, project_id)
+
     vote = Vote(user_id=user.id, project_id=project_id)
-    vote.sync()
+    inserted = Vote.sql(
+        _INSERT_VOTE if indexed else _INSERT_VOTE_UNINDEXED,
+        {"id": vote.id, "user_id": user.id, "project_id": project_id, "created_at": vote.created_at},
+    )
+    if not inserted:
+        return False  # Already voted, or no such project
     
-    # Update project vote count
-    Project.sql("""
-        UPDATE projects 
-        SET vote_count = vote_count + 1 
-        WHERE id = %(project_id)s
-    """, {"project_id": project_id})
-    
-    # Check and award badges after voting
-    check_badges_after_vote(project_id, user.id)
+    # Check and award badges in the background, once the vote is committed
+    badge_queue.enqueue(project_id=project_id, user_id=user.id)
     
     return True
 
 @authenticated
 def remove_vote_for_project(user: User, project_id: UUID) -> bool:
     """Remove vote for a project."""
-    # Check if user voted for this project
-    existing_vote = Vote.sql("""
-        SELECT * FROM votes 
-        WHERE user_id = %(user_id)s AND project_id = %(project_id)s
-    """, {"user_id": user.id, "project_id": project_id})
-    
-    if not existing_vote:
+    if vote_buffer.enabled and vote_buffer.discard(user.id, project_id):
+        return True  # The vote was never written
+
+    removed = Vote.sql(_REMOVE_VOTE, {"user_id": user.id, "project_id": project_id})
+    if not removed:
         return False  # User hasn't voted
     
-    # Remove vote
-    Vote.sql("""
-        DELETE FROM votes 
-        WHERE user_id = %(user_id)s AND project_id = %(project_id)s
-    """, {"user_id": user.id, "project_id": project_id})
-    
-    # Update project vote count
-    Project.sql("""
-        UPDATE projects 
-        SET vote_count = vote_count - 1 
-        WHERE id = %(project_id)s
-    """, {"project_id": project_id})
-    
     return True
 
 @authenticated
-def has_user_voted(user: User, project_id: UUID) -> bool:
+async def has_user_voted(user: User, project_id: UUID) -> bool:
     """Check if user has voted for a specific project."""
-    existing_vote = Vote.sql("""
+    if vote_buffer.enabled and vote_buffer.is_pending(user.id, project_id):
+        return True
+    existing_vote = await Vote.asql("""
         SELECT id FROM votes 
         WHERE user_id = %(user_id)s AND project_id = %(project_id)s
     """, {"user_id": user.id, "project_id": project_id})
@@ -76,31 +177,44 @@ def has_user_voted(user: User, project_id: UUID) -> bool:
     return len(existing_vote) > 0
 
 @public
-def get_project_vote_count(project_id: UUID) -> int:
+async def get_project_vote_count(project_id: UUID) -> int:
     """Get the total vote count for a project."""
-    result = Vote.sql("""
+    result = await Vote.asql("""
         SELECT COUNT(*) as count FROM votes WHERE project_id = %(project_id)s
     """, {"project_id": project_id})
     
     return result[0]["count"] if result else 0
 
 @authenticated
-def get_user_votes(user: User) -> List[Vote]:
+async def get_user_votes(user: User) -> List[Vote]:
     """Get all votes by a user."""
-    results = Vote.sql("""
+    results = await Vote.aselect("""
         SELECT * FROM votes WHERE user_id = %(user_id)s ORDER BY created_at DESC
     """, {"user_id": user.id})
     
-    return [Vote(**result) for result in results]
+    return results
 
 @public
-def get_project_voters(project_id: UUID, limit: int = 10) -> List[Vote]:
+async def get_project_voters(project_id: UUID, limit: int = 10) -> List[Vote]:
     """Get recent voters for a project (for displaying)."""
-    results = Vote.sql("""
+    results = await Vote.aselect("""
         SELECT * FROM votes 
         WHERE project_id = %(project_id)s 
         ORDER BY created_at DESC 
         LIMIT %(limit)s
     """, {"project_id": project_id, "limit": limit})
     
-    return [Vote(**result) for result in results]
\ No newline at end of file
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance for the votes table")
+    parser.add_argument(
+        "command", choices=["create-unique-index"],
+        help="create-unique-index: remove duplicate votes and create the unique (user_id, project_id) index"
+    )
+    args = parser.parse_args()
+    if args.command == "create-unique-index":
+        if create_vote_unique_index():
+            print(f"Created {VOTE_UNIQUE_INDEX} on votes")
+        else:
+            print("votes already has a unique (user_id, project_id) index")
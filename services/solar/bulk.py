@@ -0,0 +1,111 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# This file contains the helpers behind Table.copy_many, the COPY FROM STDIN (binary) bulk loader. Binary COPY sends
+# every value with the dumper of its target column type, so Python values that the text protocol would happily cast
+# server-side (a float into numeric, a str into uuid, a naive datetime into timestamptz) are coerced here first.
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from datetime import datetime, tzinfo
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Tuple
+
+from psycopg.types.json import Json, Jsonb
+
+import uuid
+
+######################################################################################################################
+# Column Types
+######################################################################################################################
+
+
+COPY_COLUMN_TYPES_SQL = """
+    SELECT a.attname, a.atttypid::int AS oid, t.typname
+    FROM pg_attribute a
+    JOIN pg_type t ON t.oid = a.atttypid
+    WHERE a.attrelid = %(table_name)s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+"""
+
+Coercer = Optional[Callable[[Any], Any]]
+
+
+def _to_uuid(value):
+    return uuid.UUID(value) if isinstance(value, str) else value
+
+
+def _to_decimal(value):
+    return Decimal(repr(value)) if isinstance(value, float) else value
+
+
+def _to_int(value):
+    return int(value) if isinstance(value, (float, Decimal)) else value
+
+
+def _to_text(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _to_jsonb(value):
+    return Jsonb(value) if isinstance(value, (dict, list)) else value
+
+
+def _to_json(value):
+    return Json(value) if isinstance(value, (dict, list)) else value
+
+
+def copy_coercer(type_name: str, timezone: tzinfo) -> Coercer:
+    """Return the value coercion needed for a column of type_name, or None if values pass through as-is"""
+    if type_name == "uuid":
+        return _to_uuid
+    if type_name == "numeric":
+        return _to_decimal
+    if type_name in ("int2", "int4", "int8"):
+        return _to_int
+    if type_name in ("text", "varchar", "bpchar"):
+        return _to_text
+    if type_name == "jsonb":
+        return _to_jsonb
+    if type_name == "json":
+        return _to_json
+    if type_name == "timestamptz":
+        # The text protocol interprets naive datetimes in the session time zone; do the same
+        return lambda value: (
+            value.replace(tzinfo=timezone)
+            if isinstance(value, datetime) and value.tzinfo is None
+            else value
+        )
+    if type_name == "timestamp":
+        return lambda value: (
+            value.astimezone(timezone).replace(tzinfo=None)
+            if isinstance(value, datetime) and value.tzinfo is not None
+            else value
+        )
+    return None
+
+
+def copy_column_types(cursor, table_name: str, columns) -> List[Tuple[int, Coercer]]:
+    """Look up (type oid, coercer) for each column, in the given order"""
+    cursor.execute(COPY_COLUMN_TYPES_SQL, {"table_name": table_name})
+    return _column_types(cursor.fetchall(), cursor.connection.info.timezone, table_name, columns)
+
+
+async def acopy_column_types(cursor, table_name: str, columns) -> List[Tuple[int, Coercer]]:
+    """Async counterpart of copy_column_types"""
+    await cursor.execute(COPY_COLUMN_TYPES_SQL, {"table_name": table_name})
+    return _column_types(await cursor.fetchall(), cursor.connection.info.timezone, table_name, columns)
+
+
+def _column_types(rows, timezone: tzinfo, table_name: str, columns) -> List[Tuple[int, Coercer]]:
+    types_by_column = {row["attname"]: row for row in rows}
+    column_types = []
+    for col in columns:
+        if col not in types_by_column:
+            raise ValueError(f"Column {col} does not exist on {table_name}")
+        row = types_by_column[col]
+        column_types.append((row["oid"], copy_coercer(row["typname"], timezone)))
+    return column_types
@@ -14,7 +14,7 @@ from pathlib import Path
 import sys
 import os
 from dotenv import load_dotenv
-from typing import Union, Dict, Optional
+from typing import Union, Dict, List, Optional, Set
 
 ######################################################################################################################
 # Configuration Class
@@ -25,6 +25,16 @@ class ConfigurationError(Exception):
     pass
 
 
+# Connection pool settings that can be overridden per PG resource, with their types
+POOL_SETTINGS = {
+    "min_size": int,
+    "max_size": int,
+    "timeout": float,
+    "max_idle": float,
+    "max_lifetime": float,
+}
+
+
 class Config:
     """Centralized configuration for Solar SDK environment variables."""
 
@@ -93,6 +103,75 @@ class Config:
             return "NEON_CONN_URL"
         return connection_string_val
 
+    def get_replica_connection_strings(self, pg_key: str) -> List[str]:
+        """Get the read replica connection strings for a PG resource (SOLAR_REPLICA_<PG_KEY>, comma separated)."""
+        replicas_val = os.getenv(f"SOLAR_REPLICA_{pg_key}", "")
+        return [conn_string.strip() for conn_string in replicas_val.split(",") if conn_string.strip()]
+
+    def replica_read_your_writes(self) -> bool:
+        """Whether reads go back to the primary for the rest of a request once it has written to a PG resource."""
+        enabled_val = os.getenv("SOLAR_REPLICA_READ_YOUR_WRITES", "true")
+        return enabled_val.strip().lower() not in ("0", "false", "no", "off")
+
+    def prepared_statements_enabled(self) -> bool:
+        """Whether Table.sql should run statements as server-side prepared statements.
+
+        Off by default: prepared statements live on one server connection, which transaction-mode poolers
+        (PgBouncer, Neon's -pooler endpoint) don't pin, so they fail with "prepared statement ... does not exist".
+        Set SOLAR_PREPARED_STATEMENTS=true only when connecting to Postgres directly or through a session pooler.
+        """
+        enabled_val = os.getenv("SOLAR_PREPARED_STATEMENTS", "false")
+        return enabled_val.strip().lower() not in ("0", "false", "no", "off")
+
+    def prepared_statements_max(self) -> int:
+        """Maximum number of prepared statements kept per pooled connection."""
+        return int(os.getenv("SOLAR_PREPARED_STATEMENTS_MAX", "100"))
+
+    def identity_map_enabled(self) -> bool:
+        """Whether every API request gets a Table.identity_map() read cache."""
+        enabled_val = os.getenv("SOLAR_IDENTITY_MAP", "false")
+        return enabled_val.strip().lower() not in ("0", "false", "no", "off")
+
+    def metrics_endpoints_enabled(self) -> bool:
+        """Whether /metrics, /api/query_stats and /api/pool_stats are served (they expose SQL and pool internals)."""
+        enabled_val = os.getenv("SOLAR_METRICS_ENDPOINTS", "false")
+        return enabled_val.strip().lower() not in ("0", "false", "no", "off")
+
+    def vote_buffer_enabled(self) -> bool:
+        """Whether votes are accepted into the in-process write-behind buffer instead of being written one by one."""
+        enabled_val = os.getenv("SOLAR_VOTE_BUFFER", "false")
+        return enabled_val.strip().lower() not in ("0", "false", "no", "off")
+
+    def admin_emails(self) -> Set[str]:
+        """Lower-cased emails allowed to call the admin endpoints (ADMIN_EMAILS, comma separated).
+
+        Empty when unset, and then the admin endpoints (badge recalculation and its job) refuse everyone with 403.
+        """
+        emails_val = os.getenv("ADMIN_EMAILS", "")
+        return {email.strip().lower() for email in emails_val.split(",") if email.strip()}
+
+    def slow_query_ms(self) -> float:
+        """Statements slower than this many milliseconds are logged by the query instrumentation (0 disables)."""
+        return float(os.getenv("SOLAR_SLOW_QUERY_MS", "500"))
+
+    def pool_settings(self, pg_key: str) -> Dict[str, float]:
+        """Get the connection pool sizing overrides for a PG resource.
+
+        Each setting is read from SOLAR_POOL_<PG_KEY>_<SETTING> first and SOLAR_POOL_<SETTING> second, e.g.
+        SOLAR_POOL_NEON_CONN_URL_MAX_SIZE=20 or SOLAR_POOL_MIN_SIZE=2. Settings that are not set are left out so the
+        pool defaults apply.
+        """
+        settings = {}
+        for name, cast in POOL_SETTINGS.items():
+            value = os.getenv(f"SOLAR_POOL_{pg_key}_{name.upper()}", os.getenv(f"SOLAR_POOL_{name.upper()}"))
+            if value is None or value.strip() == "":
+                continue
+            try:
+                settings[name] = cast(value)
+            except ValueError:
+                raise ConfigurationError(f"Invalid pool {name} for {pg_key}: {value}")
+        return settings
+
     def model_api_key(self, throw_if_missing: bool = True) -> str:
         """Get the OpenRouter API key for model access."""
         api_key = os.getenv("OPENROUTER_API_KEY")
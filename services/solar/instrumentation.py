@@ -0,0 +1,338 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# This file contains the query instrumentation behind Table.sql/asql, Table.batch/abatch, stream/astream and
+# copy_many. Every statement is reduced to a fingerprint
+# (whitespace collapsed, literals replaced by ?) and its latency, rows returned, pool wait time, retries and errors are
+# aggregated per fingerprint. Statements slower than the configured threshold are logged, extra hooks can subscribe
+# to every query, and render_prometheus() exposes everything (plus the pool and retry counters) in the Prometheus
+# text format.
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from statistics import quantiles
+from typing import Callable, Dict, List, Optional
+
+from .config import config
+from .pool import get_pool_stats
+from .retry import retry_stats
+
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+######################################################################################################################
+# Fingerprints
+######################################################################################################################
+
+
+MAX_FINGERPRINTS = 500  # Beyond this, new statements are counted under OTHER_FINGERPRINT
+OTHER_FINGERPRINT = "other"
+LATENCY_SAMPLES = 1024  # Most recent latencies kept per fingerprint for the percentiles
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w%])\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql_statement: str) -> str:
+    """The statement with whitespace collapsed and literals replaced by ?, so equivalent queries group together"""
+    normalized = _STRING_LITERAL.sub("?", str(sql_statement))
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+######################################################################################################################
+# Query Stats
+######################################################################################################################
+
+
+class QueryEvent:
+    """One finished statement, as passed to instrumentation hooks"""
+
+    __slots__ = ("fingerprint", "pg_key", "duration_ms", "pool_wait_ms", "rows", "retries", "fallbacks", "error")
+
+    def __init__(self, fingerprint, pg_key, duration_ms, pool_wait_ms, rows, retries, error, fallbacks=0):
+        self.fingerprint = fingerprint
+        self.pg_key = pg_key
+        self.duration_ms = duration_ms
+        self.pool_wait_ms = pool_wait_ms
+        self.rows = rows
+        self.retries = retries
+        self.fallbacks = fallbacks
+        self.error = error
+
+
+class QueryStats:
+    """Running totals for one fingerprint"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.total_ms = 0.0
+        self.pool_wait_ms = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, event: QueryEvent):
+        self.count += 1
+        self.errors += 1 if event.error else 0
+        self.rows += event.rows
+        self.retries += event.retries
+        self.fallbacks += event.fallbacks
+        self.total_ms += event.duration_ms
+        self.pool_wait_ms += event.pool_wait_ms
+        self.latencies.append(event.duration_ms)
+
+    def percentiles(self) -> Dict[str, float]:
+        samples = list(self.latencies)
+        if len(samples) < 2:
+            value = samples[0] if samples else 0.0
+            return {"p50": value, "p99": value}
+        cuts = quantiles(samples, n=100)
+        return {"p50": cuts[49], "p99": cuts[98]}
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "total_ms": self.total_ms,
+            "pool_wait_ms": self.pool_wait_ms,
+            **self.percentiles(),
+        }
+
+
+class QueryObservation:
+    """Timing for one Table.sql call; created by Instrumentation.observe"""
+
+    def __init__(self, sql_statement: str, pg_key: str):
+        self.sql_statement = sql_statement
+        self.pg_key = pg_key
+        self.started = time.perf_counter()
+        self.pool_wait = 0.0
+        self.attempts = 0
+        self.fallbacks = 0
+        self.rows = 0
+
+    @property
+    def retries(self) -> int:
+        """Checkouts after the first, not counting the primary attempt that follows a failed replica read"""
+        return max(self.attempts - self.fallbacks - 1, 0)
+
+    def replica_failed(self):
+        """Mark the replica attempt as failed; the primary checkout that follows is a fallback, not a retry"""
+        self.fallbacks += 1
+
+    @contextmanager
+    def checkout(self, connection_context):
+        """Enter a pool.connection() context, counting the time spent waiting for the connection"""
+        self.attempts += 1
+        start = time.perf_counter()
+        with connection_context as conn:
+            self.pool_wait += time.perf_counter() - start
+            yield conn
+
+    @asynccontextmanager
+    async def acheckout(self, connection_context):
+        """Async counterpart of checkout"""
+        self.attempts += 1
+        start = time.perf_counter()
+        async with connection_context as conn:
+            self.pool_wait += time.perf_counter() - start
+            yield conn
+
+
+class BatchObservation(QueryObservation):
+    """Timing for one pipelined Table.batch group; each statement is recorded separately, sharing the time"""
+
+    def __init__(self, sql_statements: List[str], pg_key: str):
+        super().__init__(sql_statements[0] if sql_statements else "", pg_key)
+        self.sql_statements = sql_statements
+        self.rows_per_statement = [0] * len(sql_statements)
+
+
+class Instrumentation:
+    """Per-fingerprint query stats, the slow query log and the hooks registered with add_hook"""
+
+    def __init__(self, slow_query_ms: float):
+        self.slow_query_ms = slow_query_ms
+        self._stats: Dict[str, QueryStats] = {}
+        self._hooks: List[Callable[[QueryEvent], None]] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Callable[[QueryEvent], None]):
+        """Call hook with a QueryEvent after every statement (e.g. to forward to a tracing backend)"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[QueryEvent], None]):
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    @contextmanager
+    def observe(self, sql_statement: str, pg_key: str):
+        """Time the block as one statement; set .rows on the yielded observation before it ends"""
+        query = QueryObservation(sql_statement, pg_key)
+        error = False
+        try:
+            yield query
+        except GeneratorExit:
+            raise  # A stream closed before its end
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(query, error)
+
+    @contextmanager
+    def observe_batch(self, sql_statements: List[str], pg_key: str):
+        """
+        Time the block as one pipeline; set .rows_per_statement on the yielded observation before it ends. Every
+        statement is recorded as its own query (one round trip each in the stats), with an equal share of the time.
+        """
+        query = BatchObservation(sql_statements, pg_key)
+        error = False
+        try:
+            yield query
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record_batch(query, error)
+
+    def record(self, query: QueryObservation, error: bool = False):
+        self._record_event(QueryEvent(
+            fingerprint=fingerprint(query.sql_statement),
+            pg_key=query.pg_key,
+            duration_ms=(time.perf_counter() - query.started) * 1000,
+            pool_wait_ms=query.pool_wait * 1000,
+            rows=query.rows,
+            retries=query.retries,
+            fallbacks=query.fallbacks,
+            error=error,
+        ))
+
+    def record_batch(self, query: BatchObservation, error: bool = False):
+        count = len(query.sql_statements) or 1
+        duration_ms = (time.perf_counter() - query.started) * 1000 / count
+        pool_wait_ms = query.pool_wait * 1000 / count
+        for sql_statement, rows in zip(query.sql_statements, query.rows_per_statement):
+            self._record_event(QueryEvent(
+                fingerprint=fingerprint(sql_statement),
+                pg_key=query.pg_key,
+                duration_ms=duration_ms,
+                pool_wait_ms=pool_wait_ms,
+                rows=rows,
+                retries=query.retries,
+                fallbacks=query.fallbacks,
+                error=error,
+            ))
+
+    def _record_event(self, event: QueryEvent):
+        with self._lock:
+            key = event.fingerprint
+            if key not in self._stats and len(self._stats) >= MAX_FINGERPRINTS:
+                key = OTHER_FINGERPRINT
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats()
+            stats.add(event)
+
+        if self.slow_query_ms and event.duration_ms >= self.slow_query_ms:
+            logger.warning(
+                f"Slow query ({event.duration_ms:.1f}ms, pool wait {event.pool_wait_ms:.1f}ms, "
+                f"{event.rows} rows, {event.retries} retries) on {event.pg_key}: {event.fingerprint}"
+            )
+
+        for hook in list(self._hooks):
+            try:
+                hook(event)
+            except Exception as e:
+                logger.warning(f"Query instrumentation hook failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Stats per fingerprint, slowest total time first"""
+        with self._lock:
+            snapshot = {key: stats.to_dict() for key, stats in self._stats.items()}
+        return dict(sorted(snapshot.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+instrumentation = Instrumentation(config.slow_query_ms())
+
+
+######################################################################################################################
+# Prometheus Export
+######################################################################################################################
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _metric(lines: List[str], name: str, metric_type: str, help_text: str, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples:
+        label_str = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items())
+        lines.append(f"{name}{{{label_str}}} {value}")
+
+
+def render_prometheus(query_stats: Optional[Dict[str, Dict]] = None) -> str:
+    """Query, pool and retry metrics in the Prometheus text exposition format"""
+    query_stats = instrumentation.stats() if query_stats is None else query_stats
+    lines: List[str] = []
+
+    summary = []
+    for key, stats in query_stats.items():
+        summary.append(({"fingerprint": key, "quantile": "0.5"}, stats["p50"]))
+        summary.append(({"fingerprint": key, "quantile": "0.99"}, stats["p99"]))
+    _metric(lines, "solar_query_duration_ms", "summary", "Statement latency per fingerprint", summary)
+    for key, stats in query_stats.items():
+        lines.append(f'solar_query_duration_ms_sum{{fingerprint="{_label(key)}"}} {stats["total_ms"]}')
+        lines.append(f'solar_query_duration_ms_count{{fingerprint="{_label(key)}"}} {stats["count"]}')
+
+    for name, field, help_text in (
+        ("solar_query_rows_total", "rows", "Rows returned per fingerprint"),
+        ("solar_query_errors_total", "errors", "Statements that raised, per fingerprint"),
+        ("solar_query_retries_total", "retries", "Retried attempts per fingerprint"),
+        ("solar_query_replica_fallbacks_total", "fallbacks", "Replica reads that fell back to the primary"),
+        ("solar_query_pool_wait_ms_total", "pool_wait_ms", "Time spent waiting for a pooled connection"),
+    ):
+        _metric(lines, name, "counter", help_text, [({"fingerprint": key}, s[field]) for key, s in query_stats.items()])
+
+    pool_stats = get_pool_stats()
+    for name, field, help_text in (
+        ("solar_pool_size", "size", "Open connections per pool"),
+        ("solar_pool_idle", "idle", "Idle connections per pool"),
+        ("solar_pool_waiting", "waiting", "Requests waiting for a connection"),
+        ("solar_pool_saturation", "saturation", "Checked out connections / max_size"),
+    ):
+        _metric(lines, name, "gauge", help_text, [({"pool": pool}, s[field]) for pool, s in pool_stats.items()])
+
+    retry_samples = [
+        ({"pg_key": pg_key, "counter": counter}, value)
+        for pg_key, counters in retry_stats.stats().items()
+        for counter, value in counters.items()
+    ]
+    _metric(lines, "solar_retry_events_total", "counter", "Retry policy counters per PG resource", retry_samples)
+
+    return "\n".join(lines) + "\n"
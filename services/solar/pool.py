@@ -0,0 +1,645 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# This file contains the connection pool management used by the Table class. Every PG resource returned by
+# config.get_all_pg_connection_strings gets one synchronous pool and, on demand, one asyncio pool. Queries against
+# another schema get their own pool per (PG resource, schema) whose connections have that search_path set once, at
+# connect time, instead of switching it around every statement.
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from typing import Dict, List, Optional, Tuple
+
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, AsyncConnectionPool, PoolTimeout
+from psycopg import Connection, AsyncConnection, sql
+
+from .config import ConfigurationError, config
+from .prepared import PreparedStatementRegistry
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration constants
+DEFAULT_MIN_SIZE = 2  # Opened eagerly by warm_up_pools, so a cold burst doesn't pay connection setup
+DEFAULT_MAX_SIZE = 10
+DEFAULT_SCHEMA_MIN_SIZE = 1  # Schema pools are created on demand and rarely need more than one idle connection
+DEFAULT_TIMEOUT = 30  # seconds
+DEFAULT_MAX_IDLE = 600  # seconds
+DEFAULT_MAX_LIFETIME = 3600  # seconds
+DEFAULT_WARM_UP_TIMEOUT = 30  # seconds
+DEFAULT_KEEPALIVE = 60  # seconds
+DEFAULT_RECONNECT_TIMEOUT = 5  # seconds
+DEFAULT_MAX_RETRIES = 3
+
+SEARCH_PATH_SQL = "set search_path to auth, public"
+DEFAULT_SCHEMAS = ("public", "auth")  # Served by the default pools' search_path
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_check_interval = 300  # Check pool health every 5 minutes
+DEFAULT_HEALTH_CHECK_TIMEOUT = 5  # seconds to wait for a connection during a health check
+DEFAULT_DRAIN_TIMEOUT = 30  # seconds a replaced pool gets to finish in-flight queries
+
+_schema_pools: Dict[Tuple[str, str], ConnectionPool] = {}
+_schema_pools_lock = threading.Lock()
+
+_async_pool = None
+_async_pool_lock = None
+_async_schema_pools: Dict[Tuple[str, str], AsyncConnectionPool] = {}
+
+# Replica pools per PG resource, by position in its SOLAR_REPLICA_ list; None where the pool couldn't be created
+_replica_pools: Dict[str, List[Optional[ConnectionPool]]] = {}
+_replica_pools_lock = threading.Lock()
+_async_replica_pools: Dict[str, List[Optional[AsyncConnectionPool]]] = {}
+_replica_counter = itertools.count()  # Round robin over the replicas of a PG resource
+_down_replicas = set()  # Names of the replicas whose last health check failed; reads skip them until one passes
+
+prepared_statements = PreparedStatementRegistry(config.prepared_statements_max())
+
+
+def _connection_kwargs() -> Dict:
+    """Connection arguments shared by the sync and async pools"""
+    return {
+        "row_factory": dict_row,
+        "keepalives": 1,
+        "keepalives_idle": DEFAULT_KEEPALIVE,
+        "keepalives_interval": DEFAULT_KEEPALIVE,
+        "keepalives_count": 3,
+    }
+
+
+######################################################################################################################
+# Synchronous Pools
+######################################################################################################################
+
+
+def pool_settings(pg_key: str, schema_name: str = "public") -> Dict:
+    """Sizing for the pool serving schema_name on pg_key, with the Config overrides applied to the defaults"""
+    settings = {
+        "min_size": DEFAULT_MIN_SIZE if schema_name in DEFAULT_SCHEMAS else DEFAULT_SCHEMA_MIN_SIZE,
+        "max_size": DEFAULT_MAX_SIZE,
+        "timeout": DEFAULT_TIMEOUT,
+        "max_idle": DEFAULT_MAX_IDLE,
+        "max_lifetime": DEFAULT_MAX_LIFETIME,
+    }
+    overrides = config.pool_settings(pg_key)
+    if schema_name not in DEFAULT_SCHEMAS:
+        overrides.pop("min_size", None)
+    settings.update(overrides)
+    if "max_size" in overrides and "min_size" not in overrides:
+        # Lowering only the ceiling shrinks the floor with it
+        settings["min_size"] = min(settings["min_size"], settings["max_size"])
+    if settings["min_size"] > settings["max_size"]:
+        raise ConfigurationError(
+            f"Pool min_size ({settings['min_size']}) is larger than max_size ({settings['max_size']}) for {pg_key}"
+        )
+    return settings
+
+
+def _search_path_sql(schema_name: str) -> sql.Composed:
+    return sql.SQL("set search_path to {}").format(sql.Identifier(schema_name))
+
+
+class SchemaConnection(Connection):
+    search_path_sql = SEARCH_PATH_SQL
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        prepared_statements.configure_connection(self, config.prepared_statements_enabled())
+        with self.cursor() as cur:
+            cur.execute(self.search_path_sql)
+        # Commit so a rolled back first query can't undo the search_path
+        self.commit()
+
+
+def _schema_connection_class(schema_name: str):
+    """A SchemaConnection subclass whose connections search schema_name"""
+    return type(
+        f"SchemaConnection_{schema_name}",
+        (SchemaConnection,),
+        {"search_path_sql": _search_path_sql(schema_name)},
+    )
+
+
+def is_connection_alive(conn):
+    """Test if a database connection is still alive and usable"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            return True
+    except Exception as e:
+        logger.warning(f"Connection health check failed: {str(e)}")
+        return False
+
+
+# Outcomes of validate_pool
+POOL_HEALTHY = "healthy"
+POOL_BUSY = "busy"  # no connection came free within the timeout: saturated, which is not a reason to replace it
+POOL_UNHEALTHY = "unhealthy"
+
+
+def validate_pool(pool: ConnectionPool, pg_key: str) -> str:
+    """Probe one connection of the pool; only a connection that fails the probe makes the pool unhealthy"""
+    try:
+        # Test a connection from the pool (and hand it back afterwards)
+        with pool.connection(timeout=DEFAULT_HEALTH_CHECK_TIMEOUT) as conn:
+            if not is_connection_alive(conn):
+                logger.warning(f"Pool {pg_key} failed health check")
+                return POOL_UNHEALTHY
+        return POOL_HEALTHY
+    except PoolTimeout:
+        # Also what a pool whose server is down raises; it keeps reconnecting on its own, so replacing it won't help
+        logger.info(f"Pool {pg_key} had no free connection within {DEFAULT_HEALTH_CHECK_TIMEOUT}s; skipping probe")
+        return POOL_BUSY
+    except Exception as e:
+        logger.error(f"Pool {pg_key} validation failed: {str(e)}")
+        return POOL_UNHEALTHY
+
+
+def get_pool(reset: bool = False) -> Dict[str, ConnectionPool]:
+    """Get or create the connection pools; health is checked off the request path by PoolHealthMonitor"""
+    global _pool
+
+    if _pool is not None and not reset:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or reset:
+            old_pools = dict(_pool or {})
+            _pool = {}
+            for pg_key, pg_conn_string in config.get_all_pg_connection_strings().items():
+                _pool[pg_key] = _create_pool(pg_key, pg_conn_string, SchemaConnection, pool_settings(pg_key))
+            # Schema pools are rebuilt lazily against the fresh default pools
+            with _schema_pools_lock:
+                for (pg_key, schema_name), pool in _schema_pools.items():
+                    old_pools[f"{pg_key} ({schema_name})"] = pool
+                _schema_pools.clear()
+            for name, pool in old_pools.items():
+                _drain_pool(pool, name)
+
+    return _pool
+
+
+def warm_up_pools(timeout: float = DEFAULT_WARM_UP_TIMEOUT) -> Dict[str, bool]:
+    """Open every default and replica pool and block until each holds its min_size connections (call on startup)"""
+    pools = dict(get_pool())
+    for pg_key in list(pools):
+        for index, pool in enumerate(get_replica_pools(pg_key)):
+            if pool is not None:
+                pools[replica_name(pg_key, index)] = pool
+    results = {}
+    for pg_key, pool in pools.items():
+        try:
+            pool.wait(timeout=timeout)
+            results[pg_key] = True
+            logger.info(f"Warmed up pool {pg_key} with {pool.min_size} connections")
+        except Exception as e:
+            results[pg_key] = False
+            logger.warning(f"Failed to warm up pool {pg_key}: {str(e)}")
+    return results
+
+
+def _drain_pool(pool: ConnectionPool, name: str):
+    """Close a replaced pool in the background once its checked out connections come back"""
+
+    def close():
+        try:
+            pool.close(timeout=DEFAULT_DRAIN_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Failed to close replaced pool {name}: {str(e)}")
+
+    threading.Thread(target=close, name=f"drain-{name}", daemon=True).start()
+
+
+def replace_pool(pg_key: str) -> ConnectionPool:
+    """Recreate the pool for one PG resource, leaving every other pool untouched"""
+    pools = get_pool()
+    pg_conn_string = config.get_all_pg_connection_strings()[pg_key]
+    with _pool_lock:
+        old_pool = pools.get(pg_key)
+        pools[pg_key] = _create_pool(pg_key, pg_conn_string, SchemaConnection, pool_settings(pg_key))
+    with _schema_pools_lock:
+        stale = [key for key in _schema_pools if key[0] == pg_key]
+        old_schema_pools = [_schema_pools.pop(key) for key in stale]
+
+    if old_pool is not None:
+        _drain_pool(old_pool, pg_key)
+    for (_, schema_name), pool in zip(stale, old_schema_pools):
+        _drain_pool(pool, f"{pg_key} ({schema_name})")
+    return pools[pg_key]
+
+
+def _create_pool(pg_key: str, pg_conn_string: str, connection_class, settings: Dict) -> ConnectionPool:
+    try:
+        pool = ConnectionPool(
+            pg_conn_string,
+            name=pg_key,
+            **settings,
+            kwargs=_connection_kwargs(),
+            connection_class=connection_class,
+            check=ConnectionPool.check_connection,
+        )
+        logger.info(f"Created new connection pool for {pg_key}")
+        return pool
+    except Exception as e:
+        logger.error(f"Failed to create pool for {pg_key}: {str(e)}")
+        raise
+
+
+def get_connection_pool(pg_key: str, schema_name: str = "public") -> ConnectionPool:
+    """The pool serving schema_name on pg_key, creating a dedicated schema pool on first use"""
+    pools = get_pool()
+    if pg_key not in pools:
+        replace_pool(pg_key)  # A PG resource configured after the pools were built
+    if schema_name in DEFAULT_SCHEMAS:
+        return pools[pg_key]
+
+    key = (pg_key, schema_name)
+    pool = _schema_pools.get(key)
+    if pool is None:
+        with _schema_pools_lock:
+            pool = _schema_pools.get(key)
+            if pool is None:
+                pg_conn_string = config.get_all_pg_connection_strings()[pg_key]
+                pool = _create_pool(
+                    f"{pg_key} ({schema_name})",
+                    pg_conn_string,
+                    _schema_connection_class(schema_name),
+                    pool_settings(pg_key, schema_name),
+                )
+                _schema_pools[key] = pool
+    return pool
+
+
+######################################################################################################################
+# Asynchronous Pools
+######################################################################################################################
+
+
+class AsyncSchemaConnection(AsyncConnection):
+    """Async counterpart of SchemaConnection; the search_path is set right after connecting"""
+
+    search_path_sql = SEARCH_PATH_SQL
+
+    @classmethod
+    async def connect(cls, *args, **kwargs):
+        conn = await super().connect(*args, **kwargs)
+        prepared_statements.configure_connection(conn, config.prepared_statements_enabled())
+        async with conn.cursor() as cur:
+            await cur.execute(cls.search_path_sql)
+        await conn.commit()
+        return conn
+
+
+def _async_schema_connection_class(schema_name: str):
+    return type(
+        f"AsyncSchemaConnection_{schema_name}",
+        (AsyncSchemaConnection,),
+        {"search_path_sql": _search_path_sql(schema_name)},
+    )
+
+
+async def get_async_pool(reset: bool = False) -> Dict[str, AsyncConnectionPool]:
+    """Get or create the asyncio connection pools, one per PG resource"""
+    global _async_pool, _async_pool_lock
+
+    if _async_pool is not None and not reset:
+        return _async_pool
+
+    if _async_pool_lock is None:
+        _async_pool_lock = asyncio.Lock()
+
+    async with _async_pool_lock:
+        # Another task may have built the pools while we were waiting on the lock
+        if _async_pool is not None and not reset:
+            return _async_pool
+
+        old_pools = _async_pool
+        new_pools = {}
+        for pg_key, pg_conn_string in config.get_all_pg_connection_strings().items():
+            new_pools[pg_key] = await _create_async_pool(
+                pg_key, pg_conn_string, AsyncSchemaConnection, pool_settings(pg_key)
+            )
+
+        _async_pool = new_pools
+        old_schema_pools = list(_async_schema_pools.values())
+        _async_schema_pools.clear()
+        for pool in list((old_pools or {}).values()) + old_schema_pools:
+            try:
+                await pool.close()
+            except Exception:
+                pass
+
+    return _async_pool
+
+
+async def _create_async_pool(
+    pg_key: str, pg_conn_string: str, connection_class, settings: Dict
+) -> AsyncConnectionPool:
+    try:
+        pool = AsyncConnectionPool(
+            pg_conn_string,
+            name=pg_key,
+            **settings,
+            kwargs=_connection_kwargs(),
+            connection_class=connection_class,
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        await pool.open()
+        logger.info(f"Created new async connection pool for {pg_key}")
+        return pool
+    except Exception as e:
+        logger.error(f"Failed to create async pool for {pg_key}: {str(e)}")
+        raise
+
+
+async def get_async_connection_pool(pg_key: str, schema_name: str = "public") -> AsyncConnectionPool:
+    """Async counterpart of get_connection_pool"""
+    pools = await get_async_pool()
+    if pg_key not in pools:
+        await replace_async_pool(pg_key)
+    if schema_name in DEFAULT_SCHEMAS:
+        return pools[pg_key]
+
+    key = (pg_key, schema_name)
+    pool = _async_schema_pools.get(key)
+    if pool is None:
+        async with _async_pool_lock:
+            pool = _async_schema_pools.get(key)
+            if pool is None:
+                pg_conn_string = config.get_all_pg_connection_strings()[pg_key]
+                pool = await _create_async_pool(
+                    f"{pg_key} ({schema_name})",
+                    pg_conn_string,
+                    _async_schema_connection_class(schema_name),
+                    pool_settings(pg_key, schema_name),
+                )
+                _async_schema_pools[key] = pool
+    return pool
+
+
+async def _drain_async_pool(pool: AsyncConnectionPool, name: str):
+    try:
+        await pool.close(timeout=DEFAULT_DRAIN_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Failed to close replaced async pool {name}: {str(e)}")
+
+
+async def replace_async_pool(pg_key: str) -> AsyncConnectionPool:
+    """Async counterpart of replace_pool; the old pools are closed in a background task"""
+    pools = await get_async_pool()
+    pg_conn_string = config.get_all_pg_connection_strings()[pg_key]
+    async with _async_pool_lock:
+        old_pools = {}
+        if pg_key in pools:
+            old_pools[pg_key] = pools[pg_key]
+        pools[pg_key] = await _create_async_pool(
+            pg_key, pg_conn_string, AsyncSchemaConnection, pool_settings(pg_key)
+        )
+        for key in [key for key in _async_schema_pools if key[0] == pg_key]:
+            old_pools[f"{pg_key} ({key[1]})"] = _async_schema_pools.pop(key)
+
+    for name, pool in old_pools.items():
+        asyncio.get_running_loop().create_task(_drain_async_pool(pool, name))
+    return pools[pg_key]
+
+
+async def close_async_pool():
+    """Close every async pool (call on application shutdown)"""
+    global _async_pool
+    pools, _async_pool = _async_pool, None
+    pools = dict(pools or {})
+    for (pg_key, schema_name), pool in _async_schema_pools.items():
+        pools[f"{pg_key} ({schema_name})"] = pool
+    _async_schema_pools.clear()
+    for pg_key, replica_pools in _async_replica_pools.items():
+        for index, pool in enumerate(replica_pools):
+            if pool is not None:
+                pools[replica_name(pg_key, index)] = pool
+    _async_replica_pools.clear()
+    for pg_key, pool in pools.items():
+        try:
+            await pool.close()
+        except Exception as e:
+            logger.warning(f"Failed to close async pool for {pg_key}: {str(e)}")
+
+
+######################################################################################################################
+# Read Replicas
+######################################################################################################################
+
+
+def replica_name(pg_key: str, index: int) -> str:
+    return f"{pg_key} [replica {index}]"
+
+
+def _pick_replica(pg_key: str, pools: list):
+    live = [
+        pool for index, pool in enumerate(pools)
+        if pool is not None and replica_name(pg_key, index) not in _down_replicas
+    ]
+    if not live:
+        return None
+    return live[next(_replica_counter) % len(live)]
+
+
+def get_replica_pools(pg_key: str) -> List[Optional[ConnectionPool]]:
+    """Every replica pool of pg_key, created on first use; None for a replica whose pool couldn't be created"""
+    pools = _replica_pools.get(pg_key)
+    if pools is None:
+        with _replica_pools_lock:
+            pools = _replica_pools.get(pg_key)
+            if pools is None:
+                pools = []
+                for index, pg_conn_string in enumerate(config.get_replica_connection_strings(pg_key)):
+                    try:
+                        pool = _create_pool(
+                            replica_name(pg_key, index), pg_conn_string, SchemaConnection, pool_settings(pg_key)
+                        )
+                    except Exception:
+                        pool = None  # Logged by _create_pool; reads fall back to the primary
+                    pools.append(pool)
+                _replica_pools[pg_key] = pools
+    return pools
+
+
+def get_replica_pool(pg_key: str) -> Optional[ConnectionPool]:
+    """A pool on one of pg_key's healthy read replicas (round robin), or None if it has none"""
+    return _pick_replica(pg_key, get_replica_pools(pg_key))
+
+
+def replace_replica_pool(pg_key: str, index: int) -> ConnectionPool:
+    """Recreate the pool of one replica of pg_key"""
+    pools = get_replica_pools(pg_key)
+    name = replica_name(pg_key, index)
+    pg_conn_string = config.get_replica_connection_strings(pg_key)[index]
+    with _replica_pools_lock:
+        old_pool = pools[index]
+        pools[index] = _create_pool(name, pg_conn_string, SchemaConnection, pool_settings(pg_key))
+    if old_pool is not None:
+        _drain_pool(old_pool, name)
+    return pools[index]
+
+
+async def get_async_replica_pool(pg_key: str) -> Optional[AsyncConnectionPool]:
+    """Async counterpart of get_replica_pool"""
+    pools = _async_replica_pools.get(pg_key)
+    if pools is None:
+        await get_async_pool()  # Creates _async_pool_lock
+        async with _async_pool_lock:
+            pools = _async_replica_pools.get(pg_key)
+            if pools is None:
+                pools = []
+                for index, pg_conn_string in enumerate(config.get_replica_connection_strings(pg_key)):
+                    try:
+                        pool = await _create_async_pool(
+                            replica_name(pg_key, index), pg_conn_string, AsyncSchemaConnection, pool_settings(pg_key)
+                        )
+                    except Exception:
+                        pool = None
+                    pools.append(pool)
+                _async_replica_pools[pg_key] = pools
+    return _pick_replica(pg_key, pools)
+
+
+######################################################################################################################
+# Health Monitor and Stats
+######################################################################################################################
+
+
+class PoolHealthMonitor:
+    """Background thread that probes every pool off the request path and replaces only the ones that fail.
+
+    Read replicas are probed too. One that fails is taken out of the read rotation (reads go to its siblings or the
+    primary) and its pool is recreated; it rejoins once a probe succeeds again.
+    """
+
+    def __init__(self, interval: float = _pool_check_interval):
+        self.interval = interval
+        self.last_results: Dict[str, Dict] = {}
+        self.busy_checks: Dict[str, int] = {}  # probes per pool skipped because it was saturated
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pool-health-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Started pool health monitor (every {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=DEFAULT_HEALTH_CHECK_TIMEOUT)
+            self._thread = None
+
+    def check_now(self) -> Dict[str, Dict]:
+        """Probe every default and replica pool once, recreating the ones whose connection failed the probe"""
+        for pg_key, pool in list(get_pool().items()):
+            status = validate_pool(pool, pg_key)
+            if status == POOL_UNHEALTHY:
+                logger.warning(f"Pool {pg_key} failed health check, recreating it")
+                try:
+                    replace_pool(pg_key)
+                except Exception as e:
+                    logger.error(f"Failed to recreate pool {pg_key}: {str(e)}")
+            self._record(pg_key, status)
+
+            for index, replica_pool in enumerate(list(get_replica_pools(pg_key))):
+                name = replica_name(pg_key, index)
+                status = validate_pool(replica_pool, name) if replica_pool is not None else POOL_UNHEALTHY
+                if status == POOL_UNHEALTHY:
+                    if name not in _down_replicas:
+                        logger.warning(f"Replica {name} failed health check; reading from the others until it recovers")
+                    _down_replicas.add(name)
+                    try:
+                        replace_replica_pool(pg_key, index)
+                    except Exception as e:
+                        logger.error(f"Failed to recreate pool {name}: {str(e)}")
+                else:
+                    _down_replicas.discard(name)
+                self._record(name, status)
+        return self.last_results
+
+    def _record(self, name: str, status: str):
+        if status == POOL_BUSY:
+            self.busy_checks[name] = self.busy_checks.get(name, 0) + 1
+        self.last_results[name] = {
+            "healthy": status != POOL_UNHEALTHY,
+            "status": status,
+            "busy_checks": self.busy_checks.get(name, 0),
+            "checked_at": time.time(),
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_now()
+            except Exception as e:
+                logger.error(f"Pool health check run failed: {str(e)}")
+
+
+pool_monitor = PoolHealthMonitor()
+
+
+def _describe_pool(pool) -> Dict:
+    stats = pool.get_stats()
+    requests_num = stats.get("requests_num", 0)
+    size = stats.get("pool_size", 0)
+    idle = stats.get("pool_available", 0)
+    max_size = stats.get("pool_max", 0)
+    return {
+        "size": size,
+        "idle": idle,
+        "waiting": stats.get("requests_waiting", 0),
+        "min_size": stats.get("pool_min", 0),
+        "max_size": max_size,
+        "requests": requests_num,
+        "avg_checkout_ms": (stats.get("requests_wait_ms", 0) / requests_num) if requests_num else 0.0,
+        # Share of max_size checked out right now; close to 1 means max_size is the bottleneck
+        "saturation": ((size - idle) / max_size) if max_size else 0.0,
+        # Share of checkouts that found no idle connection and had to queue; high means min_size is too low
+        "queued_ratio": (stats.get("requests_queued", 0) / requests_num) if requests_num else 0.0,
+        "errors": stats.get("requests_errors", 0) + stats.get("connections_errors", 0),
+    }
+
+
+def get_pool_stats() -> Dict[str, Dict]:
+    """Size, idle, waiting and checkout latency for every open pool, plus the last health check result"""
+    pools = {}
+    for pg_key, pool in (_pool or {}).items():
+        pools[pg_key] = pool
+    for (pg_key, schema_name), pool in list(_schema_pools.items()):
+        pools[f"{pg_key} ({schema_name})"] = pool
+    for pg_key, pool in (_async_pool or {}).items():
+        pools[f"{pg_key} [async]"] = pool
+    for (pg_key, schema_name), pool in list(_async_schema_pools.items()):
+        pools[f"{pg_key} ({schema_name}) [async]"] = pool
+    for pg_key, replica_pools in list(_replica_pools.items()):
+        for index, pool in enumerate(replica_pools):
+            if pool is not None:
+                pools[replica_name(pg_key, index)] = pool
+    for pg_key, replica_pools in list(_async_replica_pools.items()):
+        for index, pool in enumerate(replica_pools):
+            if pool is not None:
+                pools[f"{replica_name(pg_key, index)} [async]"] = pool
+
+    stats = {}
+    for name, pool in pools.items():
+        stats[name] = _describe_pool(pool)
+        if name in pool_monitor.last_results:
+            stats[name]["health"] = pool_monitor.last_results[name]
+    return stats
@@ -0,0 +1,84 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# This file contains the PreparedStatementRegistry, which tracks which SQL strings have been prepared on which pooled
+# connection. psycopg does the actual PREPARE/DEALLOCATE work (cursor.execute(..., prepare=True) plus the
+# connection's prepared_max LRU); the registry mirrors that LRU so we can report hit/miss/eviction counters.
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from collections import OrderedDict
+from typing import Dict
+
+import threading
+import weakref
+
+######################################################################################################################
+# Prepared Statement Registry
+######################################################################################################################
+
+
+class PreparedStatementRegistry:
+    """Per-connection LRU of prepared SQL strings, keyed by the SQL text"""
+
+    def __init__(self, max_size: int = 100):
+        self.max_size = max_size
+        self._connections = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure_connection(self, conn, enabled: bool = True):
+        """Align psycopg's own prepared statement LRU with the registry size"""
+        conn.prepared_max = self.max_size
+        if not enabled:
+            # psycopg otherwise prepares any statement it sees prepare_threshold times on its own
+            conn.prepare_threshold = None
+
+    def lookup(self, conn, sql_statement: str) -> bool:
+        """Record a use of sql_statement on conn; returns True if it was already prepared there"""
+        with self._lock:
+            statements = self._connections.get(conn)
+            if statements is None:
+                statements = OrderedDict()
+                self._connections[conn] = statements
+
+            if sql_statement in statements:
+                statements.move_to_end(sql_statement)
+                self.hits += 1
+                return True
+
+            self.misses += 1
+            statements[sql_statement] = None
+            if len(statements) > self.max_size:
+                # psycopg deallocates its least recently used statement at the same point
+                statements.popitem(last=False)
+                self.evictions += 1
+            return False
+
+    def forget(self, conn):
+        """Drop everything recorded for conn (e.g. after the server discarded its statements)"""
+        with self._lock:
+            self._connections.pop(conn, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring and benchmarks"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "connections": len(self._connections),
+                "prepared": sum(len(s) for s in self._connections.values()),
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
@@ -0,0 +1,194 @@
+######################################################################################################################
+# General Information
+######################################################################################################################
+# This file contains the retry policy used by Table.sql, Table.batch and their async counterparts. Errors are
+# classified first: only transient ones (lost connections, serialization failures, deadlocks, a server that is
+# starting up or out of connections) are retried, with exponential backoff and full jitter. A pool is replaced only
+# when its connections keep failing, and only the pool of the PG resource that failed. A saturated pool (no free
+# connection in time, or too many waiting clients) is overload, not breakage: it is neither retried nor replaced.
+
+
+######################################################################################################################
+# Dependencies
+######################################################################################################################
+
+
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+from psycopg import Error as PsycopgError
+from psycopg import InterfaceError, OperationalError
+from psycopg_pool import PoolTimeout, TooManyRequests
+
+from .pool import replace_async_pool, replace_pool
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+######################################################################################################################
+# Error Classification
+######################################################################################################################
+
+
+# SQLSTATEs worth retrying: the statement itself is fine, the server or a concurrent transaction got in the way
+TRANSIENT_SQLSTATES = frozenset(
+    (
+        "40001",  # serialization_failure
+        "40P01",  # deadlock_detected
+        "53300",  # too_many_connections
+        "57P01",  # admin_shutdown
+        "57P02",  # crash_shutdown
+        "57P03",  # cannot_connect_now
+    )
+)
+CONNECTION_SQLSTATE_CLASS = "08"  # connection_exception
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Whether the error means the pool is saturated; retrying would only add to the queue"""
+    return isinstance(error, (PoolTimeout, TooManyRequests))
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Whether the error means the connection (rather than the statement) is broken"""
+    if is_overload_error(error):
+        return False
+    sqlstate = getattr(error, "sqlstate", None)
+    if sqlstate:
+        return sqlstate.startswith(CONNECTION_SQLSTATE_CLASS) or sqlstate in ("57P01", "57P02", "57P03")
+    # Lost connections surface without a SQLSTATE
+    return isinstance(error, (OperationalError, InterfaceError))
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Whether retrying the same statement can succeed; unique violations, syntax errors etc. never will"""
+    if not isinstance(error, PsycopgError):
+        return False
+    sqlstate = getattr(error, "sqlstate", None)
+    if sqlstate in TRANSIENT_SQLSTATES:
+        return True
+    return is_connection_error(error)
+
+
+######################################################################################################################
+# Retry Policy
+######################################################################################################################
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n sleeps a random time in [0, min(max_delay, base_delay * 2^n)]"""
+
+    def __init__(self, base_delay: float = 0.05, max_delay: float = 2.0, replace_after: int = 2):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.replace_after = replace_after  # Consecutive connection errors before the pool is recreated
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RetryStats:
+    """Per PG resource counters for attempts, retries and their outcomes"""
+
+    COUNTERS = (
+        "attempts", "retries", "transient_errors", "permanent_errors", "overloaded", "exhausted", "pool_replacements"
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+
+    def increment(self, pg_key: str, counter: str):
+        with self._lock:
+            self._counters[pg_key][counter] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {pg_key: dict(counters) for pg_key, counters in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+retry_policy = RetryPolicy()
+retry_stats = RetryStats()
+
+
+class _Attempts:
+    """Bookkeeping shared by the sync and async retry loops"""
+
+    def __init__(self, pg_key: str, max_retries: int, label: str):
+        self.pg_key = pg_key
+        self.max_retries = max_retries
+        self.label = label
+        self.count = 0
+        self.connection_errors = 0
+
+    def failed(self, error: PsycopgError) -> bool:
+        """Record a failure; returns True if the operation should be retried"""
+        self.count += 1
+        if is_overload_error(error):
+            retry_stats.increment(self.pg_key, "overloaded")
+            logger.warning(f"{self.label} rejected, pool {self.pg_key} is saturated: {str(error)}")
+            return False
+        if not is_transient_error(error):
+            retry_stats.increment(self.pg_key, "permanent_errors")
+            logger.warning(f"{self.label} failed with a non-retryable error: {str(error)}")
+            return False
+
+        retry_stats.increment(self.pg_key, "transient_errors")
+        if self.count >= self.max_retries:
+            retry_stats.increment(self.pg_key, "exhausted")
+            logger.error(f"{self.label} failed after {self.max_retries} attempts: {str(error)}")
+            return False
+
+        logger.warning(f"{self.label} failed (attempt {self.count}/{self.max_retries}), retrying: {str(error)}")
+        retry_stats.increment(self.pg_key, "retries")
+        self.connection_errors = self.connection_errors + 1 if is_connection_error(error) else 0
+        return True
+
+    def should_replace_pool(self) -> bool:
+        # A single broken connection is dropped by the pool itself; repeated ones mean the whole pool is stale
+        if self.connection_errors >= retry_policy.replace_after:
+            self.connection_errors = 0
+            retry_stats.increment(self.pg_key, "pool_replacements")
+            return True
+        return False
+
+
+def run_with_retries(pg_key: str, operation: Callable[[], Any], max_retries: int, label: str) -> Any:
+    """Call operation until it succeeds, a non-transient error occurs or max_retries attempts have failed"""
+    attempts = _Attempts(pg_key, max_retries, label)
+    while True:
+        retry_stats.increment(pg_key, "attempts")
+        try:
+            return operation()
+        except PsycopgError as e:
+            if not attempts.failed(e):
+                raise
+            if attempts.should_replace_pool():
+                replace_pool(pg_key)
+            time.sleep(retry_policy.delay(attempts.count))
+
+
+async def arun_with_retries(
+    pg_key: str, operation: Callable[[], Awaitable[Any]], max_retries: int, label: str
+) -> Any:
+    """Async counterpart of run_with_retries"""
+    attempts = _Attempts(pg_key, max_retries, label)
+    while True:
+        retry_stats.increment(pg_key, "attempts")
+        try:
+            return await operation()
+        except PsycopgError as e:
+            if not attempts.failed(e):
+                raise
+            if attempts.should_replace_pool():
+                await replace_async_pool(pg_key)
+            await asyncio.sleep(retry_policy.delay(attempts.count))
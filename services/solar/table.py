@@ -10,111 +10,36 @@
 ######################################################################################################################
 
 
-from typing import Dict, Any, Optional
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, List, Optional, Union, get_args, get_origin
 from pydantic import BaseModel, Field
 
-from psycopg.rows import dict_row
-from psycopg_pool import ConnectionPool
-from psycopg import Connection, Error as PsycopgError
+from psycopg import Error as PsycopgError
 from psycopg.types.json import Jsonb
 
+from .bulk import acopy_column_types, copy_column_types
 from .config import config
+from .pool import (
+    DEFAULT_SCHEMAS,
+    get_async_connection_pool,
+    get_async_replica_pool,
+    get_connection_pool,
+    get_replica_pool,
+    prepared_statements,
+)
+from .instrumentation import instrumentation
+from .retry import arun_with_retries, run_with_retries
 
 import logging
-import time
+import re
+import types
+import uuid
 
 logger = logging.getLogger(__name__)
 
-# Pool configuration constants
-DEFAULT_MIN_SIZE = 1
-DEFAULT_MAX_SIZE = 10
-DEFAULT_TIMEOUT = 30  # seconds
-DEFAULT_KEEPALIVE = 60  # seconds
-DEFAULT_RECONNECT_TIMEOUT = 5  # seconds
-DEFAULT_MAX_RETRIES = 3
-
-_pool = None
-_last_pool_check = 0
-_pool_check_interval = 300  # Check pool health every 5 minutes
-
-
-class SchemaConnection(Connection):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        with self.cursor() as cur:
-            cur.execute("set search_path to auth, public")
-
-
-def is_connection_alive(conn):
-    """Test if a database connection is still alive and usable"""
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1")
-            return True
-    except Exception as e:
-        logger.warning(f"Connection health check failed: {str(e)}")
-        return False
-
-
-def validate_pool(pool: ConnectionPool, pg_key: str) -> bool:
-    """Validate the entire pool's health and attempt to fix issues"""
-    try:
-        # Test a connection from the pool
-        with pool.getconn() as conn:
-            if not is_connection_alive(conn):
-                logger.warning(f"Pool {pg_key} failed health check")
-                return False
-        return True
-    except Exception as e:
-        logger.error(f"Pool {pg_key} validation failed: {str(e)}")
-        return False
-
-
-def get_pool(reset: bool = False) -> Dict[str, ConnectionPool]:
-    """Get or create the connection pool with enhanced health checks"""
-    global _pool, _last_pool_check
-
-    current_time = time.time()
-
-    # Check if we need to validate existing pools
-    if (
-        _pool is not None
-        and not reset
-        and (current_time - _last_pool_check) > _pool_check_interval
-    ):
-        logger.debug("Performing periodic pool health check")
-        for pg_key, pool in _pool.items():
-            if not validate_pool(pool, pg_key):
-                logger.warning(f"Pool {pg_key} failed health check, will be recreated")
-                reset = True
-        _last_pool_check = current_time
-
-    if _pool is None or reset:
-        _pool = {}
-        for pg_key, pg_conn_string in config.get_all_pg_connection_strings().items():
-            try:
-                _pool[pg_key] = ConnectionPool(
-                    pg_conn_string,
-                    min_size=DEFAULT_MIN_SIZE,
-                    max_size=DEFAULT_MAX_SIZE,
-                    timeout=DEFAULT_TIMEOUT,
-                    kwargs={
-                        "row_factory": dict_row,
-                        "keepalives": 1,
-                        "keepalives_idle": DEFAULT_KEEPALIVE,
-                        "keepalives_interval": DEFAULT_KEEPALIVE,
-                        "keepalives_count": 3,
-                    },
-                    connection_class=SchemaConnection,
-                    check=is_connection_alive,
-                )
-                logger.info(f"Created new connection pool for {pg_key}")
-            except Exception as e:
-                logger.error(f"Failed to create pool for {pg_key}: {str(e)}")
-                raise
-
-    return _pool
-
 
 ######################################################################################################################
 # Table Class
@@ -129,12 +54,340 @@ def ColumnDetails(*args, primary_key: bool = False, **kwargs):
     return Field(*args, **kwargs)
 
 
+def _is_json_annotation(annotation) -> bool:
+    """Whether values of this annotation may need Jsonb wrapping (dicts, lists, Any)"""
+    if annotation is Any:
+        return True
+    origin = get_origin(annotation)
+    if origin is None:
+        return annotation in (dict, list)
+    if origin in (dict, list):
+        return True
+    return any(_is_json_annotation(arg) for arg in get_args(annotation))
+
+
+def _unwrap_optional(annotation):
+    """Optional[X] -> X; anything else is returned unchanged"""
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+UPSERT_SQL_CACHE_SIZE = 256  # rendered upsert statements kept, over all tables and row counts
+
+
+@lru_cache(maxsize=UPSERT_SQL_CACHE_SIZE)
+def _render_upsert(
+    table_name: str, columns_str: str, row_placeholders: str, primary_key: str, set_clause: str, row_count: int
+) -> str:
+    values_placeholders = ", ".join([row_placeholders] * row_count)
+    return f"""
+        INSERT INTO {table_name} ({columns_str})
+        VALUES {values_placeholders}
+        ON CONFLICT ({primary_key}) DO UPDATE
+        SET {set_clause}
+    """
+
+
+# Type oids of the columns whose values can't go into a field as-is without validation
+NUMERIC_OID = 1700
+TEXT_OIDS = frozenset((19, 25, 1042, 1043))  # name, text, bpchar, varchar
+
+
+def _field_converter(annotation, type_oid: int):
+    """
+    The coercion validation would have done for a column of type_oid read into a field of this annotation (numeric
+    into float/int fields, uuid and friends into str fields), or None when the driver already returns the right type.
+    """
+    annotation = _unwrap_optional(annotation)
+    if annotation is float and type_oid == NUMERIC_OID:
+        return float
+    if annotation is int and type_oid == NUMERIC_OID:
+        return int
+    if annotation is str and type_oid not in TEXT_OIDS:
+        return str
+    return None
+
+
+class TableMetadata:
+    """Column, primary key and upsert SQL for one Table subclass, computed once at class creation"""
+
+    def __init__(self, table_cls):
+        self.table_cls = table_cls
+        self.table_name = getattr(table_cls, "__tablename__", None)
+        self.columns = tuple(table_cls.model_fields.keys())
+        self.primary_key = None
+        for field_name, field_info in table_cls.model_fields.items():
+            if field_info.json_schema_extra and field_info.json_schema_extra.get(
+                "primary_key", False
+            ):
+                self.primary_key = field_name
+                break
+        self.json_columns = frozenset(
+            name
+            for name, field_info in table_cls.model_fields.items()
+            if _is_json_annotation(field_info.annotation)
+        )
+        self._columns_str = ", ".join(self.columns)
+        self._row_placeholders = "(" + ", ".join(["%s"] * len(self.columns)) + ")"
+        self._set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in self.columns])
+        self.copy_types: Dict[str, list] = {}  # pg_key -> [(type oid, coercer)] in column order
+        self._row_makers: Dict[tuple, Any] = {}  # (column names, column types, validate) -> make_row
+        self._row_factories: Dict[bool, Any] = {}  # validate -> row factory
+
+    def row_factory(self, validate: bool = False):
+        """
+        A psycopg row factory that builds table_cls instances straight from the result tuples.
+
+        Rows come from our own tables, so by default they skip pydantic validation (model_construct) and only get the
+        cheap type fixes from _field_converter. Pass validate=True to run full validation instead.
+        """
+        factory = self._row_factories.get(validate)
+        if factory is not None:
+            return factory
+
+        def factory(cursor):
+            if cursor.description is None:
+                return lambda values: values
+            names = tuple(column.name for column in cursor.description)
+            type_oids = tuple(column.type_code for column in cursor.description)
+            key = (names, type_oids, validate)
+            make_row = self._row_makers.get(key)
+            if make_row is None:
+                make_row = self._make_row(names, type_oids, validate)
+                self._row_makers[key] = make_row
+            return make_row
+
+        self._row_factories[validate] = factory
+        return factory
+
+    def _make_row(self, names: tuple, type_oids: tuple, validate: bool):
+        if validate:
+            model_validate = self.table_cls.model_validate
+            return lambda values: model_validate(dict(zip(names, values)))
+
+        table_cls = self.table_cls
+        fields = table_cls.model_fields
+        indexes = [index for index, name in enumerate(names) if name in fields]
+        field_names = [names[index] for index in indexes]
+        conversions = [
+            (names[index], converter)
+            for index in indexes
+            if (converter := _field_converter(fields[names[index]].annotation, type_oids[index])) is not None
+        ]
+        fields_set = frozenset(field_names)
+        defaults = [
+            (name, field_info)
+            for name, field_info in fields.items()
+            if name not in fields_set and not field_info.is_required()
+        ]
+
+        if len(indexes) == len(names):
+            row_values = None  # Every column is a field: zip the row as-is
+        elif indexes:
+            row_values = itemgetter(*indexes) if len(indexes) > 1 else (lambda values: (values[indexes[0]],))
+        else:
+            row_values = lambda values: ()
+
+        def row_data(values):
+            data = dict(zip(field_names, values if row_values is None else row_values(values)))
+            for name, convert in conversions:
+                value = data[name]
+                if value is not None:
+                    data[name] = convert(value)
+            return data
+
+        if table_cls.__pydantic_post_init__:
+            model_construct = table_cls.model_construct
+            return lambda values: model_construct(**row_data(values))
+
+        # This is model_construct, minus the per-row walk over every field and alias; in pydantic v2 that walk costs
+        # more than validating the row in pydantic-core
+        new = table_cls.__new__
+        set_attribute = object.__setattr__
+
+        def make_row(values):
+            data = row_data(values)
+            for name, field_info in defaults:
+                data[name] = field_info.get_default(call_default_factory=True, validated_data=data)
+            instance = new(table_cls)
+            set_attribute(instance, "__dict__", data)
+            set_attribute(instance, "__pydantic_fields_set__", set(fields_set))
+            set_attribute(instance, "__pydantic_extra__", None)
+            set_attribute(instance, "__pydantic_private__", None)
+            return instance
+
+        return make_row
+
+    def upsert_sql(self, row_count: int = 1) -> str:
+        """The INSERT ... ON CONFLICT statement for row_count rows, from a bounded cache shared by all tables"""
+        if self.table_name is None:
+            raise ValueError("Cannot sync without a table name defined")
+        if self.primary_key is None:
+            raise ValueError("Cannot sync without a primary key defined")
+        return _render_upsert(
+            self.table_name, self._columns_str, self._row_placeholders, self.primary_key, self._set_clause, row_count
+        )
+
+    def merge_sql(self, staging_table: str) -> str:
+        """Upsert everything in staging_table; for duplicate keys the row written last wins"""
+        if self.primary_key is None:
+            raise ValueError("Cannot sync without a primary key defined")
+        return f"""
+            INSERT INTO {self.table_name} ({self._columns_str})
+            SELECT DISTINCT ON ({self.primary_key}) {self._columns_str}
+            FROM {staging_table}
+            ORDER BY {self.primary_key}, ctid DESC
+            ON CONFLICT ({self.primary_key}) DO UPDATE
+            SET {self._set_clause}
+        """
+
+
+class _TransactionScope:
+    """The connections pinned by Table.transaction(), one per PG resource, checked out lazily"""
+
+    def __init__(self, stack: ExitStack):
+        self._stack = stack
+        self._connections: Dict[str, Any] = {}
+
+    def connection(self, pg_key: str):
+        conn = self._connections.get(pg_key)
+        if conn is None:
+            # Leaving pool.connection() commits, or rolls back when the block raised
+            conn = self._stack.enter_context(get_connection_pool(pg_key).connection())
+            self._connections[pg_key] = conn
+        return conn
+
+
+class _AsyncTransactionScope:
+    """The async connections pinned by Table.atransaction()"""
+
+    def __init__(self, stack: AsyncExitStack):
+        self._stack = stack
+        self._connections: Dict[str, Any] = {}
+
+    async def connection(self, pg_key: str):
+        conn = self._connections.get(pg_key)
+        if conn is None:
+            pool = await get_async_connection_pool(pg_key)
+            conn = await self._stack.enter_async_context(pool.connection())
+            self._connections[pg_key] = conn
+        return conn
+
+
+_transaction_scope: ContextVar[Optional[_TransactionScope]] = ContextVar(
+    "solar_transaction_scope", default=None
+)
+_async_transaction_scope: ContextVar[Optional[_AsyncTransactionScope]] = ContextVar(
+    "solar_async_transaction_scope", default=None
+)
+
+
+class _RequestScope:
+    """Routing state for one request: the PG resources it has written to, whose reads stay on the primary"""
+
+    def __init__(self):
+        self.written = set()
+
+
+_request_scope: ContextVar[Optional[_RequestScope]] = ContextVar("solar_request_scope", default=None)
+
+_READ_STATEMENT = re.compile(r"^\s*(SELECT|WITH|SHOW|VALUES|TABLE)\b", re.IGNORECASE)
+# Clauses that make a statement unsafe for a read replica even though it starts like a read
+_WRITE_CLAUSE = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|NEXTVAL|SETVAL|FOR\s+(NO\s+KEY\s+)?UPDATE|FOR\s+(KEY\s+)?SHARE)\b",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=1024)
+def is_read_only_statement(sql_statement: str) -> bool:
+    """Conservative check that a statement only reads; anything doubtful counts as a write and stays on the primary"""
+    return bool(_READ_STATEMENT.match(sql_statement)) and not _WRITE_CLAUSE.search(sql_statement)
+
+
+def _record_write(pg_key: str):
+    request = _request_scope.get()
+    if request is not None:
+        request.written.add(pg_key)
+
+
+_TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO|TABLE)\s+(?:ONLY\s+)?([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def referenced_tables(sql_statement: str) -> frozenset:
+    """Unqualified, lower-cased names of the tables a statement reads or writes"""
+    return frozenset(name.rsplit(".", 1)[-1].lower() for name in _TABLE_REFERENCE.findall(sql_statement))
+
+
+class _IdentityMap:
+    """
+    The results of the SELECTs made inside Table.identity_map(), keyed by statement and parameters. A write drops the
+    entries that read any table it touches (everything, if the written table can't be told from the statement).
+    """
+
+    def __init__(self):
+        self._entries: Dict[tuple, tuple] = {}  # key -> (tables read, rows)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(pg_key: str, schema_name: str, sql_statement: str, params, row_factory) -> tuple:
+        frozen_params = repr(sorted(params.items())) if isinstance(params, dict) else repr(params)
+        return (pg_key, schema_name, sql_statement, frozen_params, row_factory)
+
+    def get(self, key: tuple) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: tuple, sql_statement: str, rows: list):
+        self._entries[key] = (referenced_tables(sql_statement), rows)
+
+    def invalidate(self, sql_statement: str):
+        written = referenced_tables(sql_statement)
+        if not written:
+            self._entries.clear()
+            return
+        for key in [key for key, (tables, _) in self._entries.items() if not tables or tables & written]:
+            del self._entries[key]
+
+    def invalidate_table(self, table_name: str):
+        self.invalidate(f"UPDATE {table_name}")
+
+
+_identity_map: ContextVar[Optional[_IdentityMap]] = ContextVar("solar_identity_map", default=None)
+
+
+def _cached_rows(rows: list, row_factory) -> list:
+    """Hand out cached rows: the same model instances (that's the identity map), but fresh dicts and lists"""
+    if row_factory is None:
+        return [dict(row) for row in rows]
+    return list(rows)
+
+
+def _stream_cursor_name() -> str:
+    """A server-side cursor name that can't clash with another stream on the same connection"""
+    return f"solar_stream_{uuid.uuid4().hex}"
+
+
 class Table(BaseModel):
     __abstract__ = True
 
     class Config:
         extra = "ignore"
 
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        cls.__table_metadata__ = TableMetadata(cls)
+
     @classmethod
     def _get_sql_table_name(cls, schema_name=None) -> Optional[str]:
         tablename = cls.__tablename__
@@ -144,6 +397,129 @@ class Table(BaseModel):
             return tablename
         return f"{schema_name}.{tablename}"
 
+    @staticmethod
+    def _prepare_flag(conn, sql_statement: str, prepare: Optional[bool]) -> bool:
+        """Decide whether to run sql_statement as a prepared statement on conn"""
+        if prepare is None:
+            prepare = config.prepared_statements_enabled()
+        if not prepare:
+            return False
+        prepared_statements.lookup(conn, sql_statement)
+        return True
+
+    @classmethod
+    def _execute(cls, conn, sql_statement, params, prepare, schema_name=None, row_factory=None):
+        """
+        Run one statement on conn and fetch its rows.
+
+        Pooled connections already search the right schema. Only pass schema_name for a connection pinned by
+        transaction(), which switches the search_path around the statement.
+        """
+        switch_schema = schema_name is not None and schema_name not in DEFAULT_SCHEMAS
+        with conn.cursor(row_factory=row_factory) as cursor:
+            try:
+                if switch_schema:
+                    cursor.execute(f"SET search_path TO {schema_name}")
+                cursor.execute(
+                    sql_statement,
+                    params,
+                    prepare=cls._prepare_flag(conn, sql_statement, prepare),
+                )
+                if cursor.description is not None:
+                    return cursor.fetchall()
+                else:
+                    return []
+            finally:
+                if switch_schema:
+                    cursor.execute("SET search_path TO public, auth")
+
+    @classmethod
+    async def _aexecute(cls, conn, sql_statement, params, prepare, schema_name=None, row_factory=None):
+        """Run one statement on an async conn and fetch its rows; see _execute for schema_name"""
+        switch_schema = schema_name is not None and schema_name not in DEFAULT_SCHEMAS
+        async with conn.cursor(row_factory=row_factory) as cursor:
+            try:
+                if switch_schema:
+                    await cursor.execute(f"SET search_path TO {schema_name}")
+                await cursor.execute(
+                    sql_statement,
+                    params,
+                    prepare=cls._prepare_flag(conn, sql_statement, prepare),
+                )
+                if cursor.description is not None:
+                    return await cursor.fetchall()
+                else:
+                    return []
+            finally:
+                if switch_schema:
+                    await cursor.execute("SET search_path TO public, auth")
+
+    @staticmethod
+    def _use_replica(pg_key: str, sql_statement: str, schema_name: str, read_only: Optional[bool]) -> bool:
+        """
+        Whether a statement may be served by one of pg_key's read replicas. Writes are recorded on the request scope,
+        so that (with read-your-writes on) the rest of the request reads from the primary again.
+        """
+        if read_only is None:
+            read_only = is_read_only_statement(sql_statement)
+        if not read_only:
+            _record_write(pg_key)
+            return False
+        if schema_name not in DEFAULT_SCHEMAS or _transaction_scope.get() or _async_transaction_scope.get():
+            return False
+        request = _request_scope.get()
+        if request is not None and pg_key in request.written and config.replica_read_your_writes():
+            return False
+        return True
+
+    @staticmethod
+    def _identity_map_lookup(pg_key, sql_statement, params, schema_name, row_factory):
+        """
+        The active identity map and the cache key for this statement; the key is None when the statement can't be
+        served from (or stored in) the map. Writes invalidate the map here, before they run.
+        """
+        identity_map = _identity_map.get()
+        if identity_map is None:
+            return None, None
+        if not is_read_only_statement(sql_statement):
+            identity_map.invalidate(sql_statement)
+            return identity_map, None
+        if _transaction_scope.get() is not None or _async_transaction_scope.get() is not None:
+            # Reads inside a transaction may see writes that are later rolled back
+            return identity_map, None
+        return identity_map, _IdentityMap.key(pg_key, schema_name, sql_statement, params, row_factory)
+
+    @classmethod
+    @contextmanager
+    def identity_map(cls):
+        """
+        Cache identical SELECTs (same statement, same parameters) made inside the block, so repeated lookups within
+        one request are served from memory. Writes through Table drop the cached reads of the tables they touch.
+        Nested blocks share the outermost map.
+        """
+        if _identity_map.get() is not None:
+            yield _identity_map.get()
+            return
+        identity_map = _IdentityMap()
+        token = _identity_map.set(identity_map)
+        try:
+            yield identity_map
+        finally:
+            _identity_map.reset(token)
+
+    @classmethod
+    @contextmanager
+    def request_scope(cls):
+        """
+        Track the writes made while the block runs (one API request), so that reads after a write to a PG
+        resource go to its primary rather than a replica that may not have caught up yet.
+        """
+        token = _request_scope.set(_RequestScope())
+        try:
+            yield
+        finally:
+            _request_scope.reset(token)
+
     @classmethod
     def sql(
         cls,
@@ -151,79 +527,445 @@ class Table(BaseModel):
         params: Dict[str, Any] | None = None,
         schema_name: str = "public",
         max_retries: int = 3,
+        prepare: Optional[bool] = None,
+        row_factory=None,
+        read_only: Optional[bool] = None,
     ):
         pg_key = config.get_pg_key_for_table(cls.__name__)
-        pool = get_pool()
-        retry_count = 0
+        use_replica = cls._use_replica(pg_key, sql_statement, schema_name, read_only)
+
+        identity_map, cache_key = cls._identity_map_lookup(pg_key, sql_statement, params, schema_name, row_factory)
+        if cache_key is not None:
+            cached = identity_map.get(cache_key)
+            if cached is not None:
+                return _cached_rows(cached, row_factory)
+
+        rows = cls._sql(pg_key, use_replica, sql_statement, params, schema_name, max_retries, prepare, row_factory)
+        if cache_key is not None:
+            identity_map.put(cache_key, sql_statement, rows)
+            return _cached_rows(rows, row_factory)
+        return rows
+
+    @classmethod
+    def _sql(cls, pg_key, use_replica, sql_statement, params, schema_name, max_retries, prepare, row_factory):
+        with instrumentation.observe(sql_statement, pg_key) as query:
+            scope = _transaction_scope.get()
+            if scope is not None:
+                # A failed statement aborts the whole transaction, so it is never retried on its own
+                conn = scope.connection(pg_key)
+                rows = cls._execute(conn, sql_statement, params, prepare, schema_name, row_factory)
+                query.rows = len(rows)
+                return rows
+
+            replica_pool = get_replica_pool(pg_key) if use_replica else None
+            if replica_pool is not None:
+                try:
+                    with query.checkout(replica_pool.connection()) as conn:
+                        rows = cls._execute(conn, sql_statement, params, prepare, row_factory=row_factory)
+                    query.rows = len(rows)
+                    return rows
+                except PsycopgError as e:
+                    query.replica_failed()
+                    logger.warning(f"Replica read failed for {pg_key}, falling back to the primary: {str(e)}")
+
+            def run():
+                # The pool commits (or rolls back) and takes the connection back on exit, so the
+                # connection and the statements prepared on it survive for the next call
+                with query.checkout(get_connection_pool(pg_key, schema_name).connection()) as conn:
+                    return cls._execute(conn, sql_statement, params, prepare, row_factory=row_factory)
+
+            rows = run_with_retries(pg_key, run, max_retries, "Database operation")
+            query.rows = len(rows)
+            return rows
+
+    @classmethod
+    def sql_autocommit(cls, sql_statement: str, params: Dict[str, Any] | None = None):
+        """
+        Run one statement outside any transaction block, for the ones Postgres refuses inside one
+        (CREATE INDEX CONCURRENTLY, VACUUM, ...). Meant for migrations; not retried.
+
+        Raises:
+            RuntimeError: If called inside Table.transaction()
+        """
+        if _transaction_scope.get() is not None:
+            raise RuntimeError("sql_autocommit cannot run inside Table.transaction()")
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+        _record_write(pg_key)
+        if _identity_map.get() is not None:
+            _identity_map.get().invalidate(sql_statement)
+        with instrumentation.observe(sql_statement, pg_key) as query:
+            with query.checkout(get_connection_pool(pg_key).connection()) as conn:
+                conn.autocommit = True
+                try:
+                    conn.execute(sql_statement, params, prepare=False)
+                finally:
+                    # Pooled connections are handed out in transaction mode
+                    conn.autocommit = False
+
+    @classmethod
+    async def asql(
+        cls,
+        sql_statement: str,
+        params: Dict[str, Any] | None = None,
+        schema_name: str = "public",
+        max_retries: int = 3,
+        prepare: Optional[bool] = None,
+        row_factory=None,
+        read_only: Optional[bool] = None,
+    ):
+        """Awaitable counterpart of sql, backed by the asyncio connection pools"""
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+        use_replica = cls._use_replica(pg_key, sql_statement, schema_name, read_only)
+
+        identity_map, cache_key = cls._identity_map_lookup(pg_key, sql_statement, params, schema_name, row_factory)
+        if cache_key is not None:
+            cached = identity_map.get(cache_key)
+            if cached is not None:
+                return _cached_rows(cached, row_factory)
+
+        rows = await cls._asql(
+            pg_key, use_replica, sql_statement, params, schema_name, max_retries, prepare, row_factory
+        )
+        if cache_key is not None:
+            identity_map.put(cache_key, sql_statement, rows)
+            return _cached_rows(rows, row_factory)
+        return rows
+
+    @classmethod
+    async def _asql(cls, pg_key, use_replica, sql_statement, params, schema_name, max_retries, prepare, row_factory):
+        with instrumentation.observe(sql_statement, pg_key) as query:
+            scope = _async_transaction_scope.get()
+            if scope is not None:
+                conn = await scope.connection(pg_key)
+                rows = await cls._aexecute(conn, sql_statement, params, prepare, schema_name, row_factory)
+                query.rows = len(rows)
+                return rows
+
+            replica_pool = await get_async_replica_pool(pg_key) if use_replica else None
+            if replica_pool is not None:
+                try:
+                    async with query.acheckout(replica_pool.connection()) as conn:
+                        rows = await cls._aexecute(conn, sql_statement, params, prepare, row_factory=row_factory)
+                    query.rows = len(rows)
+                    return rows
+                except PsycopgError as e:
+                    query.replica_failed()
+                    logger.warning(f"Async replica read failed for {pg_key}, falling back to the primary: {str(e)}")
+
+            async def run():
+                pool = await get_async_connection_pool(pg_key, schema_name)
+                async with query.acheckout(pool.connection()) as conn:
+                    return await cls._aexecute(conn, sql_statement, params, prepare, row_factory=row_factory)
+
+            rows = await arun_with_retries(pg_key, run, max_retries, "Async database operation")
+            query.rows = len(rows)
+            return rows
+
+    @classmethod
+    def select(
+        cls,
+        sql_statement: str,
+        params: Dict[str, Any] | None = None,
+        schema_name: str = "public",
+        validate: bool = False,
+        **kwargs,
+    ) -> List["Table"]:
+        """
+        Run a query and return its rows as instances of this class.
+
+        Args:
+            sql_statement: The query; columns that aren't fields of the class are ignored
+            params: Query parameters
+            schema_name: Schema to run the query against
+            validate: Run full pydantic validation on every row instead of trusting the database types
+            **kwargs: Passed through to sql (max_retries, prepare)
+
+        Returns:
+            List of model instances, in result order
+        """
+        row_factory = cls.__table_metadata__.row_factory(validate)
+        return cls.sql(sql_statement, params, schema_name, row_factory=row_factory, **kwargs)
+
+    @classmethod
+    async def aselect(
+        cls,
+        sql_statement: str,
+        params: Dict[str, Any] | None = None,
+        schema_name: str = "public",
+        validate: bool = False,
+        **kwargs,
+    ) -> List["Table"]:
+        """Awaitable counterpart of select"""
+        row_factory = cls.__table_metadata__.row_factory(validate)
+        return await cls.asql(sql_statement, params, schema_name, row_factory=row_factory, **kwargs)
+
+    @staticmethod
+    def _group_batch(statements) -> Dict[str, list]:
+        """Group (table class, sql, params) entries by PG resource, keeping each entry's position"""
+        groups: Dict[str, list] = {}
+        for position, (table_cls, sql_statement, params) in enumerate(statements):
+            pg_key = config.get_pg_key_for_table(table_cls.__name__)
+            if not is_read_only_statement(sql_statement):
+                _record_write(pg_key)
+                if _identity_map.get() is not None:
+                    _identity_map.get().invalidate(sql_statement)
+            groups.setdefault(pg_key, []).append((position, table_cls, sql_statement, params))
+        return groups
+
+    @classmethod
+    def _execute_pipeline(cls, conn, entries, prepare) -> list:
+        """Queue every statement on conn in pipeline mode, then collect the results with a single sync"""
+        cursors = []
+        with conn.pipeline():
+            for _, _, sql_statement, params in entries:
+                cursor = conn.cursor()
+                cursor.execute(sql_statement, params, prepare=cls._prepare_flag(conn, sql_statement, prepare))
+                cursors.append(cursor)
+        results = []
+        for cursor in cursors:
+            with cursor:
+                results.append(cursor.fetchall() if cursor.description is not None else [])
+        return results
+
+    @classmethod
+    async def _aexecute_pipeline(cls, conn, entries, prepare) -> list:
+        """Async counterpart of _execute_pipeline"""
+        cursors = []
+        async with conn.pipeline():
+            for _, _, sql_statement, params in entries:
+                cursor = conn.cursor()
+                await cursor.execute(sql_statement, params, prepare=cls._prepare_flag(conn, sql_statement, prepare))
+                cursors.append(cursor)
+        results = []
+        for cursor in cursors:
+            async with cursor:
+                results.append(await cursor.fetchall() if cursor.description is not None else [])
+        return results
+
+    @classmethod
+    def batch(
+        cls,
+        statements: Iterable[tuple],
+        schema_name: str = "public",
+        max_retries: int = 3,
+        prepare: Optional[bool] = None,
+    ) -> List[list]:
+        """
+        Run several independent statements in one network round trip per PG resource.
+
+        Statements for the same PG resource are sent together on one connection in pipeline mode, so N queries cost
+        one round trip instead of N. They still run one after the other, in order, in the same transaction.
+
+            project, votes = Table.batch([
+                (Project, "SELECT * FROM projects WHERE id = %(id)s", {"id": project_id}),
+                (Vote, "SELECT COUNT(*) AS count FROM votes WHERE project_id = %(id)s", {"id": project_id}),
+            ])
+
+        Args:
+            statements: (Table subclass, sql, params) entries; the class picks the PG resource, as with sql
+            schema_name: Schema to run the statements against
+            max_retries: Attempts per PG resource outside a transaction() block
+            prepare: As for sql
+
+        Returns:
+            One list of rows (dicts) per statement, in the order given
+        """
+        statements = list(statements)
+        results: List[list] = [[] for _ in statements]
+
+        for pg_key, entries in cls._group_batch(statements).items():
+            table_cls = entries[0][1]
+
+            with instrumentation.observe_batch([entry[2] for entry in entries], pg_key) as query:
 
-        while retry_count < max_retries:
-            current_pool = None
-            conn = None
+                def run():
+                    with query.checkout(table_cls._connection(schema_name)) as conn:
+                        return cls._execute_pipeline(conn, entries, prepare)
 
+                # Inside transaction() a failure has aborted the transaction, so there is nothing to retry
+                attempts = max_retries if _transaction_scope.get() is None else 1
+                group_results = run_with_retries(pg_key, run, attempts, "Database batch")
+                query.rows_per_statement = [len(rows) for rows in group_results]
+
+            for (position, _, _, _), rows in zip(entries, group_results):
+                results[position] = rows
+
+        return results
+
+    @classmethod
+    async def abatch(
+        cls,
+        statements: Iterable[tuple],
+        schema_name: str = "public",
+        max_retries: int = 3,
+        prepare: Optional[bool] = None,
+    ) -> List[list]:
+        """Awaitable counterpart of batch, backed by the asyncio connection pools"""
+        statements = list(statements)
+        results: List[list] = [[] for _ in statements]
+
+        for pg_key, entries in cls._group_batch(statements).items():
+            table_cls = entries[0][1]
+
+            with instrumentation.observe_batch([entry[2] for entry in entries], pg_key) as query:
+
+                async def run():
+                    async with query.acheckout(table_cls._aconnection(schema_name)) as conn:
+                        return await cls._aexecute_pipeline(conn, entries, prepare)
+
+                attempts = max_retries if _async_transaction_scope.get() is None else 1
+                group_results = await arun_with_retries(pg_key, run, attempts, "Async database batch")
+                query.rows_per_statement = [len(rows) for rows in group_results]
+
+            for (position, _, _, _), rows in zip(entries, group_results):
+                results[position] = rows
+
+        return results
+
+    @classmethod
+    @contextmanager
+    def transaction(cls):
+        """
+        Run every Table call made inside the block in one transaction.
+
+        The first statement for each PG resource checks out a connection, which stays pinned until the block
+        exits; everything is then committed together, or rolled back if the block raises. Statements inside the
+        block are not retried. Nested transaction() blocks join the outermost one.
+
+            with Table.transaction():
+                Vote.sql(...)
+                Project.sql(...)
+        """
+        if _transaction_scope.get() is not None:
+            yield
+            return
+
+        with ExitStack() as stack:
+            token = _transaction_scope.set(_TransactionScope(stack))
             try:
-                if pg_key in pool:
-                    current_pool = pool[pg_key]
-                    conn = current_pool.getconn()
-                else:
-                    pool = get_pool(reset=True)
-                    current_pool = pool[pg_key]
-                    conn = current_pool.getconn()
-
-                with conn:
-                    with conn.cursor() as cursor:
-                        try:
-                            if schema_name != "public" and schema_name != "auth":
-                                cursor.execute(f"SET search_path TO {schema_name}")
-                            cursor.execute(sql_statement, params)
-                            if cursor.description is not None:
-                                return cursor.fetchall()
-                            else:
-                                return []
-                        finally:
-                            if schema_name != "public" and schema_name != "auth":
-                                cursor.execute("SET search_path TO public, auth")
-                return  # Success, exit the retry loop
-
-            except PsycopgError as e:
-                retry_count += 1
-                logger.warning(
-                    f"Database operation failed (attempt {retry_count}/{max_retries}): {str(e)}"
-                )
+                yield
+            finally:
+                _transaction_scope.reset(token)
 
-                if conn is not None:
-                    try:
-                        if current_pool is not None:
-                            current_pool.putconn(conn)
-                        else:
-                            conn.close()
-                    except Exception:
-                        try:
-                            conn.close()
-                        except Exception:
-                            pass
-
-                if retry_count < max_retries:
-                    # Refresh the pool before retrying
-                    pool = get_pool(reset=True)
-                    continue
-                else:
-                    logger.error(
-                        f"Database operation failed after {max_retries} attempts"
-                    )
-                    raise
+    @classmethod
+    @asynccontextmanager
+    async def atransaction(cls):
+        """Async counterpart of transaction(), pinning connections for asql calls made inside the block"""
+        if _async_transaction_scope.get() is not None:
+            yield
+            return
 
+        async with AsyncExitStack() as stack:
+            token = _async_transaction_scope.set(_AsyncTransactionScope(stack))
+            try:
+                yield
+            finally:
+                _async_transaction_scope.reset(token)
+
+    @classmethod
+    @contextmanager
+    def _connection(cls, schema_name: str = "public"):
+        """Check out one pooled connection for several statements; commits on success, rolls back on error"""
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+
+        scope = _transaction_scope.get()
+        if scope is not None:
+            conn = scope.connection(pg_key)
+            if schema_name in DEFAULT_SCHEMAS:
+                yield conn
+                return
+            # A pinned connection searches the default schemas; switch around the block like _execute does
+            conn.execute(f"SET search_path TO {schema_name}")
+            try:
+                yield conn
             finally:
-                if conn is not None:
-                    try:
-                        if current_pool is not None:
-                            current_pool.putconn(conn)
-                        else:
-                            conn.close()
-                    except Exception:
-                        try:
-                            conn.close()
-                        except Exception:
-                            pass
+                conn.execute("SET search_path TO public, auth")
+            return
+
+        with get_connection_pool(pg_key, schema_name).connection() as conn:
+            yield conn
+
+    @classmethod
+    @asynccontextmanager
+    async def _aconnection(cls, schema_name: str = "public"):
+        """Async counterpart of _connection"""
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+
+        scope = _async_transaction_scope.get()
+        if scope is not None:
+            conn = await scope.connection(pg_key)
+            if schema_name in DEFAULT_SCHEMAS:
+                yield conn
+                return
+            await conn.execute(f"SET search_path TO {schema_name}")
+            try:
+                yield conn
+            finally:
+                await conn.execute("SET search_path TO public, auth")
+            return
+
+        pool = await get_async_connection_pool(pg_key, schema_name)
+        async with pool.connection() as conn:
+            yield conn
+
+    @classmethod
+    def stream(
+        cls,
+        sql_statement: str,
+        params: Dict[str, Any] | None = None,
+        schema_name: str = "public",
+        chunk_size: int = 1000,
+        as_models: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Run a query through a server-side (named) cursor and yield its rows one by one, fetching chunk_size rows
+        per round trip, so memory use doesn't grow with the result set.
+
+        The connection stays checked out (and its transaction open) until the generator is exhausted or closed, so
+        iterate it to the end or wrap it in contextlib.closing.
+
+        Args:
+            sql_statement: The query
+            params: Query parameters
+            schema_name: Schema to run the query against
+            chunk_size: Rows fetched from the server per round trip
+            as_models: Yield instances of this class (as select() returns them) instead of dicts
+
+        Yields:
+            One row at a time, in result order
+        """
+        row_factory = cls.__table_metadata__.row_factory() if as_models else None
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+        # Recorded as one statement, timed from the checkout until the last row (or until the stream is closed)
+        with instrumentation.observe(sql_statement, pg_key) as query:
+            with query.checkout(cls._connection(schema_name)) as conn:
+                with conn.cursor(name=_stream_cursor_name(), row_factory=row_factory) as cursor:
+                    cursor.itersize = chunk_size
+                    cursor.execute(sql_statement, params)
+                    for row in cursor:
+                        query.rows += 1
+                        yield row
+
+    @classmethod
+    async def astream(
+        cls,
+        sql_statement: str,
+        params: Dict[str, Any] | None = None,
+        schema_name: str = "public",
+        chunk_size: int = 1000,
+        as_models: bool = False,
+    ) -> AsyncIterator[Any]:
+        """Async counterpart of stream, for use with async for"""
+        row_factory = cls.__table_metadata__.row_factory() if as_models else None
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+        with instrumentation.observe(sql_statement, pg_key) as query:
+            async with query.acheckout(cls._aconnection(schema_name)) as conn:
+                async with conn.cursor(name=_stream_cursor_name(), row_factory=row_factory) as cursor:
+                    cursor.itersize = chunk_size
+                    await cursor.execute(sql_statement, params)
+                    async for row in cursor:
+                        query.rows += 1
+                        yield row
 
     def _prepare_value(self, value):
         """Helper to recursively prepare values for database insertion"""
@@ -236,54 +978,66 @@ class Table(BaseModel):
             return Jsonb(value)
         return value
 
-    def sync(self):
-        """Sync the model to the database"""
-        table_name = self.__class__._get_sql_table_name()
-        if table_name is None:
-            raise ValueError("Cannot sync without a table name defined")
+    def _row_values(self, metadata: TableMetadata) -> list:
+        """Column values in metadata order, with JSON-typed columns prepared for insertion"""
         data = self.model_dump()
+        json_columns = metadata.json_columns
+        return [
+            self._prepare_value(data[col]) if col in json_columns else data[col]
+            for col in metadata.columns
+        ]
 
-        # Get column names and values
-        columns = list(data.keys())
-        values = []
-        for col in columns:
-            value = data[col]
-            field_info = self.__class__.model_fields[col]
-            values.append(self._prepare_value(value))
+    def _build_upsert(self):
+        """Build the upsert statement and its values for this instance"""
+        metadata = self.__class__.__table_metadata__
+        return metadata.upsert_sql(1), self._row_values(metadata)
 
-        # Find primary key
-        primary_key = None
-        for field_name, field_info in self.__class__.model_fields.items():
-            if field_info.json_schema_extra and field_info.json_schema_extra.get(
-                "primary_key", False
-            ):
-                primary_key = field_name
-                break
+    @classmethod
+    def _build_batch_upserts(cls, objects, batch_size):
+        """
+        Yield one (sql_statement, values) upsert per batch of objects.
 
-        if not primary_key:
-            raise ValueError("Cannot sync without a primary key defined")
+        Raises:
+            ValueError: If no table name is defined or no primary key is found
+        """
+        metadata = cls.__table_metadata__
 
-        # Build the SQL statement
-        columns_str = ", ".join(columns)
-        placeholders = ", ".join(["%s"] * len(columns))
-        set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in columns])
+        # Process in batches
+        for i in range(0, len(objects), batch_size):
+            batch = objects[i : i + batch_size]
 
-        sql_statement = f"""
-            INSERT INTO {table_name} ({columns_str})
-            VALUES ({placeholders})
-            ON CONFLICT ({primary_key}) DO UPDATE
-            SET {set_clause}
-        """
+            # Collect values for this batch
+            all_values = []
+            for obj in batch:
+                if not isinstance(obj, cls):
+                    raise TypeError(
+                        f"Expected instance of {cls.__name__}, got {type(obj).__name__}"
+                    )
+                all_values.extend(obj._row_values(metadata))
+
+            yield metadata.upsert_sql(len(batch)), all_values
+
+    def sync(self):
+        """Sync the model to the database"""
+        sql_statement, values = self._build_upsert()
         self.__class__.sql(sql_statement, values)
 
+    async def async_sync(self):
+        """Sync the model to the database without blocking the event loop"""
+        sql_statement, values = self._build_upsert()
+        await self.__class__.asql(sql_statement, values)
+
     @classmethod
     def sync_many(cls, objects, batch_size=1000):
         """
         Sync multiple model instances to the database in batched transactions.
 
+        Lists of up to batch_size objects are written with one multi-row INSERT. Longer lists and any other
+        iterable (e.g. a generator) are streamed through copy_many instead.
+
         Args:
-            objects: A single model instance or a list of model instances
-            batch_size: Maximum number of objects to sync in a single transaction
+            objects: A single model instance, a list of model instances or an iterable of them
+            batch_size: Maximum number of objects to sync in a single INSERT statement
 
         Returns:
             None
@@ -292,62 +1046,148 @@ class Table(BaseModel):
             ValueError: If no table name is defined or no primary key is found
         """
         # Handle single object case
-        if not isinstance(objects, list):
+        if isinstance(objects, Table):
             objects = [objects]
 
+        if not isinstance(objects, list) or len(objects) > batch_size:
+            cls.copy_many(objects)
+            return
+
         if not objects:
             return  # Nothing to sync
 
-        table_name = cls._get_sql_table_name()
-        if table_name is None:
-            raise ValueError("Cannot sync without a table name defined")
+        # Multi-row statements vary with the batch length and are rarely repeated, so don't prepare them
+        for sql_statement, all_values in cls._build_batch_upserts(objects, batch_size):
+            cls.sql(sql_statement, all_values, prepare=False)
 
-        # Find primary key
-        primary_key = None
-        for field_name, field_info in cls.model_fields.items():
-            if field_info.json_schema_extra and field_info.json_schema_extra.get(
-                "primary_key", False
-            ):
-                primary_key = field_name
-                break
+    @classmethod
+    def copy_many(cls, objects: Iterable["Table"]) -> int:
+        """
+        Bulk upsert objects with COPY FROM STDIN (binary format).
 
-        if not primary_key:
-            raise ValueError("Cannot sync without a primary key defined")
+        Rows are streamed into a temporary staging table as the iterable is consumed, so memory stays flat for
+        generators of any length, and are then merged into the table with one INSERT ... ON CONFLICT. The whole
+        load runs in a single transaction on one connection (the one pinned by Table.transaction(), if any) and is
+        not retried.
 
-        # Process in batches
-        for i in range(0, len(objects), batch_size):
-            upper_idx = min(i + batch_size, len(objects))
-            batch = objects[i:upper_idx]
+        Args:
+            objects: Any iterable of model instances of this class
 
-            # Build a SQL transaction for this batch
-            all_values = []
-            columns = list(batch[0].model_dump().keys())
-            columns_str = ", ".join(columns)
-            placeholders = ", ".join(["%s"] * len(columns))
-            set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in columns])
+        Returns:
+            The number of rows loaded
 
-            # Collect values for this batch
-            for obj in batch:
-                if not isinstance(obj, cls):
-                    raise TypeError(
-                        f"Expected instance of {cls.__name__}, got {type(obj).__name__}"
-                    )
+        Raises:
+            ValueError: If no table name is defined or no primary key is found
+            TypeError: If an object is not an instance of this class
+        """
+        metadata, pg_key, staging_sql, copy_sql, merge_sql = cls._copy_plan()
+        row_count = 0
+
+        # Recorded as one COPY statement (staging table, load and merge), with the rows loaded
+        with instrumentation.observe(copy_sql, pg_key) as query, query.checkout(cls._connection()) as conn:
+            with conn.cursor() as cursor:
+                for statement in staging_sql:
+                    cursor.execute(statement)
+
+                column_types = metadata.copy_types.get(pg_key)
+                if column_types is None:
+                    column_types = copy_column_types(cursor, metadata.table_name, metadata.columns)
+                    metadata.copy_types[pg_key] = column_types
+                coercers = [coercer for _, coercer in column_types]
 
-                data = obj.model_dump()
-                row_values = []
-                for col in columns:
-                    value = data[col]
-                    row_values.append(obj._prepare_value(value))
-                all_values.extend(row_values)
+                with cursor.copy(copy_sql) as copy:
+                    copy.set_types([oid for oid, _ in column_types])
+                    for obj in objects:
+                        copy.write_row(cls._copy_row(obj, metadata, coercers))
+                        row_count += 1
 
-            # Build the SQL statement for this batch
-            values_placeholders = ", ".join([f"({placeholders})" for _ in batch])
+                if row_count:
+                    cursor.execute(merge_sql)
+                query.rows = row_count
 
-            sql_statement = f"""
-                INSERT INTO {table_name} ({columns_str})
-                VALUES {values_placeholders}
-                ON CONFLICT ({primary_key}) DO UPDATE
-                SET {set_clause}
-            """
+        return row_count
+
+    @classmethod
+    async def acopy_many(cls, objects: Iterable["Table"]) -> int:
+        """Awaitable counterpart of copy_many, on the connection pinned by Table.atransaction() if there is one"""
+        metadata, pg_key, staging_sql, copy_sql, merge_sql = cls._copy_plan()
+        row_count = 0
+
+        with instrumentation.observe(copy_sql, pg_key) as query:
+            async with query.acheckout(cls._aconnection()) as conn:
+                async with conn.cursor() as cursor:
+                    for statement in staging_sql:
+                        await cursor.execute(statement)
+
+                    column_types = metadata.copy_types.get(pg_key)
+                    if column_types is None:
+                        column_types = await acopy_column_types(cursor, metadata.table_name, metadata.columns)
+                        metadata.copy_types[pg_key] = column_types
+                    coercers = [coercer for _, coercer in column_types]
+
+                    async with cursor.copy(copy_sql) as copy:
+                        copy.set_types([oid for oid, _ in column_types])
+                        for obj in objects:
+                            await copy.write_row(cls._copy_row(obj, metadata, coercers))
+                            row_count += 1
+
+                    if row_count:
+                        await cursor.execute(merge_sql)
+                    query.rows = row_count
+
+        return row_count
+
+    @classmethod
+    def _copy_plan(cls):
+        """Metadata, PG resource and statements of a COPY load into this table; records it as a write"""
+        metadata = cls.__table_metadata__
+        if metadata.table_name is None:
+            raise ValueError("Cannot sync without a table name defined")
+        # Qualified with pg_temp throughout, so no statement can resolve to a real table of the same name
+        staging_table = "pg_temp." + metadata.table_name.replace(".", "_") + "_copy_stage"
+        merge_sql = metadata.merge_sql(staging_table)
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+        _record_write(pg_key)
+        if _identity_map.get() is not None:
+            _identity_map.get().invalidate_table(metadata.table_name)
+
+        staging_sql = [
+            f"DROP TABLE IF EXISTS {staging_table}",
+            f"CREATE TEMP TABLE {staging_table} (LIKE {metadata.table_name} INCLUDING DEFAULTS) ON COMMIT DROP",
+        ]
+        copy_sql = f"COPY {staging_table} ({', '.join(metadata.columns)}) FROM STDIN (FORMAT BINARY)"
+        return metadata, pg_key, staging_sql, copy_sql, merge_sql
+
+    @classmethod
+    def _copy_row(cls, obj, metadata, coercers) -> list:
+        """The COPY row of one object, coerced to the column types"""
+        if not isinstance(obj, cls):
+            raise TypeError(
+                f"Expected instance of {cls.__name__}, got {type(obj).__name__}"
+            )
+        # Field values are already validated; read them directly instead of model_dump
+        data = obj.__dict__
+        json_columns = metadata.json_columns
+        row = []
+        for col, coercer in zip(metadata.columns, coercers):
+            value = data[col]
+            if col in json_columns:
+                value = obj._prepare_value(value)
+            row.append(coercer(value) if coercer is not None and value is not None else value)
+        return row
+
+    @classmethod
+    async def async_sync_many(cls, objects, batch_size=1000):
+        """Awaitable counterpart of sync_many; same arguments and errors"""
+        if isinstance(objects, Table):
+            objects = [objects]
+
+        if not isinstance(objects, list) or len(objects) > batch_size:
+            await cls.acopy_many(objects)
+            return
+
+        if not objects:
+            return  # Nothing to sync
 
-            cls.sql(sql_statement, all_values)
+        for sql_statement, all_values in cls._build_batch_upserts(objects, batch_size):
+            await cls.asql(sql_statement, all_values, prepare=False)
@@ -0,0 +1,45 @@
+import uuid
+
+import pytest
+
+from core import activity_stats
+from core.user_activity_stats import UserActivityStats
+from solar import Table
+
+
+def test_first_donation_check_runs_under_a_per_project_lock(monkeypatch):
+    batches = []
+    monkeypatch.setattr(Table, "batch", batches.append)
+    activity_stats.record_donation(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), 25.0)
+
+    lock, increment = batches[0][0][1], batches[0][1][1]
+    assert "pg_advisory_xact_lock" in lock and "'donation:'" in lock
+    assert "FROM donations" in increment
+
+
+@pytest.fixture
+def marker(monkeypatch):
+    """Answer the check for the rebuild marker with the values of the returned list, in turn"""
+    answers, calls = [], []
+
+    def sql(sql_statement, params=None, **kwargs):
+        calls.append(params)
+        return [{"ready": answers.pop(0)}]
+
+    monkeypatch.setattr(UserActivityStats, "sql", sql)
+    monkeypatch.setattr(activity_stats, "_counters_ready", False)
+    monkeypatch.setattr(activity_stats, "_counters_checked_at", None)
+    return answers, calls
+
+
+def test_counters_are_not_trusted_until_the_rebuild_marker_is_found(marker, monkeypatch):
+    answers, calls = marker
+    answers.extend([False, True])
+    assert not activity_stats.counters_ready()
+    assert not activity_stats.counters_ready()  # not checked again before COUNTERS_READY_RECHECK
+    assert len(calls) == 1
+
+    monkeypatch.setattr(activity_stats, "COUNTERS_READY_RECHECK", 0)
+    assert activity_stats.counters_ready()
+    assert activity_stats.counters_ready()  # found once, never checked again
+    assert len(calls) == 2
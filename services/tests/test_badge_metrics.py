@@ -0,0 +1,127 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from core import badge_service
+from core.badge import Badge
+from core.badge_rules import compile_rules
+from core.project import Project
+from core.project_badge import ProjectBadge
+from core.user import User
+from core.user_badge import UserBadge
+
+
+def make_badge(badge_type, category):
+    return Badge(name=badge_type, description="", category=category, badge_type=badge_type, icon="", color="")
+
+
+class Recorder:
+    """Stands in for a Table.sql/sync_many classmethod: records the calls and answers with the given rows"""
+
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.rows
+
+
+@pytest.fixture
+def badges(monkeypatch):
+    """The catalogue's rules compiled from a few built-in badges; no trending projects"""
+    by_type = {
+        badge_type: make_badge(badge_type, category)
+        for badge_type, category in (
+            ("project_creator", "user"), ("supporter", "user"), ("patron", "user"),
+            ("fully_funded", "project"), ("overfunded", "project"), ("trending", "project"),
+        )
+    }
+    rules = compile_rules(list(by_type.values()))
+    monkeypatch.setattr(badge_service.badge_catalogue, "rules", lambda category: rules.get(category, []))
+    monkeypatch.setattr(badge_service.trending_ranking, "is_trending", lambda project_id: False)
+    monkeypatch.setattr(badge_service, "counters_ready", lambda: True)
+    return by_type
+
+
+def test_user_badges_are_decided_from_one_metrics_query(monkeypatch, badges):
+    metrics = Recorder([{
+        "project_count": 1, "vote_count": 12, "donation_count": 0, "donation_total": Decimal("0"),
+        "comment_count": 0, "awarded_badge_ids": [badges["supporter"].id],
+    }])
+    saved, badge_count = Recorder(), Recorder()
+    monkeypatch.setattr(UserBadge, "sql", metrics)
+    monkeypatch.setattr(UserBadge, "sync_many", saved)
+    monkeypatch.setattr(User, "sql", badge_count)
+    user_id = uuid.uuid4()
+
+    awarded = badge_service.calculate_user_badges(user_id)
+
+    assert len(metrics.calls) == 1
+    (_, params), kwargs = metrics.calls[0]
+    assert params == {"user_id": str(user_id)}
+    assert kwargs["read_only"] is False  # decided on the primary
+    # supporter is already awarded and patron isn't earned
+    assert [badge.badge_id for badge in awarded] == [badges["project_creator"].id]
+    assert awarded[0].user_id == str(user_id) and awarded[0].context_value == 1
+    assert len(saved.calls) == 1 and len(badge_count.calls) == 1
+
+
+def test_user_without_new_badges_writes_nothing(monkeypatch, badges):
+    monkeypatch.setattr(UserBadge, "sql", Recorder([{
+        "project_count": 0, "vote_count": 0, "donation_count": 0, "donation_total": 0, "comment_count": 0,
+        "awarded_badge_ids": [],
+    }]))
+    saved, badge_count = Recorder(), Recorder()
+    monkeypatch.setattr(UserBadge, "sync_many", saved)
+    monkeypatch.setattr(User, "sql", badge_count)
+
+    assert badge_service.calculate_user_badges(str(uuid.uuid4())) == []
+    assert not saved.calls and not badge_count.calls
+
+
+def test_project_metrics_derive_funding_and_trending(monkeypatch, badges):
+    project_id = uuid.uuid4()
+    metrics = Recorder([{
+        "project_id": project_id, "budget": Decimal("1000"), "created_at": datetime.now(),
+        "vote_count": 40, "first_day_votes": 0, "recent_votes": 30, "donation_total": Decimal("1500"),
+        "comment_count": 0, "awarded_badge_ids": [],
+    }])
+    saved = Recorder()
+    monkeypatch.setattr(Project, "sql", metrics)
+    monkeypatch.setattr(ProjectBadge, "sync_many", saved)
+
+    awarded = badge_service.calculate_project_badges(project_id)
+
+    assert len(metrics.calls) == 1
+    # 150% funded earns both funding badges, recorded with the amount; not in the ranking, so not trending
+    assert {(badge.badge_id, badge.earned_value) for badge in awarded} == {
+        (badges["fully_funded"].id, 1500), (badges["overfunded"].id, 1500)
+    }
+    assert len(saved.calls) == 1
+
+
+def test_unknown_project_earns_nothing(monkeypatch, badges):
+    saved = Recorder()
+    monkeypatch.setattr(Project, "sql", Recorder([]))
+    monkeypatch.setattr(ProjectBadge, "sync_many", saved)
+
+    assert badge_service.calculate_project_badges(uuid.uuid4()) == []
+    assert not saved.calls
+
+
+def test_metrics_are_counted_from_the_raw_tables_until_the_counters_are_filled(monkeypatch, badges):
+    monkeypatch.setattr(badge_service, "counters_ready", lambda: False)
+    metrics = Recorder([{
+        "user_id": uuid.uuid4(), "project_count": 0, "vote_count": 0, "donation_count": 0, "donation_total": 0,
+        "comment_count": 0, "awarded_badge_ids": [],
+    }])
+    monkeypatch.setattr(UserBadge, "sql", metrics)
+
+    assert badge_service.calculate_user_badges(uuid.uuid4()) == []
+    (sql_statement, params), _ = metrics.calls[0]
+    assert "user_activity_stats" not in sql_statement
+    assert "FROM donations" in sql_statement and "chunk_size" not in params
+
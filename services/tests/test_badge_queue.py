@@ -0,0 +1,73 @@
+import threading
+import uuid
+
+from core.badge_queue import BadgeQueue
+
+
+class RecordingQueue(BadgeQueue):
+    """A BadgeQueue whose evaluators record what they were called with"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.evaluated = []
+        self.release = threading.Event()
+        self.release.set()
+        self.EVALUATORS = {"project": self._evaluate("project"), "user": self._evaluate("user")}
+
+    def _evaluate(self, kind):
+        def evaluate(subject_id):
+            self.release.wait(5)
+            self.evaluated.append((kind, subject_id))
+        return evaluate
+
+
+def test_repeat_events_coalesce_into_one_evaluation():
+    queue = RecordingQueue(coalesce_window=60)
+    project_id, user_id = uuid.uuid4(), uuid.uuid4()
+    for _ in range(5):
+        queue.enqueue(project_id=project_id, user_id=user_id)
+    assert queue.pending() == 2
+
+    assert queue.join(timeout=5)
+    queue.stop(timeout=5)
+    assert sorted(queue.evaluated, key=str) == sorted([("project", project_id), ("user", str(user_id))], key=str)
+    assert queue.stats()["coalesced"] == 8
+
+
+def test_user_ids_coalesce_whether_uuid_or_str():
+    queue = RecordingQueue(coalesce_window=60)
+    user_id = uuid.uuid4()
+    queue.enqueue(user_id=user_id)
+    queue.enqueue(user_id=str(user_id))
+
+    assert queue.join(timeout=5)
+    queue.stop(timeout=5)
+    assert queue.evaluated == [("user", str(user_id))]
+
+
+def test_event_during_evaluation_schedules_one_more_pass():
+    queue = RecordingQueue(workers=2, coalesce_window=0)
+    project_id = uuid.uuid4()
+    queue.release.clear()
+    queue.enqueue(project_id=project_id)
+    while queue.stats()["running"] == 0:
+        threading.Event().wait(0.01)
+
+    queue.enqueue(project_id=project_id)
+    queue.enqueue(project_id=project_id)
+    queue.release.set()
+
+    assert queue.join(timeout=5)
+    queue.stop(timeout=5)
+    assert queue.evaluated == [("project", project_id), ("project", project_id)]
+
+
+def test_failed_evaluations_are_counted():
+    queue = BadgeQueue(coalesce_window=0)
+    queue.EVALUATORS = {"project": lambda subject_id: 1 / 0, "user": lambda subject_id: None}
+    queue.enqueue(project_id=uuid.uuid4(), user_id=uuid.uuid4())
+
+    assert queue.join(timeout=5)
+    queue.stop(timeout=5)
+    assert queue.stats()["failed"] == 1
+    assert queue.stats()["evaluated"] == 1
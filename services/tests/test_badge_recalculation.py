@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+import pytest
+
+from core import badge_service
+from core.badge_recalculation_run import BadgeRecalculationRun
+from core.badge_service import BadgeRecalculationJob
+
+
+def saved_run(monkeypatch, live):
+    """Answer the job's lookup of its saved run with a running run, live or not per the database"""
+    calls = []
+
+    def sql(sql_statement, params=None, **kwargs):
+        calls.append(params)
+        return [{"id": "badges", "state": "running", "phase": "projects", "chunk_size": 500, "live": live}]
+
+    monkeypatch.setattr(BadgeRecalculationRun, "sql", sql)
+    return calls
+
+
+def test_liveness_is_decided_by_the_database(monkeypatch):
+    calls = saved_run(monkeypatch, live=True)
+    with pytest.raises(RuntimeError, match="already running"):
+        BadgeRecalculationJob(name="badges").run()
+    assert calls[0]["stale_after"] == badge_service.BADGE_RECALCULATION_STALE_AFTER
+    assert isinstance(calls[0]["stale_after"], timedelta)
+
+
+def test_a_run_without_a_recent_heartbeat_is_reported_failed(monkeypatch):
+    saved_run(monkeypatch, live=False)
+    status = BadgeRecalculationJob(name="badges").status()
+    assert status["state"] == "failed"
+    assert status["phase"] == "projects"
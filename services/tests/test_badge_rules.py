@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+
+from core.badge import Badge
+from core.badge_rules import compile_rules, earned_badges
+from core.badge_service import BadgeCatalogue
+
+
+def make_badge(badge_type, category="user", **criteria):
+    return Badge(
+        name=badge_type, description="", category=category, badge_type=badge_type, icon="", color="", **criteria
+    )
+
+
+def test_built_in_badges_fall_back_to_default_criteria():
+    rules = compile_rules([make_badge("community_leader"), make_badge("rising_star", category="project")])
+    assert rules["user"][0].predicates == [("project_count", 5), ("vote_count", 50), ("donation_count", 1)]
+    assert rules["project"][0].predicates == [("first_day_votes", 10)]
+
+
+def test_criteria_columns_override_the_defaults():
+    rules = compile_rules([make_badge("supporter", criteria_value=3), make_badge("helper", criteria_comments=2)])
+    assert [rule.predicates for rule in rules["user"]] == [[("vote_count", 3)], [("comment_count", 2)]]
+
+
+def test_criteria_metric_names_the_thresholded_metric():
+    badge = make_badge("big_spender", criteria_value=500, criteria_metric="donation_total")
+    assert compile_rules([badge])["user"][0].predicates == [("donation_total", 500)]
+
+
+def test_trending_always_requires_the_ranking():
+    rules = compile_rules([make_badge("trending", category="project", criteria_value=5)])
+    assert rules["project"][0].predicates == [("recent_votes", 5), ("is_trending", 1)]
+
+
+def test_badges_without_criteria_are_left_out():
+    assert compile_rules([make_badge("mystery")]) == {}
+
+
+@pytest.mark.parametrize("badge", [
+    make_badge("anything", category="team"),
+    make_badge("custom", criteria_value=3),
+    make_badge("custom", criteria_value=3, criteria_metric="first_day_votes"),
+])
+def test_invalid_badges_are_skipped(badge, caplog):
+    supporter = make_badge("supporter")
+    rules = compile_rules([badge, supporter])
+    assert [rule.badge_id for rule in rules["user"]] == [supporter.id]
+    assert f"Skipping badge {badge.badge_type}" in caplog.text
+
+
+def test_one_invalid_badge_does_not_break_the_catalogue(monkeypatch):
+    bad, good = make_badge("anything", category="team"), make_badge("rising_star", category="project")
+    monkeypatch.setattr(Badge, "select", lambda *args, **kwargs: [bad, good])
+    catalogue = BadgeCatalogue()
+    assert catalogue.all() == [bad, good]
+    assert [rule.badge_id for rule in catalogue.rules("project")] == [good.id]
+
+
+def test_earned_badges_skips_awarded_and_unmet_rules():
+    supporter, champion, patron = make_badge("supporter"), make_badge("champion"), make_badge("patron")
+    rules = compile_rules([supporter, champion, patron])["user"]
+    metrics = {"project_count": 0, "vote_count": 60, "donation_count": 2, "donation_total": 0, "comment_count": 0}
+
+    assert earned_badges(rules, metrics, set()) == [(supporter.id, 60), (champion.id, 60)]
+    assert earned_badges(rules, metrics, {supporter.id}) == [(champion.id, 60)]
+
+
+def test_funding_badges_record_the_amount():
+    badge = make_badge("fully_funded", category="project")
+    metrics = {"funded_percent": 120, "donation_total": 2400}
+    assert earned_badges(compile_rules([badge])["project"], metrics, set()) == [(badge.id, 2400)]
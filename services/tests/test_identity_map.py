@@ -0,0 +1,55 @@
+from contextlib import nullcontext
+
+from core.badge import Badge
+from solar import table
+from solar.table import Table, referenced_tables
+
+
+def test_referenced_tables():
+    statement = """
+        SELECT p.*, u.name FROM public.projects p
+        JOIN users u ON u.id = p.user_id
+        WHERE p.id IN (SELECT project_id FROM ONLY votes)
+    """
+    assert referenced_tables(statement) == {"projects", "users", "votes"}
+
+
+def test_referenced_tables_of_writes():
+    assert referenced_tables("INSERT INTO Votes (id) VALUES (1)") == {"votes"}
+    assert referenced_tables("UPDATE auth.users SET name = 'x'") == {"users"}
+    assert referenced_tables("TRUNCATE project_vote_buckets") == frozenset()
+
+
+class FakeConnection:
+    autocommit = False
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, sql_statement, params=None, prepare=None):
+        self.executed.append(sql_statement)
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def connection(self):
+        return nullcontext(self.conn)
+
+
+def test_sql_autocommit_invalidates_the_identity_map(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(table, "get_connection_pool", lambda pg_key: pool)
+    with Table.identity_map() as identity_map:
+        identity_map.put(("badges",), "SELECT * FROM badges", [1])
+        identity_map.put(("users",), "SELECT * FROM users", [2])
+
+        Badge.sql_autocommit("ALTER TABLE badges ADD COLUMN IF NOT EXISTS criteria_metric TEXT")
+        assert identity_map.get(("badges",)) is None
+        assert identity_map.get(("users",)) == [2]
+
+        Badge.sql_autocommit("CREATE INDEX CONCURRENTLY badges_category_idx ON badges (category)")
+        assert identity_map.get(("users",)) is None
+    assert pool.conn.executed[0].startswith("ALTER TABLE badges")
+    assert pool.conn.autocommit is False
@@ -0,0 +1,46 @@
+from contextlib import nullcontext
+
+from solar.instrumentation import Instrumentation, fingerprint, render_prometheus
+
+
+def test_fingerprint_replaces_literals_and_collapses_whitespace():
+    assert fingerprint("SELECT *\n  FROM votes\tWHERE id = 42 AND name = 'it''s'") == (
+        "SELECT * FROM votes WHERE id = ? AND name = ?"
+    )
+
+
+def test_fingerprint_groups_equivalent_statements():
+    assert fingerprint("SELECT 1.5 LIMIT 10") == fingerprint("SELECT 2  LIMIT 20")
+
+
+def test_fingerprint_keeps_placeholders_and_identifiers():
+    statement = "SELECT * FROM table2 WHERE col_1 = %(id)s LIMIT %s"
+    assert fingerprint(statement) == statement
+
+
+def test_replica_fallback_is_not_counted_as_a_retry():
+    instrumentation = Instrumentation(slow_query_ms=0)
+    with instrumentation.observe("SELECT * FROM votes", "PG") as query:
+        with query.checkout(nullcontext("replica")):
+            pass
+        query.replica_failed()
+        with query.checkout(nullcontext("primary")):
+            pass
+
+    stats = instrumentation.stats()["SELECT * FROM votes"]
+    assert stats["retries"] == 0
+    assert stats["fallbacks"] == 1
+
+
+def test_retries_after_a_fallback_are_still_counted():
+    instrumentation = Instrumentation(slow_query_ms=0)
+    with instrumentation.observe("SELECT * FROM votes", "PG") as query:
+        for connection in ("replica", "primary", "primary again"):
+            with query.checkout(nullcontext(connection)):
+                pass
+            if connection == "replica":
+                query.replica_failed()
+
+    stats = instrumentation.stats()
+    assert stats["SELECT * FROM votes"]["retries"] == 1
+    assert 'solar_query_replica_fallbacks_total{fingerprint="SELECT * FROM votes"} 1' in render_prometheus(stats)
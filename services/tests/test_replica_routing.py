@@ -0,0 +1,89 @@
+import pytest
+
+from solar import pool
+from solar.table import is_read_only_statement
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT * FROM projects WHERE id = %(id)s",
+    "  select count(*) from votes",
+    "WITH recent AS (SELECT * FROM votes) SELECT * FROM recent",
+    "SHOW search_path",
+    "VALUES (1), (2)",
+    "TABLE projects",
+])
+def test_reads_are_read_only(statement):
+    assert is_read_only_statement(statement)
+
+
+@pytest.mark.parametrize("statement", [
+    "INSERT INTO votes (id) VALUES (%(id)s)",
+    "UPDATE projects SET vote_count = vote_count + 1",
+    "DELETE FROM votes WHERE id = %(id)s",
+    "WITH removed AS (DELETE FROM votes RETURNING project_id) SELECT * FROM removed",
+    "SELECT * INTO archived_votes FROM votes",
+    "SELECT * FROM projects WHERE id = %(id)s FOR UPDATE",
+    "SELECT * FROM projects FOR NO KEY UPDATE",
+    "SELECT * FROM projects FOR SHARE",
+    "SELECT nextval('votes_id_seq')",
+    "CREATE INDEX votes_project_id ON votes (project_id)",
+])
+def test_writes_are_not_read_only(statement):
+    assert not is_read_only_statement(statement)
+
+
+class FakePool:
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    """One primary with two replica pools; validate_pool answers from status, keyed by pool name"""
+    status = {}
+    monkeypatch.setattr(pool, "get_pool", lambda: {"PG": FakePool("PG")})
+    monkeypatch.setattr(pool, "_replica_pools", {"PG": [FakePool("PG [replica 0]"), FakePool("PG [replica 1]")]})
+    monkeypatch.setattr(pool, "_down_replicas", set())
+    monkeypatch.setattr(pool, "validate_pool", lambda checked, name: status.get(name, pool.POOL_HEALTHY))
+    replaced = []
+    monkeypatch.setattr(pool, "replace_pool", lambda pg_key: replaced.append(pg_key))
+    monkeypatch.setattr(pool, "replace_replica_pool", lambda pg_key, index: replaced.append((pg_key, index)))
+    return status, replaced
+
+
+def test_monitor_probes_replicas(replicas):
+    status, replaced = replicas
+    results = pool.PoolHealthMonitor().check_now()
+    assert set(results) == {"PG", "PG [replica 0]", "PG [replica 1]"}
+    assert not replaced
+
+
+def test_failed_replica_leaves_the_rotation_until_it_recovers(replicas):
+    status, replaced = replicas
+    monitor = pool.PoolHealthMonitor()
+    status["PG [replica 1]"] = pool.POOL_UNHEALTHY
+    monitor.check_now()
+
+    assert replaced == [("PG", 1)]
+    assert {pool.get_replica_pool("PG").name for _ in range(4)} == {"PG [replica 0]"}
+
+    status["PG [replica 1]"] = pool.POOL_HEALTHY
+    monitor.check_now()
+    assert {pool.get_replica_pool("PG").name for _ in range(4)} == {"PG [replica 0]", "PG [replica 1]"}
+
+
+def test_busy_replica_stays_in_the_rotation(replicas):
+    status, replaced = replicas
+    status["PG [replica 0]"] = pool.POOL_BUSY
+    results = pool.PoolHealthMonitor().check_now()
+
+    assert results["PG [replica 0]"]["busy_checks"] == 1
+    assert not replaced
+    assert {pool.get_replica_pool("PG").name for _ in range(4)} == {"PG [replica 0]", "PG [replica 1]"}
+
+
+def test_no_replica_when_all_are_down(replicas):
+    status, replaced = replicas
+    status["PG [replica 0]"] = status["PG [replica 1]"] = pool.POOL_UNHEALTHY
+    pool.PoolHealthMonitor().check_now()
+    assert pool.get_replica_pool("PG") is None
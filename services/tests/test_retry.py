@@ -0,0 +1,95 @@
+import pytest
+from psycopg import InterfaceError, OperationalError, errors
+from psycopg_pool import PoolTimeout, TooManyRequests
+
+from solar import retry
+from solar.retry import is_connection_error, is_overload_error, is_transient_error, run_with_retries
+
+
+@pytest.mark.parametrize("error", [PoolTimeout("busy"), TooManyRequests("queue full")])
+def test_pool_saturation_is_overload_not_a_broken_connection(error):
+    assert is_overload_error(error)
+    assert not is_connection_error(error)
+    assert not is_transient_error(error)
+
+
+@pytest.mark.parametrize("error", [
+    OperationalError("server closed the connection unexpectedly"),
+    InterfaceError("connection already closed"),
+    errors.AdminShutdown("terminating connection due to administrator command"),
+    errors.ConnectionFailure("connection failure"),
+])
+def test_broken_connections(error):
+    assert is_connection_error(error)
+    assert is_transient_error(error)
+    assert not is_overload_error(error)
+
+
+@pytest.mark.parametrize("error", [errors.SerializationFailure("conflict"), errors.DeadlockDetected("deadlock")])
+def test_concurrency_conflicts_are_transient(error):
+    assert is_transient_error(error)
+    assert not is_connection_error(error)
+
+
+@pytest.mark.parametrize("error", [
+    errors.UniqueViolation("duplicate key"),
+    errors.ForeignKeyViolation("no such project"),
+    errors.SyntaxError("syntax error"),
+    ValueError("not a database error"),
+])
+def test_statement_errors_are_not_retried(error):
+    assert not is_transient_error(error)
+    assert not is_connection_error(error)
+    assert not is_overload_error(error)
+
+
+class Failing:
+    """An operation that raises the given errors in turn, then succeeds"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    replaced = []
+    monkeypatch.setattr(retry.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(retry, "replace_pool", replaced.append)
+    retry.retry_stats.reset()
+    return replaced
+
+
+def test_transient_errors_are_retried(no_sleep):
+    operation = Failing(errors.SerializationFailure("conflict"))
+    assert run_with_retries("PG", operation, 3, "Test") == "ok"
+    assert operation.calls == 2
+    assert retry.retry_stats.stats()["PG"]["retries"] == 1
+
+
+def test_overload_fails_at_once_without_replacing_the_pool(no_sleep):
+    operation = Failing(PoolTimeout("busy"), PoolTimeout("busy"))
+    with pytest.raises(PoolTimeout):
+        run_with_retries("PG", operation, 3, "Test")
+    assert operation.calls == 1
+    assert not no_sleep
+    assert retry.retry_stats.stats()["PG"]["overloaded"] == 1
+
+
+def test_repeated_connection_errors_replace_the_pool(no_sleep):
+    operation = Failing(errors.AdminShutdown("gone"), errors.AdminShutdown("gone"))
+    assert run_with_retries("PG", operation, 3, "Test") == "ok"
+    assert no_sleep == ["PG"]
+
+
+def test_permanent_errors_are_not_retried(no_sleep):
+    operation = Failing(errors.UniqueViolation("duplicate key"))
+    with pytest.raises(errors.UniqueViolation):
+        run_with_retries("PG", operation, 3, "Test")
+    assert operation.calls == 1
@@ -0,0 +1,129 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from psycopg import errors
+
+from core import vote_buffer as vote_buffer_module
+from core.vote import Vote
+from core.vote_buffer import VoteBuffer
+from solar import Table
+
+
+class FakeVotes:
+    """Stands in for Vote.sql and Table.transaction: answers add()'s check and writes flushed batches into memory"""
+
+    def __init__(self):
+        self.rows = set()
+        self.missing_projects = set()  # flushing a vote for one of these fails like a foreign key violation would
+        self.outage = False
+        self.batches = []
+
+    @contextmanager
+    def transaction(self):
+        rows = set(self.rows)
+        try:
+            yield
+        except Exception:
+            self.rows = rows
+            raise
+
+    def sql(self, statement, params=None, **kwargs):
+        if "NOT EXISTS" in statement:
+            key = (params["user_id"], params["project_id"])
+            return [] if key in self.rows or params["project_id"] in self.missing_projects else [{"id": key[1]}]
+        if self.outage:
+            raise errors.AdminShutdown("terminating connection due to administrator command")
+        self.batches.append(len(params["ids"]))
+        if any(project_id in self.missing_projects for project_id in params["project_ids"]):
+            raise errors.ForeignKeyViolation("insert or update on table votes violates foreign key constraint")
+        inserted = []
+        for user_id, project_id, created_at in zip(params["user_ids"], params["project_ids"], params["created_at"]):
+            if (user_id, project_id) not in self.rows:
+                self.rows.add((user_id, project_id))
+                inserted.append({"user_id": user_id, "project_id": project_id, "created_at": created_at})
+        return inserted
+
+
+@pytest.fixture
+def votes(monkeypatch):
+    fake = FakeVotes()
+    monkeypatch.setattr(Vote, "sql", staticmethod(fake.sql))
+    monkeypatch.setattr(Table, "transaction", staticmethod(fake.transaction))
+    monkeypatch.setattr(vote_buffer_module.activity_stats, "record_votes", lambda votes: None)
+    monkeypatch.setattr(vote_buffer_module.badge_queue, "enqueue", lambda **kwargs: None)
+    return fake
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    buffer = VoteBuffer(enabled=True, batch_size=2, max_attempts=2)
+    monkeypatch.setattr(buffer, "_start_worker", lambda: None)  # flushed by hand
+    return buffer
+
+
+def test_flush_writes_pending_votes_in_batches(votes, buffer):
+    project_id = uuid.uuid4()
+    user_ids = [uuid.uuid4() for _ in range(5)]
+    for user_id in user_ids:
+        assert buffer.add(user_id, project_id)
+
+    assert buffer.flush() == 5
+    assert votes.batches == [2, 2, 1]
+    assert votes.rows == {(user_id, project_id) for user_id in user_ids}
+    assert buffer.stats()["pending"] == 0
+
+
+def test_add_refuses_repeats(votes, buffer):
+    user_id, project_id = uuid.uuid4(), uuid.uuid4()
+    assert buffer.add(user_id, project_id)
+    assert not buffer.add(user_id, project_id)
+    buffer.flush()
+
+    assert not buffer.add(user_id, project_id)
+    assert buffer.stats()["pending"] == 0
+
+
+def test_discard_drops_an_unwritten_vote(votes, buffer):
+    user_id, project_id = uuid.uuid4(), uuid.uuid4()
+    buffer.add(user_id, project_id)
+    assert buffer.is_pending(user_id, project_id)
+
+    assert buffer.discard(user_id, project_id)
+    assert buffer.flush() == 0
+    assert not votes.rows
+
+
+def test_failing_vote_does_not_hold_back_the_others(votes, buffer):
+    project_id, deleted_project_id = uuid.uuid4(), uuid.uuid4()
+    user_ids = [uuid.uuid4() for _ in range(4)]
+    for user_id in user_ids:
+        buffer.add(user_id, project_id)
+    buffer.add(user_ids[0], deleted_project_id)
+    votes.missing_projects.add(deleted_project_id)
+
+    assert buffer.flush() == 4
+    assert buffer.is_pending(user_ids[0], deleted_project_id)
+
+    # Retried once more, then dropped after max_attempts failed flushes
+    assert buffer.flush() == 0
+    assert not buffer.is_pending(user_ids[0], deleted_project_id)
+    assert buffer.stats()["rejected"] == 1
+    assert buffer.flush() == 0
+
+
+def test_outage_keeps_every_vote_pending(votes, buffer):
+    user_ids = [uuid.uuid4() for _ in range(3)]
+    project_id = uuid.uuid4()
+    for user_id in user_ids:
+        buffer.add(user_id, project_id)
+    votes.outage = True
+
+    for _ in range(buffer.max_attempts + 1):
+        with pytest.raises(errors.AdminShutdown):
+            buffer.flush()
+    assert buffer.stats()["pending"] == 3
+    assert buffer.stats()["rejected"] == 0
+
+    votes.outage = False
+    assert buffer.flush() == 3
@@ -0,0 +1,46 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from core import voting_service
+from core.vote import Vote
+
+
+@pytest.fixture
+def votes(monkeypatch):
+    """Record the vote statements and answer them as if the vote was inserted; nothing is enqueued"""
+    calls = []
+
+    def sql(sql_statement, params=None, **kwargs):
+        calls.append(sql_statement)
+        return [{"project_id": params["project_id"]}]
+
+    monkeypatch.setattr(Vote, "sql", sql)
+    monkeypatch.setattr(voting_service.vote_buffer, "enabled", False)
+    monkeypatch.setattr(voting_service.badge_queue, "enqueue", lambda **kwargs: None)
+    monkeypatch.setattr(voting_service, "_vote_unique_index_found", False)
+    monkeypatch.setattr(voting_service, "_vote_unique_index_checked_at", None)
+    return calls
+
+
+def test_a_vote_and_all_its_counters_are_one_statement(votes, monkeypatch):
+    monkeypatch.setattr(voting_service, "has_vote_unique_index", lambda: True)
+
+    assert voting_service.vote_for_project(SimpleNamespace(id=uuid.uuid4()), uuid.uuid4())
+    assert len(votes) == 1
+    for table in ("votes", "user_activity_stats", "project_activity_stats", "project_vote_buckets"):
+        assert f"INSERT INTO {table}" in votes[0]
+    assert "ON CONFLICT (user_id, project_id) DO NOTHING" in votes[0]
+
+
+def test_without_the_unique_index_votes_skip_the_buffer_and_on_conflict(votes, monkeypatch):
+    checks = []
+    monkeypatch.setattr(voting_service, "has_vote_unique_index", lambda: checks.append(1) or False)
+    monkeypatch.setattr(voting_service.vote_buffer, "enabled", True)
+    monkeypatch.setattr(voting_service.vote_buffer, "add", lambda user_id, project_id: pytest.fail("buffered"))
+
+    for _ in range(2):
+        assert voting_service.vote_for_project(SimpleNamespace(id=uuid.uuid4()), uuid.uuid4())
+    assert all("NOT EXISTS" in sql and "(user_id, project_id)" not in sql for sql in votes)
+    assert len(checks) == 1  # cached until VOTE_UNIQUE_INDEX_RECHECK